@@ -1,37 +1,45 @@
 import pandas as pd
 import numpy as np
 
-from pipeline.file_info.code_map import IcdMapHeader
+from pipeline.file_info.cache import ICD_9_TO_10_CACHE_PATH
+from pipeline.file_info.code_map import MAP_PATH, IcdMapHeader
+from pipeline.extract.compiled_cache import load_compiled
 from pipeline.extract.static.code_map import load_static_icd_map
 from pipeline.file_info.raw.hosp import DiagnosesIcdHeader
 
 from pipeline.file_info.preproc.feature.diagnoses import DiagnosesFeatureHeader
 
 
-class IcdConverter:
-    def __init__(self):
-        # Load the ICD-9 to ICD-10 conversion dictionary upon initialization
-        self.conversions_icd_9_10 = self._load_icd_9_to_10_mapping()
-
-    def _load_icd_9_to_10_mapping(self) -> dict:
-        """Loads and returns a dictionary for converting ICD-9 to ICD-10 codes."""
-        icd_map_df = load_static_icd_map()
+def build_icd_9_to_10_mapping() -> dict:
+    """Builds the dictionary converting ICD-9 root codes to ICD-10 codes from the static mapping."""
+    icd_map_df = load_static_icd_map()
 
-        # Filter for ICD-9 root codes (3 characters)
-        icd_9_root_codes = icd_map_df[
-            icd_map_df[IcdMapHeader.DIAGNOSIS_CODE].str.len() == 3
-        ]
+    # Filter for ICD-9 root codes (3 characters)
+    icd_9_root_codes = icd_map_df[
+        icd_map_df[IcdMapHeader.DIAGNOSIS_CODE].str.len() == 3
+    ]
 
-        # Remove duplicates and create the mapping dictionary
-        icd_9_root_codes = icd_9_root_codes.drop_duplicates(
-            subset=IcdMapHeader.DIAGNOSIS_CODE
-        )
-        return dict(
-            zip(
-                icd_9_root_codes[IcdMapHeader.DIAGNOSIS_CODE],
-                icd_9_root_codes[IcdMapHeader.ICD10],
-            )
+    # Remove duplicates and create the mapping dictionary
+    icd_9_root_codes = icd_9_root_codes.drop_duplicates(
+        subset=IcdMapHeader.DIAGNOSIS_CODE
+    )
+    return dict(
+        zip(
+            icd_9_root_codes[IcdMapHeader.DIAGNOSIS_CODE],
+            icd_9_root_codes[IcdMapHeader.ICD10],
         )
+    )
+
+
+def load_icd_9_to_10_mapping() -> dict:
+    """Loads the ICD-9 to ICD-10 dictionary from its compiled cache, building it if needed."""
+    return load_compiled(MAP_PATH, ICD_9_TO_10_CACHE_PATH, build_icd_9_to_10_mapping)
+
+
+class IcdConverter:
+    def __init__(self):
+        # Load the ICD-9 to ICD-10 conversion dictionary upon initialization
+        self.conversions_icd_9_10 = load_icd_9_to_10_mapping()
 
     def convert_icd(self, code: str, version: int) -> str:
         """Converts ICD-9 to ICD-10 if applicable, otherwise returns the original code."""
@@ -43,17 +51,16 @@ class IcdConverter:
 
     def standardize_icd(self, df: pd.DataFrame) -> pd.DataFrame:
         """Standardizes ICD codes in a DataFrame by converting ICD-9 to ICD-10."""
-        df[DiagnosesFeatureHeader.CONVERTED_ICD_CODE] = df.apply(
-            lambda row: self.convert_icd(
-                row[DiagnosesIcdHeader.ICD_CODE], row[DiagnosesIcdHeader.ICD_VERSION]
-            ),
-            axis=1,
-        )
+        codes = df[DiagnosesIcdHeader.ICD_CODE]
+        is_icd9 = df[DiagnosesIcdHeader.ICD_VERSION] == 9
+
+        # Convert the roots of ICD-9 codes in one mapping, ICD-10 codes are kept as is
+        converted = codes.astype(object)
+        converted[is_icd9] = codes[is_icd9].str[:3].map(self.conversions_icd_9_10)
+        df[DiagnosesFeatureHeader.CONVERTED_ICD_CODE] = converted
 
         # Extract root of standardized ICD-10 codes (first 3 characters)
-        df[DiagnosesIcdHeader.ROOT] = df[DiagnosesIcdHeader.ICD10].apply(
-            lambda x: x[:3] if isinstance(x, str) else np.nan
-        )
+        df[DiagnosesIcdHeader.ROOT] = converted.str[:3]
         return df
 
     def get_pos_ids(self, diag: pd.DataFrame, icd10_code: str) -> pd.Series:
@@ -0,0 +1,131 @@
+import logging
+from enum import StrEnum
+from functools import partial, reduce
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from pipeline.conversion.icd import IcdConverter
+from pipeline.extract.fingerprint import file_fingerprint
+from pipeline.extract.raw.hosp import load_diagnosis_icd
+from pipeline.file_info.cache import ICD_ROOT_INDEX_PATH
+from pipeline.file_info.code_map import MAP_PATH
+from pipeline.file_info.raw.hosp import HOSP_DIAGNOSES_ICD_PATH, DiagnosesIcdHeader
+
+logger = logging.getLogger()
+
+
+class DiseaseCombination(StrEnum):
+    ALL = "Admissions diagnosed with all the diseases"
+    ANY = "Admissions diagnosed with any of the diseases"
+
+
+class IcdRootIndex:
+    """
+    Inverted index from standardized ICD-10 roots to the sorted hospital admission IDs
+    diagnosed with them.
+
+    Attributes:
+        roots (np.ndarray): Sorted ICD-10 roots.
+        offsets (np.ndarray): Start of the admissions of roots[i] in hadm_ids, with a final end offset.
+        hadm_ids (np.ndarray): Concatenated sorted admission IDs of every root.
+    """
+
+    def __init__(self, roots: np.ndarray, offsets: np.ndarray, hadm_ids: np.ndarray):
+        self.roots = roots
+        self.offsets = offsets
+        self.hadm_ids = hadm_ids
+
+    @classmethod
+    def from_diagnoses(cls, diag: pd.DataFrame) -> "IcdRootIndex":
+        """Builds the index from diagnoses with standardized ICD roots."""
+        diag = diag.dropna(subset=[DiagnosesIcdHeader.ROOT])
+        roots, root_codes = np.unique(
+            diag[DiagnosesIcdHeader.ROOT].to_numpy(dtype=str), return_inverse=True
+        )
+        hadm_ids = diag[DiagnosesIcdHeader.HOSPITAL_ADMISSION_ID].to_numpy("int64")
+        pairs = np.unique(np.stack([root_codes, hadm_ids], axis=1), axis=0)
+        offsets = np.searchsorted(pairs[:, 0], np.arange(len(roots) + 1))
+        return cls(roots, offsets, pairs[:, 1].copy())
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            roots=self.roots,
+            offsets=self.offsets,
+            hadm_ids=self.hadm_ids,
+            fingerprint=np.array(fingerprint),
+        )
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str) -> "IcdRootIndex | None":
+        """Loads a saved index, or returns None if it was built from other source files."""
+        if not path.exists():
+            return None
+        with np.load(path) as saved:
+            if str(saved["fingerprint"]) != fingerprint:
+                return None
+            return cls(saved["roots"], saved["offsets"], saved["hadm_ids"])
+
+    def get_pos_ids(self, icd10_code: str) -> np.ndarray:
+        """Sorted unique admission IDs whose ICD-10 root contains the given code."""
+        matching = np.flatnonzero(np.char.find(self.roots, icd10_code) >= 0)
+        pos_ids = [
+            self.hadm_ids[self.offsets[root] : self.offsets[root + 1]]
+            for root in matching
+        ]
+        if len(pos_ids) == 1:
+            return pos_ids[0]
+        return np.unique(np.concatenate([self.hadm_ids[:0]] + pos_ids))
+
+    def select(
+        self,
+        icd10_codes: Iterable[str],
+        combination: DiseaseCombination = DiseaseCombination.ALL,
+    ) -> np.ndarray:
+        """Sorted admission IDs diagnosed with all or any of the given codes."""
+        pos_ids = [self.get_pos_ids(code) for code in icd10_codes]
+        if not pos_ids:
+            return self.hadm_ids[:0]
+        if combination == DiseaseCombination.ALL:
+            return reduce(partial(np.intersect1d, assume_unique=True), pos_ids)
+        return np.unique(np.concatenate(pos_ids))
+
+
+_loaded_indexes = {}
+
+
+def _sources_fingerprint() -> str:
+    return "|".join(
+        file_fingerprint(path) for path in (HOSP_DIAGNOSES_ICD_PATH, MAP_PATH)
+    )
+
+
+def load_icd_root_index() -> IcdRootIndex:
+    """
+    Returns the ICD root index of the diagnoses table.
+
+    The index is built once from the diagnoses and the ICD-9 to ICD-10 mapping, saved to disk,
+    and reused by later calls and later runs as long as these source files are unchanged.
+    """
+    fingerprint = _sources_fingerprint()
+    if fingerprint in _loaded_indexes:
+        return _loaded_indexes[fingerprint]
+    index = IcdRootIndex.load(ICD_ROOT_INDEX_PATH, fingerprint)
+    if index is None:
+        logger.info("[BUILDING ICD ROOT INDEX]")
+        diag = load_diagnosis_icd()[
+            [
+                DiagnosesIcdHeader.ICD_CODE,
+                DiagnosesIcdHeader.ICD_VERSION,
+                DiagnosesIcdHeader.HOSPITAL_ADMISSION_ID,
+            ]
+        ]
+        index = IcdRootIndex.from_diagnoses(IcdConverter().standardize_icd(diag))
+        index.save(ICD_ROOT_INDEX_PATH, fingerprint)
+    _loaded_indexes.clear()
+    _loaded_indexes[fingerprint] = index
+    return index
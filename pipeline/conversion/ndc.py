@@ -1,11 +1,24 @@
+from typing import Tuple
+
 import pandas as pd
 import numpy as np
-from pipeline.file_info.code_map import NdcMapHeader
+from scipy import sparse
+from pipeline.file_info.cache import NDC_MAP_CACHE_PATH
+from pipeline.file_info.code_map import MAP_NDC_PATH, NdcMapHeader
+from pipeline.extract.compiled_cache import load_compiled
 from pipeline.extract.static.code_map import load_ndc_mapping
 
 
-# Read and preprocess NDC mapping table
+# Read the preprocessed NDC mapping table
 def prepare_ndc_mapping() -> pd.DataFrame:
+    """Returns the prepared NDC mapping table, loaded from its compiled cache when up to date."""
+    ndc_map = load_compiled(MAP_NDC_PATH, NDC_MAP_CACHE_PATH, build_ndc_mapping)
+    # The compiled table is shared within the process
+    return ndc_map.copy(deep=False)
+
+
+# Read and preprocess NDC mapping table
+def build_ndc_mapping() -> pd.DataFrame:
     """Prepares the NDC mapping table by formatting the NDC codes and deduplicating the data."""
     ndc_map = read_ndc_mapping()
 
@@ -24,9 +37,7 @@ def prepare_ndc_mapping() -> pd.DataFrame:
     )
 
     # Format NDC codes and add to a new column
-    ndc_map[NdcMapHeader.NEW_NDC] = ndc_map[NdcMapHeader.PRODUCT_NDC].apply(
-        format_ndc_table
-    )
+    ndc_map[NdcMapHeader.NEW_NDC] = format_ndc_table(ndc_map[NdcMapHeader.PRODUCT_NDC])
 
     # Drop duplicates based on formatted NDC and non-proprietary name
     ndc_map = ndc_map.drop_duplicates(
@@ -37,23 +48,23 @@ def prepare_ndc_mapping() -> pd.DataFrame:
 
 
 # Convert numeric NDC to string format
-def convert_ndc_to_string(ndc: int) -> str:
-    """Converts NDC code to a 9-digit string, handling invalid values."""
-    if ndc < 0:
-        return np.nan  # Return NaN for dummy or invalid NDC values
-    return str(ndc).zfill(11)[
-        :-2
-    ]  # Zero-fill to 11 digits and keep only first 9 digits
+def convert_ndc_to_string(ndc: pd.Series) -> pd.Series:
+    """Converts NDC codes to 9-digit strings, with NaN for invalid (negative) values."""
+    # Zero-fill to 11 digits and keep only first 9 digits
+    strings = ndc.astype(str).str.zfill(11).str[:-2]
+    return strings.where((ndc >= 0).fillna(False))
 
 
 # Format NDC code from the table to the 9-digit format
-def format_ndc_table(ndc: str) -> str:
-    """Formats NDC code from the table into a 9-digit string by combining the segments."""
-    parts = ndc.split("-")
-    formatted_ndc = "".join(
-        part.zfill(length) for part, length in zip(parts, [5, 4, 2])
-    )
-    return formatted_ndc[:9]  # Take only the first 9 digits (manufacturer and product)
+def format_ndc_table(ndc: pd.Series) -> pd.Series:
+    """Formats NDC codes from the table into 9-digit strings by combining the segments."""
+    parts = ndc.str.split("-", expand=True)
+    formatted = parts[0].str.zfill(5)
+    for position, length in [(1, 4), (2, 2)]:
+        if position in parts.columns:
+            # Codes with fewer segments get nothing for the missing ones
+            formatted = formatted + parts[position].str.zfill(length).fillna("")
+    return formatted.str[:9]  # Take only the first 9 digits (manufacturer and product)
 
 
 # Read the NDC mapping file from disk
@@ -64,10 +75,52 @@ def read_ndc_mapping() -> pd.DataFrame:
     return ndc_map
 
 
-# Extract Established Pharmacologic Class (EPC) from string
-def get_EPC(pharm_classes: str) -> list:
-    """Extracts Established Pharmacologic Class (EPC) tags from a pharmacological class string."""
-    if not isinstance(pharm_classes, str):
-        return np.nan  # Return NaN if input is not a string
+def _EPC_tags(pharm_classes: pd.Series) -> pd.Series:
+    """EPC tags of pharmacological class strings, one row per tag, indexed like the strings."""
+    text = pharm_classes[[isinstance(value, str) for value in pharm_classes]]
+    phrases = text.astype(str).str.split(",").explode()
+    return phrases[phrases.str.contains("[EPC]", regex=False)]
+
+
+def _EPC_rows(pharm_classes: pd.Series) -> Tuple[np.ndarray, pd.Categorical]:
+    """Positions of the rows and their EPC tags, one entry per tag."""
+    # Pharmacological classes repeat a lot, so tags are extracted once per distinct string
+    codes, uniques = pd.factorize(pharm_classes)
+    tags = _EPC_tags(pd.Series(uniques, dtype=object)).rename("tag")
+    rows = pd.DataFrame({"code": codes}).join(tags, on="code", how="inner")
+    return rows.index.to_numpy(), pd.Categorical(rows["tag"])
 
-    return [phrase for phrase in pharm_classes.split(",") if "[EPC]" in phrase]
+
+# Extract Established Pharmacologic Class (EPC) from strings
+def get_EPC(pharm_classes: pd.Series) -> pd.Series:
+    """Extracts the lists of Established Pharmacologic Class (EPC) tags from pharmacological class strings."""
+    codes, uniques = pd.factorize(pharm_classes)
+    uniques = pd.Series(uniques, dtype=object)
+    tags = _EPC_tags(uniques).groupby(level=0).agg(list)
+
+    # The last entry, NaN, is taken by the rows that are not strings
+    lists = np.full(len(uniques) + 1, np.nan, dtype=object)
+    for position, value in uniques.items():
+        if isinstance(value, str):
+            lists[position] = tags.get(position, [])
+    return pd.Series(lists[codes], index=pharm_classes.index, name=pharm_classes.name)
+
+
+def explode_EPC(pharm_classes: pd.Series) -> pd.Series:
+    """EPC tags as a categorical Series with one row per tag, indexed like the pharmacological classes."""
+    positions, tags = _EPC_rows(pharm_classes)
+    return pd.Series(tags, index=pharm_classes.index[positions])
+
+
+def multi_hot_EPC(pharm_classes: pd.Series) -> pd.DataFrame:
+    """EPC tags as a sparse multi-hot DataFrame with one column per tag, indexed like the pharmacological classes."""
+    positions, tags = _EPC_rows(pharm_classes)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(positions), dtype=np.uint8), (positions, tags.codes)),
+        shape=(len(pharm_classes), len(tags.categories)),
+    )
+    # A tag repeated in a string is still a single hot value
+    matrix.data = np.minimum(matrix.data, 1)
+    return pd.DataFrame.sparse.from_spmatrix(
+        matrix, index=pharm_classes.index, columns=tags.categories
+    )
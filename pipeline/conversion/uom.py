@@ -1,37 +1,118 @@
+from pathlib import Path
+from typing import Optional
 import pandas as pd
+from pipeline.file_info.cache import UOM_DECISION_DTYPES, UomDecisionHeader
 from pipeline.file_info.raw.icu import ChartEventsHeader
+from pipeline.profiling import profiled
 
 
-def drop_wrong_uom(data: pd.DataFrame, cut_off: float) -> pd.DataFrame:
-    """Drop rows with uncommon units of measurement (uom) for each itemid, based on a cut-off frequency.
+def count_uom(data: pd.DataFrame) -> pd.Series:
+    """Count the rows of each (itemid, uom) pair, rows without uom included.
 
     Args:
         data (pd.DataFrame): The input DataFrame containing the data with 'itemid' and 'valueuom' columns.
-        cut_off (float): The cut-off frequency (0 < cut_off <= 1) used to filter out uncommon units of measurement.
 
     Returns:
-        pd.DataFrame: The filtered DataFrame where rows with uncommon uom are dropped.
+        pd.Series: The number of rows indexed by (itemid, valueuom). Like value_counts, their order
+        breaks the ties between the most frequent units: the order of the categories for
+        categorical units, and the order of first appearance otherwise.
     """
+    return data.groupby(
+        [ChartEventsHeader.ITEMID, ChartEventsHeader.VALUEOM],
+        dropna=False,
+        observed=True,
+        sort=isinstance(data[ChartEventsHeader.VALUEOM].dtype, pd.CategoricalDtype),
+    ).size()
+
+
+def merge_uom_counts(counts: Optional[pd.Series], other: pd.Series) -> pd.Series:
+    """Add the uom counts of a new chunk of data to the counts accumulated so far."""
+    if counts is None:
+        return other
+    # Categories of different chunks become strings, sorted like their unified categories
+    categorical = isinstance(other.index.levels[1].dtype, pd.CategoricalDtype)
+    return (
+        pd.concat([counts, other])
+        .groupby(level=[0, 1], dropna=False, sort=categorical)
+        .sum()
+    )
+
+
+def empty_uom_decisions() -> pd.DataFrame:
+    """Decision table without items, with the column types of a loaded one."""
+    return pd.DataFrame(
+        {
+            column: pd.Series(dtype=dtype)
+            for column, dtype in UOM_DECISION_DTYPES.items()
+        }
+    )
+
+
+def load_uom_decisions(path: Path) -> pd.DataFrame:
+    """Read a decision table saved with to_csv, units such as "NA" kept as strings."""
+    return pd.read_csv(path, dtype=UOM_DECISION_DTYPES, keep_default_na=False)
+
+
+def uom_decisions(counts: Optional[pd.Series], cut_off: float) -> pd.DataFrame:
+    """Decide for each itemid whether only the rows with its most frequent uom are kept.
+
+    Args:
+        counts (pd.Series, optional): The uom counts returned by count_uom, None when there was no
+            data to count.
+        cut_off (float): The cut-off frequency (0 < cut_off <= 1) used to filter out uncommon units of measurement.
 
-    # Create a function to filter each group
-    def filter_by_uom_frequency(group):
-        value_counts = group[ChartEventsHeader.VALUEOM].value_counts()
-        most_frequent_uom = value_counts.idxmax()
-        frequency = value_counts.max()
-
-        # Check if the most frequent uom meets the cut-off criteria
-        if frequency / len(group) > cut_off:
-            return group[group[ChartEventsHeader.VALUEOM] == most_frequent_uom]
-        return group
-
-    # Apply the filter function to each group and concatenate the results
-    filtered_data = (
-        data.groupby(ChartEventsHeader.ITEMID)
-        .apply(filter_by_uom_frequency, include_groups=False)
-        .reset_index(drop=True)
+    Returns:
+        pd.DataFrame: One row per itemid with its most frequent uom, the share of the item rows
+        recorded with it, and whether rows with other units are dropped.
+    """
+    if counts is None:
+        return empty_uom_decisions()
+    totals = counts.groupby(level=0).sum()
+    counts = counts[counts.index.get_level_values(1).notna()]
+    most_frequent = counts.sort_values(ascending=False, kind="stable")
+    most_frequent = most_frequent[~most_frequent.index.get_level_values(0).duplicated()]
+    items = most_frequent.index.get_level_values(0)
+    share = most_frequent.to_numpy() / totals.reindex(items).to_numpy()
+    return pd.DataFrame(
+        {
+            UomDecisionHeader.ITEM_ID: items,
+            UomDecisionHeader.MOST_FREQUENT_UOM: most_frequent.index.get_level_values(
+                1
+            ),
+            UomDecisionHeader.SHARE: share,
+            UomDecisionHeader.KEEP_ONLY_MOST_FREQUENT: share > cut_off,
+        }
     )
 
-    filtered_data = filtered_data.merge(
-        data[[ChartEventsHeader.ITEMID]], left_index=True, right_index=True
+
+@profiled
+def apply_uom_decisions(data: pd.DataFrame, decisions: pd.DataFrame) -> pd.DataFrame:
+    """Drop the rows of the items restricted to their most frequent uom that have another uom."""
+    restricted = decisions[decisions[UomDecisionHeader.KEEP_ONLY_MOST_FREQUENT]]
+    kept_uom = pd.Series(
+        restricted[UomDecisionHeader.MOST_FREQUENT_UOM].to_numpy(),
+        index=restricted[UomDecisionHeader.ITEM_ID].to_numpy(),
     )
-    return filtered_data
+    item_uom = data[ChartEventsHeader.ITEMID].map(kept_uom)
+    keep = (
+        item_uom.isna().to_numpy()
+        | (data[ChartEventsHeader.VALUEOM] == item_uom).to_numpy()
+    )
+    return data[keep].reset_index(drop=True)
+
+
+@profiled
+def drop_wrong_uom(data: pd.DataFrame, cut_off: float) -> pd.DataFrame:
+    """Drop rows with uncommon units of measurement (uom) for each itemid, based on a cut-off frequency.
+
+    An itemid whose most frequent uom covers more than the cut-off share of its rows keeps only the
+    rows with that uom. The frequencies are computed with a single grouped count over the data.
+
+    Args:
+        data (pd.DataFrame): The input DataFrame containing the data with 'itemid' and 'valueuom' columns.
+        cut_off (float): The cut-off frequency (0 < cut_off <= 1) used to filter out uncommon units of measurement.
+
+    Returns:
+        pd.DataFrame: The filtered DataFrame where rows with uncommon uom are dropped.
+    """
+    return apply_uom_decisions(data, uom_decisions(count_uom(data), cut_off))
@@ -0,0 +1,63 @@
+import logging
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+from pipeline.extract.fingerprint import file_digest, file_fingerprint
+
+logger = logging.getLogger()
+
+# Compiled objects already loaded in this process, by cache file
+_loaded: Dict[Path, Tuple[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def _read_compiled(cache_path: Path, source_path: Path) -> Tuple[bool, Any]:
+    """Read a compiled object if it was built from the current content of its source."""
+    if not cache_path.exists():
+        return False, None
+    with open(cache_path, "rb") as f:
+        entry = pickle.load(f)
+    # The content hash is only computed when the file identity changed, e.g. after a copy
+    if entry["fingerprint"] != file_fingerprint(source_path):
+        if entry["digest"] != file_digest(source_path):
+            return False, None
+        _write_compiled(cache_path, source_path, entry["value"], entry["digest"])
+    return True, entry["value"]
+
+
+def _write_compiled(
+    cache_path: Path, source_path: Path, value: Any, digest: str
+) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    entry = {
+        "digest": digest,
+        "fingerprint": file_fingerprint(source_path),
+        "value": value,
+    }
+    with open(tmp_path, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(cache_path)
+
+
+def load_compiled(source_path: Path, cache_path: Path, build: Callable[[], Any]) -> Any:
+    """
+    Object built from a static source file, compiled once and then loaded from a binary cache.
+
+    The cache is keyed on the hash of the source file, so it is rebuilt when the source
+    changes. The object is loaded at most once per process and shared by the callers, which
+    should not modify it.
+    """
+    fingerprint = file_fingerprint(source_path)
+    with _lock:
+        if cache_path in _loaded and _loaded[cache_path][0] == fingerprint:
+            return _loaded[cache_path][1]
+        found, value = _read_compiled(cache_path, source_path)
+        if not found:
+            logger.info(f"[COMPILING {source_path}]")
+            value = build()
+            _write_compiled(cache_path, source_path, value, file_digest(source_path))
+        _loaded[cache_path] = (fingerprint, value)
+        return value
@@ -1,13 +1,180 @@
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import StrEnum
+from typing import Iterator, List, Optional
+import numpy as np
 import pandas as pd
 import logging
 from pathlib import Path
+from pipeline.extract.dtypes import concat_frames
+from pipeline.extract.fingerprint import file_fingerprint
+from pipeline.profiling import profiled
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+CSV_GZIP_SUFFIX = ".csv.gz"
+BLOCK_ROWS = 500000
+PARTITION_PREFIX = "part-"
 
-def save_data(data: pd.DataFrame, path: Path, data_name: str) -> pd.DataFrame:
-    """Save DataFrame to specified path."""
-    data.to_csv(path, compression="gzip", index=False)
+
+class OutputFormat(StrEnum):
+    CSV_GZIP = "csv_gzip"  # Single-threaded gzip CSV
+    BLOCK_GZIP_CSV = "block_gzip_csv"  # Gzip CSV compressed by blocks in parallel, readable as a regular .csv.gz
+    PARQUET_ZSTD = "parquet_zstd"
+    PARQUET_LZ4 = "parquet_lz4"
+    FEATHER = "feather"  # Arrow IPC file compressed with lz4
+
+
+FORMAT_SUFFIXES = {
+    OutputFormat.CSV_GZIP: CSV_GZIP_SUFFIX,
+    OutputFormat.BLOCK_GZIP_CSV: CSV_GZIP_SUFFIX,
+    OutputFormat.PARQUET_ZSTD: ".parquet",
+    OutputFormat.PARQUET_LZ4: ".parquet",
+    OutputFormat.FEATHER: ".feather",
+}
+
+
+def output_path(path: Path, output_format: OutputFormat) -> Path:
+    """Path of a `.csv.gz` output written in another format, with the suffix of that format."""
+    path = Path(path)
+    return path.with_name(path.name.split(".")[0] + FORMAT_SUFFIXES[output_format])
+
+
+def _csv_blocks(data: pd.DataFrame, block_rows: int) -> Iterator[bytes]:
+    for start in range(0, max(len(data), 1), block_rows):
+        block = data.iloc[start : start + block_rows]
+        yield block.to_csv(index=False, header=start == 0).encode()
+
+
+def write_block_gzip_csv(
+    data: pd.DataFrame,
+    path: Path,
+    block_rows: int = BLOCK_ROWS,
+    n_threads: Optional[int] = None,
+) -> None:
+    """
+    Write a gzip CSV made of one gzip member per block of rows, compressed in parallel threads.
+
+    Concatenated gzip members form a valid gzip file, read by any gzip reader like a single-member one.
+    """
+    n_threads = n_threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_threads) as executor, open(path, "wb") as f:
+        pending = deque()
+        for block in _csv_blocks(data, block_rows):
+            pending.append(executor.submit(gzip.compress, block))
+            # Only a few blocks are held in memory at once
+            if len(pending) >= 2 * n_threads:
+                f.write(pending.popleft().result())
+        while pending:
+            f.write(pending.popleft().result())
+
+
+def _write(data: pd.DataFrame, path: Path, output_format: OutputFormat) -> None:
+    if output_format == OutputFormat.CSV_GZIP:
+        data.to_csv(path, compression="gzip", index=False)
+    elif output_format == OutputFormat.BLOCK_GZIP_CSV:
+        write_block_gzip_csv(data, path)
+    elif output_format == OutputFormat.PARQUET_ZSTD:
+        data.to_parquet(path, compression="zstd", index=False)
+    elif output_format == OutputFormat.PARQUET_LZ4:
+        data.to_parquet(path, compression="lz4", index=False)
+    elif output_format == OutputFormat.FEATHER:
+        data.reset_index(drop=True).to_feather(path, compression="lz4")
+
+
+def partitions(data: pd.DataFrame, partition_by: str, nb_partitions: int) -> np.ndarray:
+    """Partition of each row, from a hash of its partition_by value that is stable across runs."""
+    keys = data[partition_by]
+    if pd.api.types.is_integer_dtype(keys):
+        # Ids hash alike whatever their integer width, so that all outputs partition an id alike
+        keys = keys.astype("int64")
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashes % nb_partitions).astype(np.int64)
+
+
+def _partition_directory(path: Path) -> Path:
+    return path.with_name(path.name.split(".")[0])
+
+
+@profiled
+def save_data(
+    data: pd.DataFrame,
+    path: Path,
+    data_name: str,
+    output_format: OutputFormat = OutputFormat.CSV_GZIP,
+    partition_by: Optional[str] = None,
+    nb_partitions: int = 1,
+) -> pd.DataFrame:
+    """
+    Save DataFrame to specified path.
+
+    The suffix of path is replaced by the one of output_format. With nb_partitions > 1, the rows
+    are split by a hash of their partition_by column into the files of a directory named after
+    path, which readers can load in parallel.
+    """
+    path = output_path(path, output_format)
+    directory = _partition_directory(path)
+    # Outputs of a previous run with another layout would be read instead of this one
+    for stale in [path, *directory.glob(f"{PARTITION_PREFIX}*")]:
+        stale.unlink(missing_ok=True)
+    if partition_by is None or nb_partitions <= 1:
+        _write(data, path, output_format)
+    else:
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = data.groupby(partitions(data, partition_by, nb_partitions)).indices
+        # Every partition is written, even empty, so readers always find nb_partitions files
+        for partition in range(nb_partitions):
+            part_path = directory / (
+                f"{PARTITION_PREFIX}{partition:05d}{FORMAT_SUFFIXES[output_format]}"
+            )
+            _write(data.iloc[rows.get(partition, [])], part_path, output_format)
     logger.info(f"[SUCCESSFULLY SAVED {data_name} DATA]")
     return data
+
+
+def saved_files(path: Path, output_format: OutputFormat) -> List[Path]:
+    """Files of an output saved by save_data, partitioned or not, empty if there is none."""
+    path = output_path(path, output_format)
+    if path.exists():
+        return [path]
+    return sorted(_partition_directory(path).glob(f"{PARTITION_PREFIX}*"))
+
+
+def output_fingerprint(path: Path, output_format: OutputFormat) -> Optional[str]:
+    """Cheap identity of an output saved by save_data, None if there is none."""
+    files = saved_files(path, output_format)
+    if not files:
+        return None
+    return "|".join(file_fingerprint(file) for file in files)
+
+
+def _read(
+    path: Path, output_format: OutputFormat, parse_dates: Optional[List[str]]
+) -> pd.DataFrame:
+    if output_format in (OutputFormat.CSV_GZIP, OutputFormat.BLOCK_GZIP_CSV):
+        return pd.read_csv(path, compression="gzip", parse_dates=parse_dates)
+    if output_format == OutputFormat.FEATHER:
+        return pd.read_feather(path)
+    return pd.read_parquet(path)
+
+
+@profiled
+def load_data(
+    path: Path,
+    output_format: OutputFormat = OutputFormat.CSV_GZIP,
+    parse_dates: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Load data saved by save_data, reading the files of a partitioned output in parallel threads."""
+    path = output_path(path, output_format)
+    directory = _partition_directory(path)
+    if path.exists() or not directory.is_dir():
+        return _read(path, output_format, parse_dates)
+    parts = sorted(directory.glob(f"{PARTITION_PREFIX}*"))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        frames = list(
+            executor.map(lambda part: _read(part, output_format, parse_dates), parts)
+        )
+    return concat_frames(frames)
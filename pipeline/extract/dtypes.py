@@ -0,0 +1,60 @@
+from functools import reduce
+from typing import Dict, List
+
+import pandas as pd
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Cast the columns of a DataFrame listed in a dtype schema, leaving the others as they are."""
+    dtypes = {
+        column: dtype
+        for column, dtype in dtypes.items()
+        if column in df.columns and df[column].dtype != dtype
+    }
+    return df.astype(dtypes) if dtypes else df
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate DataFrames, keeping categorical columns categorical.
+
+    pd.concat turns categorical columns with different categories, e.g. those of chunks read
+    separately, into strings. Their categories are unified first to avoid it.
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.concat(frames)
+    for column in frames[0].columns:
+        columns = [frame[column] for frame in frames]
+        if not all(isinstance(c.dtype, pd.CategoricalDtype) for c in columns):
+            continue
+        categories = reduce(
+            lambda left, right: left.union(right), [c.cat.categories for c in columns]
+        )
+        frames = [
+            frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def align_dtypes(df: pd.DataFrame, reference: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the columns of a DataFrame read back from a saved output to the dtypes of the same
+    columns in a reference DataFrame, so that both can be concatenated without changing values.
+    """
+    columns = {}
+    for column in df.columns.intersection(reference.columns):
+        dtype = reference[column].dtype
+        if df[column].dtype == dtype:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            columns[column] = pd.to_datetime(df[column], format="ISO8601").astype(dtype)
+        elif pd.api.types.is_timedelta64_dtype(dtype):
+            columns[column] = pd.to_timedelta(df[column]).astype(dtype)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            # Categories are unified when concatenating
+            columns[column] = df[column].astype("category")
+        elif pd.api.types.is_numeric_dtype(dtype):
+            columns[column] = df[column].astype(dtype)
+    return df.assign(**columns) if columns else df
@@ -0,0 +1,26 @@
+import hashlib
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+
+def file_fingerprint(path: Path) -> str:
+    """Cheap identity of a file on disk, based on its size and modification time."""
+    stat = Path(path).stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: List[str]) -> str:
+    """Hash of the content of some columns of a DataFrame, independent of its index."""
+    hashes = pd.util.hash_pandas_object(df[columns], index=False)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    """Hash of the content of a file, stable across copies and modification times."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,177 @@
+import gzip
+import json
+import logging
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from pipeline.extract.fingerprint import file_fingerprint
+from pipeline.file_info.cache import GZIP_MEMBERS_CACHE_PATH, MEMBER_INDEX_SUFFIX
+from pipeline.file_info.path_prefix import RAW_PATH
+
+logger = logging.getLogger()
+
+MEMBER_BYTES = 64 * 1024**2
+MEMBER_COMPRESSION_LEVEL = 1
+DEFAULT_READ_WORKERS = min(8, os.cpu_count() or 1)
+# Decompressed bytes read at once from the source while building a copy
+_READ_BLOCK = 16 * 1024**2
+# gzip container for zlib, as opposed to zlib or raw deflate streams
+_GZIP_WBITS = 31
+
+
+def member_copy_path(path: Path) -> Path:
+    """Location of the multi-member gzip copy of a raw `.csv.gz` table."""
+    return GZIP_MEMBERS_CACHE_PATH / Path(path).relative_to(RAW_PATH)
+
+
+def member_index_path(path: Path) -> Path:
+    copy_path = member_copy_path(path)
+    return copy_path.with_name(copy_path.name + MEMBER_INDEX_SUFFIX)
+
+
+def load_member_index(path: Path) -> Optional[dict]:
+    """Index of the copy of a raw table, None if there is none or it is out of date."""
+    index_path = member_index_path(path)
+    if not index_path.exists() or not Path(path).exists():
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    if index["source_fingerprint"] != file_fingerprint(path):
+        return None
+    # An index left over by an interrupted rebuild does not describe the copy
+    copy_path = member_copy_path(path)
+    if not copy_path.exists():
+        return None
+    if index.get("copy_fingerprint") != file_fingerprint(copy_path):
+        return None
+    return index
+
+
+def is_member_copy_fresh(path: Path) -> bool:
+    return load_member_index(path) is not None
+
+
+def _line_blocks(path: Path, member_bytes: int) -> Iterator[bytes]:
+    """Decompressed content of a gzip file in blocks of whole lines of about member_bytes."""
+    pending = b""
+    with gzip.open(path, "rb") as f:
+        while data := f.read(_READ_BLOCK):
+            pending += data
+            start = 0
+            while len(pending) - start >= member_bytes:
+                # Last line ending before member_bytes, or the first after for longer lines
+                end = pending.rfind(b"\n", start, start + member_bytes) + 1
+                end = end or pending.find(b"\n", start + member_bytes) + 1
+                if not end:
+                    break
+                yield pending[start:end]
+                start = end
+            pending = pending[start:]
+    if pending:
+        yield pending
+
+
+def build_member_copy(
+    path: Path,
+    member_bytes: int = MEMBER_BYTES,
+    compresslevel: int = MEMBER_COMPRESSION_LEVEL,
+) -> Path:
+    """
+    Recompress a raw `.csv.gz` table as a sequence of gzip members of whole lines.
+
+    The copy is still a valid gzip file of the same content, readable by any gzip reader. Its
+    index records the header line and the byte range of each member, so that the members can be
+    decompressed and parsed independently. Lines are cut at newlines, so fields spanning several
+    lines, which the raw tables do not have, are not supported.
+
+    The copy and its index are each written to a temporary file and moved in place. The index
+    records the fingerprint of the copy it describes, so that it is ignored if the copy is
+    rebuilt without it, e.g. by an interrupted rebuild.
+    """
+    copy_path = member_copy_path(path)
+    copy_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = copy_path.with_name(copy_path.name + ".tmp")
+    logger.info(f"[BUILDING MULTI-MEMBER GZIP COPY OF {path}]")
+    fingerprint = file_fingerprint(path)
+    header, members = None, []
+    with open(tmp_path, "wb") as f:
+        for block in _line_blocks(path, member_bytes):
+            if header is None:
+                header_end = block.find(b"\n") + 1 or len(block)
+                header = block[:header_end]
+                # The header stays in the first member so that the copy reads like the source
+                offset = len(header)
+            else:
+                offset = 0
+            start = f.tell()
+            f.write(gzip.compress(block, compresslevel=compresslevel, mtime=0))
+            if len(block) > offset:
+                members.append([start, f.tell() - start, offset])
+    tmp_path.replace(copy_path)
+    index = {
+        "source_fingerprint": fingerprint,
+        "copy_fingerprint": file_fingerprint(copy_path),
+        "header": (header or b"").decode(),
+        "members": members,
+    }
+    index_path = member_index_path(path)
+    tmp_index_path = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp_index_path, "w") as f:
+        json.dump(index, f)
+    tmp_index_path.replace(index_path)
+    logger.info(
+        f"[SUCCESSFULLY COPIED {path} TO {copy_path} IN {len(members)} MEMBERS]"
+    )
+    return copy_path
+
+
+def read_member(copy_path: Path, member: Tuple[int, int, int], header: bytes) -> bytes:
+    """Decompressed lines of a member of a copy, preceded by the header line."""
+    start, length, offset = member
+    with open(copy_path, "rb") as f:
+        f.seek(start)
+        data = zlib.decompress(f.read(length), wbits=_GZIP_WBITS)
+    return header + data[offset:]
+
+
+def read_members(
+    path: Path,
+    parse: Callable[[bytes], pd.DataFrame],
+    n_workers: int = DEFAULT_READ_WORKERS,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Chunks of the copy of a raw table, one per member, parsed by parse from the member lines.
+
+    The members are decompressed and parsed in a pool of n_workers threads, zlib and the pandas
+    parser releasing the GIL for most of their work, and are yielded in file order. At most
+    max_in_flight members (2 * n_workers by default) are pending at once.
+    """
+    index = load_member_index(path)
+    if index is None:
+        raise FileNotFoundError(f"No up to date multi-member copy of {path}")
+    copy_path = member_copy_path(path)
+    header = index["header"].encode()
+    members: List = index["members"]
+
+    def read(member) -> pd.DataFrame:
+        return parse(read_member(copy_path, member, header))
+
+    if not members:
+        yield parse(header)
+        return
+    max_in_flight = max(max_in_flight or 2 * n_workers, 1)
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as executor:
+        in_flight = deque()
+        for member in members:
+            in_flight.append(executor.submit(read, member))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
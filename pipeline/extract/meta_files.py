@@ -0,0 +1,23 @@
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+@contextmanager
+def meta_written_last(meta_path: Path) -> Iterator[dict]:
+    """
+    Write the files described by a JSON metadata file, the metadata being the yielded dict.
+
+    The metadata file is removed before the files are written and written once the block
+    completes, so readers, which wait for it, never open incomplete files, and a failed write
+    leaves no metadata behind.
+    """
+    meta_path = Path(meta_path)
+    meta_path.unlink(missing_ok=True)
+    meta = {}
+    yield meta
+    tmp_path = meta_path.with_name(f"{meta_path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    tmp_path.replace(meta_path)
@@ -0,0 +1,373 @@
+import io
+import logging
+from functools import partial
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.extract.dtypes import apply_dtypes, concat_frames
+from pipeline.extract.fingerprint import file_fingerprint
+from pipeline.extract.gzip_members import is_member_copy_fresh, read_members
+from pipeline.file_info.cache import PARQUET_SUFFIX, RAW_CACHE_PATH
+from pipeline.file_info.path_prefix import RAW_PATH
+
+logger = logging.getLogger()
+
+COMPRESSION = "gzip"
+CACHE_COMPRESSION = "zstd"
+CONVERSION_CHUNKSIZE = 5000000
+SOURCE_FINGERPRINT_KEY = b"source_fingerprint"
+# Type a column is converted with again when a later chunk does not fit the inferred one
+WIDER_DTYPES = {"boolean": "str", "Int64": "float64", "float64": "str"}
+
+
+def raw_cache_path(path: Path) -> Path:
+    """Location of the Parquet copy of a raw `.csv.gz` table."""
+    relative = Path(path).relative_to(RAW_PATH)
+    return (
+        RAW_CACHE_PATH
+        / relative.parent
+        / (relative.name.split(".")[0] + PARQUET_SUFFIX)
+    )
+
+
+def is_cache_fresh(path: Path) -> bool:
+    """Whether the Parquet copy of a raw table exists and was built from its current version."""
+    cache_path = raw_cache_path(path)
+    if not cache_path.exists() or not Path(path).exists():
+        return False
+    metadata = pq.read_schema(cache_path).metadata or {}
+    return metadata.get(SOURCE_FINGERPRINT_KEY) == file_fingerprint(path).encode()
+
+
+class _TypeMismatch(Exception):
+    """A chunk with values of a column that do not fit its inferred type."""
+
+    def __init__(self, column: str):
+        super().__init__(column)
+        self.column = column
+
+
+def _infer_dtypes(path: Path, parse_dates: List[str], chunksize: int) -> dict:
+    """Infer column types from the first chunk, widened later if another chunk does not fit."""
+    sample = pd.read_csv(path, compression=COMPRESSION, nrows=chunksize)
+    dtypes = {}
+    for column, dtype in sample.dtypes.items():
+        if column in parse_dates:
+            continue
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = "Int64"
+        elif pd.api.types.is_float_dtype(dtype) and sample[column].notna().any():
+            dtypes[column] = "float64"
+        else:
+            # Text columns, and columns with no value to infer a type from
+            dtypes[column] = "str"
+    return dtypes
+
+
+def build_parquet_cache(
+    path: Path,
+    parse_dates: Optional[List[str]] = None,
+    chunksize: int = CONVERSION_CHUNKSIZE,
+) -> Path:
+    """Convert a raw `.csv.gz` table into a Parquet file with typed timestamps.
+
+    The conversion streams the CSV in chunks, so it never holds the whole table in memory.
+    The fingerprint of the source file is stored in the Parquet metadata to detect stale copies.
+    """
+    parse_dates = [str(c) for c in parse_dates or []]
+    cache_path = raw_cache_path(path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    logger.info(f"[BUILDING PARQUET CACHE FOR {path}]")
+
+    dtypes = _infer_dtypes(path, parse_dates, chunksize)
+    while True:
+        try:
+            _write_parquet(path, tmp_path, dtypes, parse_dates, chunksize)
+            break
+        except _TypeMismatch as mismatch:
+            # e.g. text values after numeric ones, the conversion starts again
+            column = mismatch.column
+            dtypes[column] = WIDER_DTYPES[dtypes[column]]
+            logger.info(f"[CONVERTING {column} OF {path} AS {dtypes[column]}]")
+    tmp_path.replace(cache_path)
+    logger.info(f"[SUCCESSFULLY CACHED {path} TO {cache_path}]")
+    return cache_path
+
+
+def _typed_chunk(chunk: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    for column, dtype in dtypes.items():
+        if dtype == "str":
+            continue
+        try:
+            chunk[column] = chunk[column].astype(dtype)
+        except (TypeError, ValueError) as error:
+            raise _TypeMismatch(column) from error
+    return chunk
+
+
+def _write_parquet(
+    path: Path, tmp_path: Path, dtypes: dict, parse_dates: List[str], chunksize: int
+) -> None:
+    """Write the chunks of a CSV to a Parquet file, with the schema of the first chunk."""
+    writer, schema = None, None
+    try:
+        # Text is read as text, so that codes such as "0010" keep their leading zeros
+        for chunk in pd.read_csv(
+            path,
+            compression=COMPRESSION,
+            dtype={column: "str" for column, dtype in dtypes.items() if dtype == "str"},
+            parse_dates=parse_dates or None,
+            chunksize=chunksize,
+            low_memory=False,
+        ):
+            table = pa.Table.from_pandas(
+                _typed_chunk(chunk, dtypes), preserve_index=False
+            )
+            if writer is None:
+                schema = table.schema.remove_metadata().with_metadata(
+                    {SOURCE_FINGERPRINT_KEY: file_fingerprint(path)}
+                )
+                writer = pq.ParquetWriter(
+                    tmp_path, schema, compression=CACHE_COMPRESSION
+                )
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _to_frame(
+    table: pa.Table, parse_dates: List[str], dtype: Optional[Dict[str, str]]
+) -> pd.DataFrame:
+    df = table.to_pandas()
+    for column in parse_dates:
+        # Columns cached as text are parsed on read, like read_csv would do
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(
+            df[column]
+        ):
+            df[column] = pd.to_datetime(df[column])
+    return apply_dtypes(df, dtype or {})
+
+
+def _unique_keys(keys: Collection) -> pd.Series:
+    return pd.Series(list(keys)).drop_duplicates()
+
+
+def _filtered_tables(
+    path: Path,
+    columns: Optional[List[str]],
+    chunksize: Optional[int],
+    key_column: str,
+    keys: Collection,
+) -> Iterator[pa.Table]:
+    """Scan a Parquet file keeping only the rows whose key is in keys, before converting them to pandas."""
+    dataset = ds.dataset(path, format="parquet")
+    value_set = pa.array(_unique_keys(keys)).cast(dataset.schema.field(key_column).type)
+    scanner = dataset.scanner(
+        columns=columns,
+        filter=ds.field(key_column).isin(value_set),
+        **({"batch_size": chunksize} if chunksize else {}),
+    )
+    if chunksize is None:
+        yield scanner.to_table()
+        return
+    # Regroup the filtered batches into chunks of about chunksize rows
+    pending, nb_rows, nb_chunks = [], 0, 0
+    for batch in scanner.to_batches():
+        pending.append(batch)
+        nb_rows += batch.num_rows
+        if nb_rows >= chunksize:
+            yield pa.Table.from_batches(pending)
+            pending, nb_rows, nb_chunks = [], 0, nb_chunks + 1
+    if pending or nb_chunks == 0:
+        yield pa.Table.from_batches(pending, schema=scanner.projected_schema)
+
+
+def _parquet_tables(
+    path: Path,
+    columns: Optional[List[str]],
+    chunksize: Optional[int],
+    key_column: Optional[str],
+    keys: Optional[Collection],
+) -> Iterator[pa.Table]:
+    if key_column is not None:
+        yield from _filtered_tables(path, columns, chunksize, key_column, keys)
+    elif chunksize is None:
+        yield pq.read_table(path, columns=columns)
+    else:
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunksize, columns=columns
+        ):
+            yield pa.Table.from_batches([batch])
+
+
+def read_parquet_cache(
+    path: Path,
+    parse_dates: Optional[List[str]] = None,
+    usecols: Optional[List[str]] = None,
+    chunksize: Optional[int] = None,
+    key_column: Optional[str] = None,
+    keys: Optional[Collection] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    max_in_flight: Optional[int] = None,
+) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Read the Parquet copy of a raw table, with the semantics of `pd.read_csv`."""
+    parse_dates = [str(c) for c in parse_dates or []]
+    cache_path = raw_cache_path(path)
+    columns = None
+    if usecols is not None:
+        # Like read_csv, keep the file column order whatever the order of usecols
+        wanted = {str(c) for c in usecols}
+        columns = [c for c in pq.read_schema(cache_path).names if c in wanted]
+    tables = _parquet_tables(cache_path, columns, chunksize, key_column, keys)
+    frames = (_to_frame(table, parse_dates, dtype) for table in tables)
+    return frames if chunksize is not None else next(frames)
+
+
+def _filter_csv_chunk(
+    chunk: pd.DataFrame,
+    parse_dates: List[str],
+    key_column: str,
+    keys: pd.Series,
+    usecols: Optional[List[str]],
+) -> pd.DataFrame:
+    chunk = chunk[chunk[key_column].isin(keys)]
+    if usecols is not None and key_column not in usecols:
+        chunk = chunk.drop(columns=key_column)
+    # Dates are only parsed for the rows that passed the filter
+    for column in parse_dates:
+        chunk[column] = pd.to_datetime(chunk[column])
+    return chunk
+
+
+def read_csv_filtered(
+    path: Path,
+    parse_dates: Optional[List[str]] = None,
+    usecols: Optional[List[str]] = None,
+    chunksize: Optional[int] = None,
+    key_column: str = None,
+    keys: Collection = None,
+    dtype: Optional[Dict[str, str]] = None,
+    max_in_flight: Optional[int] = None,
+) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Read a raw CSV table keeping only the rows whose key is in keys, parsing dates after the filter."""
+    parse_dates = [str(c) for c in parse_dates or []]
+    keys = _unique_keys(keys)
+    read_cols = None
+    if usecols is not None:
+        read_cols = list(dict.fromkeys([str(c) for c in usecols] + [key_column]))
+    reader = pd.read_csv(
+        path,
+        compression=COMPRESSION,
+        usecols=read_cols,
+        chunksize=chunksize,
+        dtype=dtype,
+    )
+    if chunksize is None:
+        return _filter_csv_chunk(reader, parse_dates, key_column, keys, usecols)
+    return (
+        _filter_csv_chunk(chunk, parse_dates, key_column, keys, usecols)
+        for chunk in reader
+    )
+
+
+def _parse_member(
+    data: bytes,
+    parse_dates: List[str],
+    usecols: Optional[List[str]],
+    key_column: Optional[str],
+    keys: Optional[pd.Series],
+    dtype: Optional[Dict[str, str]],
+) -> pd.DataFrame:
+    if key_column is None:
+        return pd.read_csv(
+            io.BytesIO(data), parse_dates=parse_dates, usecols=usecols, dtype=dtype
+        )
+    read_cols = None
+    if usecols is not None:
+        read_cols = list(dict.fromkeys([str(c) for c in usecols] + [key_column]))
+    chunk = pd.read_csv(io.BytesIO(data), usecols=read_cols, dtype=dtype)
+    return _filter_csv_chunk(chunk, parse_dates, key_column, keys, usecols)
+
+
+def read_csv_members(
+    path: Path,
+    parse_dates: Optional[List[str]] = None,
+    usecols: Optional[List[str]] = None,
+    key_column: Optional[str] = None,
+    keys: Optional[Collection] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """Read the multi-member gzip copy of a raw table, one chunk per member parsed in parallel."""
+    parse_dates = [str(c) for c in parse_dates or []]
+    if key_column is not None:
+        keys = _unique_keys(keys)
+    return read_members(
+        path,
+        partial(
+            _parse_member,
+            parse_dates=parse_dates,
+            usecols=usecols,
+            key_column=key_column,
+            keys=keys,
+            dtype=dtype,
+        ),
+        max_in_flight=max_in_flight,
+    )
+
+
+def read_raw(
+    path: Path,
+    parse_dates: Optional[List[str]] = None,
+    usecols: Optional[List[str]] = None,
+    chunksize: Optional[int] = None,
+    key_column: Optional[str] = None,
+    keys: Optional[Collection] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    max_in_flight: Optional[int] = None,
+) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Read a raw table, from its Parquet copy when it is up to date, otherwise from the CSV.
+
+    When keys are given, only the rows whose key_column value is in keys are returned. The filter
+    is applied before the rows are converted to pandas or their dates are parsed, so reading a
+    cohort costs in proportion to the cohort rather than to the table.
+
+    Without Parquet copy, the multi-member gzip copy of the CSV is read when it is up to date, its
+    members being decompressed and parsed in parallel. Its chunks are then its members, whatever
+    chunksize, and at most max_in_flight members (2 * the read workers by default) are held in
+    memory at once besides the ones already yielded.
+
+    The columns listed in dtype are read with these types, whichever file is read.
+    """
+    if keys is None:
+        key_column = None
+    if is_cache_fresh(path):
+        return read_parquet_cache(
+            path, parse_dates, usecols, chunksize, key_column, keys, dtype
+        )
+    if is_member_copy_fresh(path):
+        chunks = read_csv_members(
+            path, parse_dates, usecols, key_column, keys, dtype, max_in_flight
+        )
+        return chunks if chunksize is not None else concat_frames(list(chunks))
+    if key_column is not None:
+        return read_csv_filtered(
+            path, parse_dates, usecols, chunksize, key_column, keys, dtype
+        )
+    return pd.read_csv(
+        path,
+        compression=COMPRESSION,
+        parse_dates=parse_dates,
+        usecols=usecols,
+        chunksize=chunksize,
+        dtype=dtype,
+    )
@@ -1,4 +1,8 @@
+from typing import Optional
+
 import pandas as pd
+from pipeline.extract.parquet_tools import read_raw
+from pipeline.extract.table_registry import table_registry
 from pipeline.file_info.raw.hosp import (
     HOSP_PATIENTS_PATH,
     HOSP_ADMISSIONS_PATH,
@@ -6,69 +10,114 @@ from pipeline.file_info.raw.hosp import (
     HOSP_LAB_EVENTS_PATH,
     HOSP_PROCEDURES_ICD_PATH,
     HOSP_PREDICTIONS_PATH,
+    PATIENTS_DTYPES,
+    ADMISSIONS_DTYPES,
+    DIAGNOSES_ICD_DTYPES,
+    LAB_EVENTS_DTYPES,
+    PROCEDURES_ICD_DTYPES,
+    PRESCRIPTIONS_DTYPES,
     PatientsHeader,
     AdmissionsHeader,
     LabEventsHeader,
     ProceduresIcdHeader,
     PrescriptionsHeader,
 )
-
-COMPRESSION = "gzip"
+from pipeline.profiling import profiled
 
 
+@profiled
 def load_patients() -> pd.DataFrame:
-    return pd.read_csv(
+    return table_registry.get(
         HOSP_PATIENTS_PATH,
-        compression=COMPRESSION,
-        parse_dates=[PatientsHeader.DOD],
+        None,
+        lambda: read_raw(
+            HOSP_PATIENTS_PATH,
+            parse_dates=[PatientsHeader.DOD],
+            dtype=PATIENTS_DTYPES,
+        ),
     )
 
 
+@profiled
 def load_admissions() -> pd.DataFrame:
-    return pd.read_csv(
+    return table_registry.get(
         HOSP_ADMISSIONS_PATH,
-        compression=COMPRESSION,
-        parse_dates=[
-            AdmissionsHeader.ADMITTIME.value,
-            AdmissionsHeader.DISCHTIME.value,
-        ],
+        None,
+        lambda: read_raw(
+            HOSP_ADMISSIONS_PATH,
+            parse_dates=[
+                AdmissionsHeader.ADMITTIME.value,
+                AdmissionsHeader.DISCHTIME.value,
+            ],
+            dtype=ADMISSIONS_DTYPES,
+        ),
     )
 
 
+@profiled
 def load_diagnosis_icd() -> pd.DataFrame:
-    return pd.read_csv(HOSP_DIAGNOSES_ICD_PATH, compression=COMPRESSION)
+    return table_registry.get(
+        HOSP_DIAGNOSES_ICD_PATH,
+        None,
+        lambda: read_raw(HOSP_DIAGNOSES_ICD_PATH, dtype=DIAGNOSES_ICD_DTYPES),
+    )
 
 
-def load_lab_events(chunksize: int, use_cols=None) -> pd.DataFrame:
-    return pd.read_csv(
+@profiled
+def load_lab_events(
+    chunksize: int,
+    use_cols=None,
+    subject_ids=None,
+    max_in_flight: Optional[int] = None,
+) -> pd.DataFrame:
+    """Load lab events in chunks, restricted to the given patients if any.
+
+    From the multi-member gzip copy, the chunks are its members, at most max_in_flight of them
+    being read ahead at once.
+    """
+    return read_raw(
         HOSP_LAB_EVENTS_PATH,
-        compression=COMPRESSION,
         parse_dates=[LabEventsHeader.CHART_TIME],
         chunksize=chunksize,
         usecols=use_cols,
+        key_column=LabEventsHeader.PATIENT_ID,
+        keys=subject_ids,
+        dtype=LAB_EVENTS_DTYPES,
+        max_in_flight=max_in_flight,
     )
 
 
+@profiled
 def load_procedures_icd() -> pd.DataFrame:
-    return pd.read_csv(
+    return table_registry.get(
         HOSP_PROCEDURES_ICD_PATH,
-        compression=COMPRESSION,
-        parse_dates=[ProceduresIcdHeader.CHART_DATE.value],
-    ).drop_duplicates()
+        None,
+        lambda: read_raw(
+            HOSP_PROCEDURES_ICD_PATH,
+            parse_dates=[ProceduresIcdHeader.CHART_DATE.value],
+            dtype=PROCEDURES_ICD_DTYPES,
+        ).drop_duplicates(),
+    )
 
 
+@profiled
 def load_prescriptions() -> pd.DataFrame:
-    return pd.read_csv(
+    usecols = [
+        PrescriptionsHeader.PATIENT_ID,
+        PrescriptionsHeader.HOSPITAL_ADMISSION_ID,
+        PrescriptionsHeader.DRUG,
+        PrescriptionsHeader.START_TIME,
+        PrescriptionsHeader.STOP_TIME,
+        PrescriptionsHeader.NDC,
+        PrescriptionsHeader.DOSE_VAL_RX,
+    ]
+    return table_registry.get(
         HOSP_PREDICTIONS_PATH,
-        compression=COMPRESSION,
-        usecols=[
-            PrescriptionsHeader.PATIENT_ID,
-            PrescriptionsHeader.HOSPITAL_ADMISSION_ID,
-            PrescriptionsHeader.DRUG,
-            PrescriptionsHeader.START_TIME,
-            PrescriptionsHeader.STOP_TIME,
-            PrescriptionsHeader.NDC,
-            PrescriptionsHeader.DOSE_VAL_RX,
-        ],
-        parse_dates=[PrescriptionsHeader.START_TIME, PrescriptionsHeader.STOP_TIME],
+        usecols,
+        lambda: read_raw(
+            HOSP_PREDICTIONS_PATH,
+            usecols=usecols,
+            parse_dates=[PrescriptionsHeader.START_TIME, PrescriptionsHeader.STOP_TIME],
+            dtype=PRESCRIPTIONS_DTYPES,
+        ),
     )
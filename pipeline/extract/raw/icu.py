@@ -1,59 +1,100 @@
+from typing import Optional
+
 import pandas as pd
+from pipeline.extract.parquet_tools import read_raw
+from pipeline.extract.table_registry import table_registry
 from pipeline.file_info.raw.icu import (
     ICUSTAY_PATH,
     OUTPUT_EVENT_PATH,
     CHART_EVENTS_PATH,
     INPUT_EVENT_PATH,
     PROCEDURE_EVENTS_PATH,
+    ICUSTAYS_DTYPES,
+    OUTPUT_EVENTS_DTYPES,
+    CHART_EVENTS_DTYPES,
+    INPUT_EVENTS_DTYPES,
+    PROCEDURE_EVENTS_DTYPES,
     IcuStaysHeader,
     ChartEventsHeader,
     OutputEventsHeader,
     InputEventsHeader,
     ProceduresEventsHeader,
 )
-
-COMPRESSION = "gzip"
+from pipeline.profiling import profiled
 
 
+@profiled
 def load_icustays() -> pd.DataFrame:
-    return pd.read_csv(
+    return table_registry.get(
         ICUSTAY_PATH,
-        compression=COMPRESSION,
-        parse_dates=[IcuStaysHeader.INTIME, IcuStaysHeader.OUTTIME],
+        None,
+        lambda: read_raw(
+            ICUSTAY_PATH,
+            parse_dates=[IcuStaysHeader.INTIME, IcuStaysHeader.OUTTIME],
+            dtype=ICUSTAYS_DTYPES,
+        ),
     )
 
 
+@profiled
 def load_output_events() -> pd.DataFrame:
-    return pd.read_csv(
+    return table_registry.get(
         OUTPUT_EVENT_PATH,
-        compression=COMPRESSION,
-        parse_dates=[OutputEventsHeader.CHART_TIME],
-    ).drop_duplicates()
+        None,
+        lambda: read_raw(
+            OUTPUT_EVENT_PATH,
+            parse_dates=[OutputEventsHeader.CHART_TIME],
+            dtype=OUTPUT_EVENTS_DTYPES,
+        ).drop_duplicates(),
+    )
 
 
-def load_chart_events(chunksize: int) -> pd.DataFrame:
-    return pd.read_csv(
+@profiled
+def load_chart_events(
+    chunksize: int, stay_ids=None, max_in_flight: Optional[int] = None
+) -> pd.DataFrame:
+    """Load chart events in chunks, restricted to the given ICU stays if any.
+
+    From the multi-member gzip copy, the chunks are its members, at most max_in_flight of them
+    being read ahead at once.
+    """
+    return read_raw(
         CHART_EVENTS_PATH,
-        compression=COMPRESSION,
         usecols=[c for c in ChartEventsHeader],
         parse_dates=[ChartEventsHeader.CHARTTIME],
         chunksize=chunksize,
+        key_column=ChartEventsHeader.STAY_ID,
+        keys=stay_ids,
+        dtype=CHART_EVENTS_DTYPES,
+        max_in_flight=max_in_flight,
     )
 
 
+@profiled
 def load_input_events() -> pd.DataFrame:
-    return pd.read_csv(
+    usecols = [f for f in InputEventsHeader]
+    return table_registry.get(
         INPUT_EVENT_PATH,
-        compression=COMPRESSION,
-        usecols=[f for f in InputEventsHeader],
-        parse_dates=[InputEventsHeader.STARTTIME, InputEventsHeader.ENDTIME],
+        usecols,
+        lambda: read_raw(
+            INPUT_EVENT_PATH,
+            usecols=usecols,
+            parse_dates=[InputEventsHeader.STARTTIME, InputEventsHeader.ENDTIME],
+            dtype=INPUT_EVENTS_DTYPES,
+        ),
     )
 
 
+@profiled
 def load_procedure_events() -> pd.DataFrame:
-    return pd.read_csv(
+    usecols = [h for h in ProceduresEventsHeader]
+    return table_registry.get(
         PROCEDURE_EVENTS_PATH,
-        compression=COMPRESSION,
-        usecols=[h for h in ProceduresEventsHeader],
-        parse_dates=[ProceduresEventsHeader.START_TIME],
-    ).drop_duplicates()
+        usecols,
+        lambda: read_raw(
+            PROCEDURE_EVENTS_PATH,
+            usecols=usecols,
+            parse_dates=[ProceduresEventsHeader.START_TIME],
+            dtype=PROCEDURE_EVENTS_DTYPES,
+        ).drop_duplicates(),
+    )
@@ -0,0 +1,29 @@
+from pathlib import Path
+from typing import List
+
+from pipeline.extract.gzip_members import (
+    MEMBER_BYTES,
+    build_member_copy,
+    is_member_copy_fresh,
+)
+from pipeline.file_info.raw.hosp import HOSP_LAB_EVENTS_PATH
+from pipeline.file_info.raw.icu import CHART_EVENTS_PATH
+
+# Raw tables read in chunks, large enough for a single decompressor to be the bottleneck
+MEMBER_COPY_TABLES: List[Path] = [CHART_EVENTS_PATH, HOSP_LAB_EVENTS_PATH]
+
+
+def build_member_cache(
+    member_bytes: int = MEMBER_BYTES, force: bool = False
+) -> List[Path]:
+    """One-time recompression of the large raw tables into multi-member gzip copies.
+
+    Once built, the loaders of `pipeline.extract.raw` read the copies automatically, unless the
+    table has an up to date Parquet copy.
+    """
+    built = []
+    for path in MEMBER_COPY_TABLES:
+        if not path.exists() or (is_member_copy_fresh(path) and not force):
+            continue
+        built.append(build_member_copy(path, member_bytes))
+    return built
@@ -0,0 +1,66 @@
+from pathlib import Path
+from typing import Dict, List
+
+from pipeline.extract.parquet_tools import (
+    CONVERSION_CHUNKSIZE,
+    build_parquet_cache,
+    is_cache_fresh,
+)
+from pipeline.file_info.raw.hosp import (
+    HOSP_PATIENTS_PATH,
+    HOSP_ADMISSIONS_PATH,
+    HOSP_DIAGNOSES_ICD_PATH,
+    HOSP_LAB_EVENTS_PATH,
+    HOSP_PROCEDURES_ICD_PATH,
+    HOSP_PREDICTIONS_PATH,
+    PatientsHeader,
+    AdmissionsHeader,
+    LabEventsHeader,
+    ProceduresIcdHeader,
+    PrescriptionsHeader,
+)
+from pipeline.file_info.raw.icu import (
+    ICUSTAY_PATH,
+    OUTPUT_EVENT_PATH,
+    CHART_EVENTS_PATH,
+    INPUT_EVENT_PATH,
+    PROCEDURE_EVENTS_PATH,
+    IcuStaysHeader,
+    ChartEventsHeader,
+    OutputEventsHeader,
+    InputEventsHeader,
+    ProceduresEventsHeader,
+)
+
+# Raw tables with the columns stored as timestamps in their Parquet copy
+RAW_TABLE_DATE_COLUMNS: Dict[Path, List[str]] = {
+    HOSP_PATIENTS_PATH: [PatientsHeader.DOD],
+    HOSP_ADMISSIONS_PATH: [AdmissionsHeader.ADMITTIME, AdmissionsHeader.DISCHTIME],
+    HOSP_DIAGNOSES_ICD_PATH: [],
+    HOSP_LAB_EVENTS_PATH: [LabEventsHeader.CHART_TIME],
+    HOSP_PROCEDURES_ICD_PATH: [ProceduresIcdHeader.CHART_DATE],
+    HOSP_PREDICTIONS_PATH: [
+        PrescriptionsHeader.START_TIME,
+        PrescriptionsHeader.STOP_TIME,
+    ],
+    ICUSTAY_PATH: [IcuStaysHeader.INTIME, IcuStaysHeader.OUTTIME],
+    OUTPUT_EVENT_PATH: [OutputEventsHeader.CHART_TIME],
+    CHART_EVENTS_PATH: [ChartEventsHeader.CHARTTIME],
+    INPUT_EVENT_PATH: [InputEventsHeader.STARTTIME, InputEventsHeader.ENDTIME],
+    PROCEDURE_EVENTS_PATH: [ProceduresEventsHeader.START_TIME],
+}
+
+
+def build_raw_cache(
+    chunksize: int = CONVERSION_CHUNKSIZE, force: bool = False
+) -> List[Path]:
+    """One-time conversion of the raw tables into Parquet, skipping the copies already up to date.
+
+    Once built, the loaders of `pipeline.extract.raw` read the Parquet copies automatically.
+    """
+    built = []
+    for path, parse_dates in RAW_TABLE_DATE_COLUMNS.items():
+        if not path.exists() or (is_cache_fresh(path) and not force):
+            continue
+        built.append(build_parquet_cache(path, parse_dates, chunksize))
+    return built
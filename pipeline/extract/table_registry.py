@@ -0,0 +1,124 @@
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+from pipeline.extract.fingerprint import file_fingerprint
+
+logger = logging.getLogger()
+
+DEFAULT_MAX_BYTES = 8 * 1024**3
+
+
+def table_bytes(df: pd.DataFrame) -> int:
+    """Memory of a table, only its columns of Python objects being measured deeply."""
+    size = df.index.memory_usage()
+    for _, column in df.items():
+        # Strings are Python objects without pyarrow
+        deep = (
+            column.dtype == object or getattr(column.dtype, "storage", "") == "python"
+        )
+        size += column.memory_usage(index=False, deep=deep)
+    return int(size)
+
+
+class TableRegistry:
+    """
+    Process-wide memo of the raw tables returned by the loaders.
+
+    Tables are keyed by their file, their projected columns and the fingerprint of the file, so
+    a table is loaded again once its file changes. The least recently used tables are evicted
+    when the memory of the registered tables exceeds max_bytes, also as soon as max_bytes is
+    lowered, and a table larger than the budget is returned without being registered.
+
+    Callers get shallow copies of the registered tables. With the Copy-on-Write of pandas 3, which
+    requirements.txt pins, modifying a copy, e.g. adding a column, copies the data it touches and
+    leaves the registered table intact.
+
+    Attributes:
+        max_bytes (int): Memory budget of the registered tables.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._tables: OrderedDict[Tuple, pd.DataFrame] = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._loading_locks = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def get(
+        self,
+        path: Path,
+        columns: Optional[List[Hashable]],
+        load: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """Returns the registered table of the file with these columns, loading it if needed."""
+        table_key = (str(path), tuple(columns) if columns is not None else None)
+        key = table_key + (file_fingerprint(path),)
+        with self._lock:
+            loading_lock = self._loading_locks.setdefault(table_key, threading.Lock())
+        # Concurrent requests of the same table wait for a single load
+        with loading_lock:
+            with self._lock:
+                if key in self._tables:
+                    self._tables.move_to_end(key)
+                    return self._tables[key].copy(deep=False)
+            df = load()
+            self._register(key, df)
+        return df.copy(deep=False)
+
+    def _register(self, key: Tuple, df: pd.DataFrame) -> None:
+        size = table_bytes(df)
+        with self._lock:
+            # Older versions of the same table are not used anymore
+            for stale_key in [k for k in self._tables if k[:2] == key[:2]]:
+                self._drop(stale_key)
+            if size > self.max_bytes:
+                logger.info(f"[{key[0]} EXCEEDS THE TABLE REGISTRY BUDGET]")
+                return
+            self._tables[key] = df
+            self._sizes[key] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop the least recently used tables until the registered tables fit in max_bytes."""
+        while self.nbytes > self.max_bytes:
+            self._drop(next(iter(self._tables)))
+
+    def _drop(self, key: Tuple) -> None:
+        del self._tables[key]
+        del self._sizes[key]
+        self._drop_loading_lock(key[:2])
+
+    def _drop_loading_lock(self, table_key: Tuple) -> None:
+        # The lock of a table being loaded is kept, so that its concurrent requests still wait
+        loading_lock = self._loading_locks.get(table_key)
+        if loading_lock is not None and not loading_lock.locked():
+            del self._loading_locks[table_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self._sizes.clear()
+            for table_key in list(self._loading_locks):
+                self._drop_loading_lock(table_key)
+
+
+table_registry = TableRegistry()
@@ -0,0 +1,38 @@
+from enum import StrEnum
+from pipeline.file_info.path_prefix import CACHE_PATH
+
+"""
+Locations of the on-disk caches derived from the raw and static tables.
+Everything under CACHE_PATH can be deleted safely, the pipeline then reads the sources again.
+"""
+
+RAW_CACHE_PATH = CACHE_PATH / "raw"
+PARQUET_SUFFIX = ".parquet"
+# Multi-member gzip copies of the large raw tables, with the offsets of their members
+GZIP_MEMBERS_CACHE_PATH = CACHE_PATH / "gzip_members"
+MEMBER_INDEX_SUFFIX = ".members.json"
+ICD_ROOT_INDEX_PATH = CACHE_PATH / "icd_root_hadm_index.npz"
+UOM_DECISIONS_PATH = CACHE_PATH / "uom"
+CODE_MAP_CACHE_PATH = CACHE_PATH / "code_map"
+ICD_9_TO_10_CACHE_PATH = CODE_MAP_CACHE_PATH / "icd_9_to_10.pkl"
+NDC_MAP_CACHE_PATH = CODE_MAP_CACHE_PATH / "ndc_map.pkl"
+FEATURE_CACHE_PATH = CACHE_PATH / "features"
+# Features extracted by worker processes, until the parent process reads them
+FEATURE_SPILL_PATH = CACHE_PATH / "feature_spill"
+
+
+class UomDecisionHeader(StrEnum):
+    ITEM_ID = "itemid"
+    MOST_FREQUENT_UOM = "valueuom"  # Most frequent unit of the item
+    SHARE = "share"  # Share of the item rows recorded with that unit
+    KEEP_ONLY_MOST_FREQUENT = (
+        "keep_only_most_frequent"  # Whether the rows with other units are dropped
+    )
+
+
+UOM_DECISION_DTYPES = {
+    UomDecisionHeader.ITEM_ID: "int64",
+    UomDecisionHeader.MOST_FREQUENT_UOM: "str",
+    UomDecisionHeader.SHARE: "float64",
+    UomDecisionHeader.KEEP_ONLY_MOST_FREQUENT: "bool",
+}
@@ -5,3 +5,4 @@ DATA_ROOT = Path("data")
 RAW_PATH = DATA_ROOT / "mimiciv_2_0"
 PREPROC_PATH = DATA_ROOT / "preproc"
 MAPPING_PATH = DATA_ROOT / "mappings"
+CACHE_PATH = DATA_ROOT / "cache"
@@ -9,3 +9,10 @@ class ChartEventsFeatureHeader(StrEnum):
     ITEM_ID = "itemid"
     VALUE_NUM = "valuenum"
     EVENT_TIME_FROM_ADMIT = "event_time_from_admit"
+
+
+CHART_EVENTS_FEATURE_DTYPES = {
+    ChartEventsFeatureHeader.STAY_ID: "int32",
+    ChartEventsFeatureHeader.ITEM_ID: "int32",
+    ChartEventsFeatureHeader.VALUE_NUM: "float32",
+}
@@ -15,3 +15,10 @@ class DiagnosesFeatureHeader(StrEnum):
 
 class DiagnosesFeatureWithIcuHeader(StrEnum):
     STAY_ID = "stay_id"
+
+
+DIAGNOSES_FEATURE_DTYPES = {
+    DiagnosesFeatureHeader.PATIENT_ID: "int32",
+    DiagnosesFeatureHeader.HOSPITAL_ADMISSION_ID: "int32",
+    DiagnosesFeatureWithIcuHeader.STAY_ID: "int32",
+}
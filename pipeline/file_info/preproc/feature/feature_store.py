@@ -0,0 +1,25 @@
+from enum import StrEnum
+from pipeline.file_info.preproc.feature.path_prefix import FEATURE_PREPROC_PATH
+
+"""
+Features sorted by stay or admission, one directory of memory-mappable .npy files per feature.
+"""
+
+FEATURE_STORE_PATH = FEATURE_PREPROC_PATH / "store"
+
+
+class FeatureStoreFile(StrEnum):
+    COLUMNS = "columns"  # Directory of one <column>.npy per column, in id order
+    IDS = "ids.npy"  # Sorted unique stay or admission ids
+    OFFSETS = (
+        "offsets.npy"  # int64 (ids + 1), rows of ids[i] are offsets[i]:offsets[i + 1]
+    )
+    META = (
+        "meta.json"  # Id column, rows, column types and columns of lists, written last
+    )
+
+
+# Suffix of the values of the columns of strings, stored as int32 codes
+CATEGORIES_SUFFIX = ".categories.npy"
+# Suffix of the offsets of the list of each row in the flattened values of a column of lists
+LIST_OFFSETS_SUFFIX = ".offsets.npy"
@@ -12,3 +12,11 @@ class LabEventsFeatureHeader(StrEnum):
     ADMIT_TIME = "admittime"
     LAB_TIME_FROM_ADMIT = "lab_time_from_admit"
     VALUE_NUM = "valuenum"
+
+
+LAB_EVENTS_FEATURE_DTYPES = {
+    LabEventsFeatureHeader.PATIENT_ID: "int32",
+    LabEventsFeatureHeader.HOSPITAL_ADMISSION_ID: "int32",
+    LabEventsFeatureHeader.ITEM_ID: "int32",
+    LabEventsFeatureHeader.VALUE_NUM: "float32",
+}
@@ -28,3 +28,14 @@ class MedicationsFeatureWithoutIcuHeader(StrEnum):
     NON_PROPRIEATARY_NAME = "nonproprietaryname"
     DOSE_VAL_RX = "dose_val_rx"
     EPC = "EPC"
+
+
+MEDICATIONS_FEATURE_DTYPES = {
+    MedicationsFeatureHeader.PATIENT_ID: "int32",
+    MedicationsFeatureHeader.HOSPITAL_ADMISSION_ID: "int32",
+    MedicationsFeatureWithIcuHeader.STAY_ID: "int32",
+    MedicationsFeatureWithIcuHeader.ITEM_ID: "int32",
+    MedicationsFeatureWithIcuHeader.RATE: "float32",
+    MedicationsFeatureWithIcuHeader.AMOUNT: "float32",
+    MedicationsFeatureWithIcuHeader.ORDER_ID: "int32",
+}
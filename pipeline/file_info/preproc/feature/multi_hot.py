@@ -0,0 +1,19 @@
+from enum import StrEnum
+from pipeline.file_info.preproc.feature.path_prefix import FEATURE_PREPROC_PATH
+
+"""
+Sparse multi-hot matrices of the codes of the diagnoses, procedures and medications.
+"""
+
+MULTI_HOT_PATH = FEATURE_PREPROC_PATH / "multi_hot"
+
+
+class MultiHotFile(StrEnum):
+    MATRIX = "matrix.npz"  # CSR matrix (ids, codes) saved with scipy.sparse.save_npz
+    IDS = "ids.npy"  # Stay or admission ids of the rows, in cohort order
+    VOCABULARY = "vocabulary.csv"  # Code of each column
+
+
+class VocabularyHeader(StrEnum):
+    GROUP = "group"  # Feature group of the code
+    CODE = "code"  # ICD root, procedure code or item id, pharmacologic class or item id
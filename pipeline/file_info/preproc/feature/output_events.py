@@ -12,3 +12,11 @@ class OutputEventsFeatureHeader(StrEnum):
     CHART_TIME = "charttime"
     IN_TIME = "intime"
     EVENT_TIME_FROM_ADMIT = "event_time_from_admit"
+
+
+OUTPUT_EVENTS_FEATURE_DTYPES = {
+    OutputEventsFeatureHeader.PATIENT_ID: "int32",
+    OutputEventsFeatureHeader.HOSPITAL_ADMISSION_ID: "int32",
+    OutputEventsFeatureHeader.STAY_ID: "int32",
+    OutputEventsFeatureHeader.ITEM_ID: "int32",
+}
@@ -26,3 +26,12 @@ class ProceduresFeatureWithoutIcuHeader(StrEnum):
     CHART_DATE = "chartdate"
     ADMIT_TIME = "admittime"
     PROC_TIME_FROM_ADMIT = "proc_time_from_admit"
+
+
+PROCEDURES_FEATURE_DTYPES = {
+    ProceduresFeatureHeader.PATIENT_ID: "int32",
+    ProceduresFeatureHeader.HOSPITAL_ADMISSION_ID: "int32",
+    ProceduresFeatureWithIcuHeader.STAY_ID: "int32",
+    ProceduresFeatureWithIcuHeader.ITEM_ID: "int32",
+    ProceduresFeatureWithoutIcuHeader.ICD_VERSION: "int8",
+}
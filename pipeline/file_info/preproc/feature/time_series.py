@@ -0,0 +1,18 @@
+from enum import StrEnum
+from pipeline.file_info.preproc.feature.path_prefix import FEATURE_PREPROC_PATH
+
+"""
+Binned time series of the chart and lab events, one directory of .npy files per feature.
+"""
+
+FEATURE_TIME_SERIES_PATH = FEATURE_PREPROC_PATH / "time_series"
+CHART_EVENTS_TIME_SERIES_PATH = FEATURE_TIME_SERIES_PATH / "chart_events"
+LAB_EVENTS_TIME_SERIES_PATH = FEATURE_TIME_SERIES_PATH / "lab_events"
+
+
+class TimeSeriesFile(StrEnum):
+    VALUES = "values.npy"  # float32 (ids, buckets, items), 0 where not observed
+    MASK = "mask.npy"  # bool (ids, buckets, items), whether the bucket has observations
+    IDS = "ids.npy"  # Sorted stay or admission ids of the first axis
+    ITEMS = "items.npy"  # Sorted item ids of the last axis
+    META = "meta.json"  # Bucket width, horizon and aggregation, written last
@@ -0,0 +1,18 @@
+from enum import StrEnum
+from pipeline.file_info.path_prefix import PREPROC_PATH
+
+"""
+Watermarks of the incremental refreshes: the state of the raw tables a saved cohort was built from.
+Deleting them only makes the next refresh a full extraction.
+"""
+
+WATERMARK_PATH = PREPROC_PATH / "watermark"
+
+
+# Columns of a watermark, indexed by patient: one hash per raw table of the rows of the patient
+class WatermarkHeader(StrEnum):
+    PATIENT_ID = "subject_id"
+    PATIENTS = "patients"
+    ADMISSIONS = "admissions"
+    DIAGNOSES_ICD = "diagnoses_icd"
+    ICU_STAYS = "icustays"
@@ -0,0 +1,23 @@
+from enum import StrEnum
+from pipeline.file_info.path_prefix import DATA_ROOT
+
+"""
+Resource reports of the pipeline runs, one JSON file per profiled run.
+"""
+
+PROFILE_PATH = DATA_ROOT / "profiles"
+
+
+# Statistics of a stage in a run report, summed over the calls of the stage
+class StageStatHeader(StrEnum):
+    STAGE = "stage"  # Qualified name of the profiled function
+    CALLS = "calls"
+    WALL_SECONDS = "wall_seconds"  # Including the stages called by this one
+    CPU_SECONDS = "cpu_seconds"  # Of all the threads of the process
+    PEAK_RSS_MIB = "peak_rss_mib"  # Of the process during the stage
+    ROWS_IN = "rows_in"  # Rows of the DataFrames given to the stage
+    ROWS_OUT = "rows_out"  # Rows of the DataFrames returned or yielded by the stage
+    READ_BYTES = "read_bytes"  # Read by the process, page cache included
+    WRITTEN_BYTES = "written_bytes"
+    DISK_READ_BYTES = "disk_read_bytes"  # Read from the storage device
+    DISK_WRITTEN_BYTES = "disk_written_bytes"
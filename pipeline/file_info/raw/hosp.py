@@ -77,3 +77,52 @@ class PrescriptionsHeader(StrEnum):
     STOP_TIME = "stoptime"
     NDC = "ndc"
     DOSE_VAL_RX = "dose_val_rx"
+
+
+"""
+Compact column types of the hosp tables. Ids fit in 32 bits, measurements in float32, and
+low-cardinality strings are categoricals. Columns that are not listed keep their inferred type.
+"""
+
+PATIENTS_DTYPES = {
+    PatientsHeader.ID: "int32",
+    PatientsHeader.ANCHOR_YEAR: "int16",
+    PatientsHeader.ANCHOR_AGE: "int16",
+    PatientsHeader.ANCHOR_YEAR_GROUP: "category",
+    PatientsHeader.GENDER: "category",
+}
+
+ADMISSIONS_DTYPES = {
+    AdmissionsHeader.ID: "int32",
+    AdmissionsHeader.PATIENT_ID: "int32",
+    AdmissionsHeader.HOSPITAL_EXPIRE_FLAG: "int8",
+    AdmissionsHeader.INSURANCE: "category",
+    AdmissionsHeader.RACE: "category",
+}
+
+DIAGNOSES_ICD_DTYPES = {
+    DiagnosesIcdHeader.SUBJECT_ID: "int32",
+    DiagnosesIcdHeader.HOSPITAL_ADMISSION_ID: "int32",
+    DiagnosesIcdHeader.SEQ_NUM: "int16",
+    DiagnosesIcdHeader.ICD_VERSION: "int8",
+}
+
+LAB_EVENTS_DTYPES = {
+    LabEventsHeader.PATIENT_ID: "int32",
+    LabEventsHeader.HOSPITAL_ADMISSION_ID: "Int32",  # missing for part of the lab events
+    LabEventsHeader.ITEM_ID: "int32",
+    LabEventsHeader.VALUE_NUM: "float32",
+    LabEventsHeader.VALUE_UOM: "category",
+}
+
+PROCEDURES_ICD_DTYPES = {
+    ProceduresIcdHeader.PATIENT_ID: "int32",
+    ProceduresIcdHeader.HOSPITAL_ADMISSION_ID: "int32",
+    ProceduresIcdHeader.SEQ_NUM: "int16",
+    ProceduresIcdHeader.ICD_VERSION: "int8",
+}
+
+PRESCRIPTIONS_DTYPES = {
+    PrescriptionsHeader.PATIENT_ID: "int32",
+    PrescriptionsHeader.HOSPITAL_ADMISSION_ID: "int32",
+}
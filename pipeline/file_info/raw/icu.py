@@ -57,3 +57,43 @@ class ProceduresEventsHeader(StrEnum):
     STAY_ID = "stay_id"
     START_TIME = "starttime"
     ITEM_ID = "itemid"
+
+
+"""
+Compact column types of the icu tables. Ids fit in 32 bits, measurements in float32, and
+low-cardinality strings are categoricals. Columns that are not listed keep their inferred type.
+"""
+
+ICUSTAYS_DTYPES = {
+    IcuStaysHeader.PATIENT_ID: "int32",
+    IcuStaysHeader.ID: "int32",
+    IcuStaysHeader.HOSPITAL_ADMISSION_ID: "int32",
+}
+
+OUTPUT_EVENTS_DTYPES = {
+    OutputEventsHeader.SUBJECT_ID: "int32",
+    OutputEventsHeader.HOSPITAL_ADMISSION_ID: "int32",
+    OutputEventsHeader.STAY_ID: "int32",
+    OutputEventsHeader.ITEM_ID: "int32",
+}
+
+CHART_EVENTS_DTYPES = {
+    ChartEventsHeader.STAY_ID: "int32",
+    ChartEventsHeader.ITEMID: "int32",
+    ChartEventsHeader.VALUENUM: "float32",
+    ChartEventsHeader.VALUEOM: "category",
+}
+
+INPUT_EVENTS_DTYPES = {
+    InputEventsHeader.SUBJECT_ID: "int32",
+    InputEventsHeader.STAY_ID: "int32",
+    InputEventsHeader.ITEMID: "int32",
+    InputEventsHeader.RATE: "float32",
+    InputEventsHeader.AMOUNT: "float32",
+    InputEventsHeader.ORDERID: "int32",
+}
+
+PROCEDURE_EVENTS_DTYPES = {
+    ProceduresEventsHeader.STAY_ID: "int32",
+    ProceduresEventsHeader.ITEM_ID: "int32",
+}
@@ -1,93 +1,151 @@
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from typing import Union, List, Tuple
-from functools import partial
-from multiprocessing import Pool
 
 from pipeline.file_info.raw.hosp import AdmissionsHeader
 from pipeline.file_info.preproc.feature.lab_events import LabEventsFeatureHeader
+from pipeline.profiling import profiled
 
 
 INPUTED_HOSPITAL_ADMISSION_ID_HEADER = "hadm_id_new"
 
 
-def hadm_imputer(
-    charttime: pd.Timestamp,
-    hadm_old: Union[str, float],
-    hadm_ids_w_timestamps: List[Tuple[str, pd.Timestamp, pd.Timestamp]],
-) -> Tuple[str, pd.Timestamp, pd.Timestamp]:
-    """
-    Impute hospital admission ID based on the chart time and a list of admission IDs with timestamps.
-    """
+def _as_ns(times: pd.Series) -> np.ndarray:
+    """Timestamps as int64 nanoseconds, NaT being the smallest int64."""
+    return pd.to_datetime(times).to_numpy("datetime64[ns]").view("int64")
 
-    # If old HADM ID exists and is valid, use that
-    if not pd.isna(hadm_old):
-        hadm_old = str(int(hadm_old))
-        for h_id, adm_time, disch_time in hadm_ids_w_timestamps:
-            if h_id == hadm_old:
-                return hadm_old, adm_time, disch_time
-
-    # Filter and sort HADM IDs based on their proximity to the lab event charttime
-    valid_hadm_ids = [
-        (hadm_id, admittime, dischtime)
-        for hadm_id, admittime, dischtime in hadm_ids_w_timestamps
-        if admittime <= charttime <= dischtime
-    ]
-    valid_hadm_ids.sort(key=lambda x: abs(charttime - x[1]))
 
-    # Return the most relevant HADM ID or None if no valid ID is found
+def _sorted_admissions(admissions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Admissions that can contain a chart time, sorted by patient and admission time.
 
-    return valid_hadm_ids[0] if valid_hadm_ids else (None, None, None)
+    Admissions of a patient starting at the same time are in reverse table order, so that
+    walking back from the last one meets them in table order.
+    """
+    admissions = admissions.dropna(
+        subset=[AdmissionsHeader.ADMITTIME, AdmissionsHeader.DISCHTIME]
+    )
+    order = np.lexsort(
+        (
+            -np.arange(len(admissions)),
+            _as_ns(admissions[AdmissionsHeader.ADMITTIME]),
+            admissions[AdmissionsHeader.PATIENT_ID].to_numpy("int64"),
+        )
+    )
+    return admissions.iloc[order].reset_index(drop=True)
 
 
-def impute_row(row, subject_hadm_admittime_tracker):
-    """Helper function to impute data for a single row."""
-    new_hadm_id, new_admittime, new_dischtime = hadm_imputer(
-        row[LabEventsFeatureHeader.CHART_TIME],
-        row[LabEventsFeatureHeader.HOSPITAL_ADMISSION_ID],
-        subject_hadm_admittime_tracker.get(row[LabEventsFeatureHeader.PATIENT_ID], []),
+def _last_admission_before(
+    adm_subjects: np.ndarray,
+    adm_times: np.ndarray,
+    subjects: np.ndarray,
+    times: np.ndarray,
+) -> np.ndarray:
+    """
+    For each (subject, time), position of the last sorted admission of the subject
+    starting at or before time, -1 if there is none.
+    """
+    nb_adm = len(adm_subjects)
+    if nb_adm == 0:
+        return np.full(len(subjects), -1, dtype=np.int64)
+    event_subjects = np.concatenate([adm_subjects, subjects])
+    event_times = np.concatenate([adm_times, times])
+    # Admissions come before chart times at the same instant: admittime <= charttime
+    is_chart = np.concatenate(
+        [np.zeros(nb_adm, dtype=np.int8), np.ones(len(subjects), dtype=np.int8)]
+    )
+    order = np.lexsort((is_chart, event_times, event_subjects))
+    # Position of the last admission event seen so far in the sweep
+    is_adm = order < nb_adm
+    last_event = np.maximum.accumulate(np.where(is_adm, np.arange(len(order)), -1))
+    last_adm = np.where(last_event >= 0, order[np.maximum(last_event, 0)], -1)
+    same_subject = (last_adm >= 0) & (
+        adm_subjects[np.maximum(last_adm, 0)] == event_subjects[order]
     )
-    return pd.Series(
-        [new_hadm_id, new_admittime, new_dischtime],
-        index=[
-            INPUTED_HOSPITAL_ADMISSION_ID_HEADER,
-            AdmissionsHeader.ADMITTIME,
-            AdmissionsHeader.DISCHTIME,
-        ],
+    candidates = np.empty(len(subjects), dtype=np.int64)
+    chart_events = ~is_adm
+    candidates[order[chart_events] - nb_adm] = np.where(
+        same_subject[chart_events], last_adm[chart_events], -1
     )
+    return candidates
 
 
-def process_chunk(
-    chunk: pd.DataFrame, subject_hadm_admittime_tracker: dict
-) -> pd.DataFrame:
-    """Process a single chunk for imputing HADM IDs."""
-    imputed_data = chunk.apply(
-        lambda row: impute_row(row, subject_hadm_admittime_tracker), axis=1
-    )
-    return pd.concat([chunk, imputed_data], axis=1)
+def _impute_positions(lab_table: pd.DataFrame, admissions: pd.DataFrame) -> np.ndarray:
+    """
+    Position in the sorted admissions of the admission containing each chart time, -1 if none.
 
+    Among the admissions containing a chart time, the one that started last is chosen, i.e.
+    the closest admission time. Candidates are visited backwards from the last admission
+    started before the chart time. A running maximum of the discharge times stops the walk
+    as soon as no earlier admission can contain the chart time, so the walk only continues
+    through overlapping admissions.
+    """
+    adm_subjects = admissions[AdmissionsHeader.PATIENT_ID].to_numpy("int64")
+    discharges = _as_ns(admissions[AdmissionsHeader.DISCHTIME])
+    max_discharges = (
+        pd.Series(discharges).groupby(adm_subjects).cummax().to_numpy("int64")
+    )
 
+    times = _as_ns(lab_table[LabEventsFeatureHeader.CHART_TIME])
+    valid_time = ~pd.isna(lab_table[LabEventsFeatureHeader.CHART_TIME]).to_numpy()
+    candidates = _last_admission_before(
+        adm_subjects,
+        _as_ns(admissions[AdmissionsHeader.ADMITTIME]),
+        lab_table[LabEventsFeatureHeader.PATIENT_ID].to_numpy("int64"),
+        times,
+    )
+    candidates[~valid_time] = -1
+
+    positions = np.full(len(lab_table), -1, dtype=np.int64)
+    pending = np.flatnonzero(candidates >= 0)
+    while len(pending):
+        candidate, time = candidates[pending], times[pending]
+        contains = discharges[candidate] >= time
+        positions[pending[contains]] = candidate[contains]
+        # Keep walking back only while an earlier admission may still contain the time
+        walk = ~contains & (max_discharges[candidate] >= time)
+        pending = pending[walk]
+        candidates[pending] -= 1
+    return positions
+
+
+@profiled
 def impute_hadm_ids(lab_table: pd.DataFrame, admissions: pd.DataFrame) -> pd.DataFrame:
-    """Impute missing HADM IDs in the lab table."""
-    # Create tracker from admission table
-    subject_hadm_admittime_tracker = defaultdict(list)
-    for row in admissions.itertuples():
-        subject_hadm_admittime_tracker[row.subject_id].append(
-            (row.hadm_id, row.admittime, row.dischtime)
-        )
+    """
+    Impute missing HADM IDs in the lab table.
 
-    # Prepare chunks and function for parallel processing
-    chunk_size = 100
-    chunks = [
-        lab_table[i : i + chunk_size] for i in range(0, len(lab_table), chunk_size)
+    A lab event keeps its HADM ID when it is one of the admissions of its patient. Otherwise
+    it is assigned the admission of its patient containing its chart time with the closest
+    admission time, or none if no admission contains it. The chosen HADM ID and its admission
+    and discharge times are added as new columns.
+    """
+    admission_cols = [
+        AdmissionsHeader.ID,
+        AdmissionsHeader.ADMITTIME,
+        AdmissionsHeader.DISCHTIME,
     ]
-    process_func = partial(
-        process_chunk, subject_hadm_admittime_tracker=subject_hadm_admittime_tracker
+    sorted_admissions = _sorted_admissions(admissions)
+    positions = _impute_positions(lab_table, sorted_admissions)
+
+    # Lab events whose HADM ID is a known admission of the same patient keep it
+    known = admissions.drop_duplicates(subset=AdmissionsHeader.ID).reset_index(
+        drop=True
+    )
+    known_positions = pd.Index(known[AdmissionsHeader.ID]).get_indexer(
+        lab_table[LabEventsFeatureHeader.HOSPITAL_ADMISSION_ID]
     )
+    known_subjects = known[AdmissionsHeader.PATIENT_ID].reindex(known_positions)
+    keep_old = known_subjects.to_numpy("float64", na_value=np.nan) == lab_table[
+        LabEventsFeatureHeader.PATIENT_ID
+    ].to_numpy("float64")
+
+    # Missing positions (-1) are not in the index and give rows of missing values
+    imputed = (
+        sorted_admissions[admission_cols].reindex(positions).reset_index(drop=True)
+    )
+    old = known[admission_cols].reindex(known_positions).reset_index(drop=True)
+    imputed.loc[keep_old] = old.loc[keep_old]
 
-    # Parallel processing
-    with Pool(8) as pool:
-        processed_chunks = pool.map(process_func, chunks)
-    non_empty_chunks = [chunk.dropna(how="all", axis=1) for chunk in processed_chunks]
-    # Consolidate processed chunks
-    return pd.concat(non_empty_chunks, ignore_index=True)
+    imputed = imputed.rename(
+        columns={AdmissionsHeader.ID: INPUTED_HOSPITAL_ADMISSION_ID_HEADER}
+    )
+    return pd.concat([lab_table.reset_index(drop=True), imputed], axis=1)
@@ -12,7 +12,13 @@ import logging
 from pipeline.file_info.raw.hosp import AdmissionsHeader
 
 from pipeline.prediction_task import PredictionTask, TargetType
-from pipeline.extract.csv_tools import save_data
+from pipeline.extract.csv_tools import (
+    OutputFormat,
+    load_data,
+    output_path,
+    save_data,
+)
+from pipeline.profiling import profiled
 
 logger = logging.getLogger()
 
@@ -23,10 +29,15 @@ class Cohort:
         with_icu: bool,
         name: str,
         df: pd.DataFrame = pd.DataFrame(),
+        output_format: OutputFormat = OutputFormat.CSV_GZIP,
+        nb_partitions: int = 1,
     ):
         self.df = df
         self.with_icu = with_icu
         self.name = name
+        self.output_format = output_format
+        # Saved cohorts are split by patient into nb_partitions files when nb_partitions > 1
+        self.nb_partitions = nb_partitions
         self.summary_name = f"summary_{name}"
         self.admit_col = (
             CohortWithIcuHeader.IN_TIME
@@ -90,6 +101,7 @@ class Cohort:
         )
         return visits
 
+    @profiled
     def prepare_labels(self, visits: pd.DataFrame, prediction_task: PredictionTask):
         if prediction_task.target_type == TargetType.MORTALITY:
             df = self.prepare_mort_labels(visits)
@@ -101,7 +113,14 @@ class Cohort:
         self.df = df.rename(columns={AdmissionsHeader.RACE: CohortHeader.ETHICITY})
 
     def save(self) -> pd.DataFrame:
-        save_data(self.df, COHORT_PATH / f"{self.name}.csv.gz", "COHORT")
+        save_data(
+            self.df,
+            COHORT_PATH / f"{self.name}.csv.gz",
+            "COHORT",
+            self.output_format,
+            CohortHeader.PATIENT_ID,
+            self.nb_partitions,
+        )
 
     def save_summary(self):
         summary = "\n".join(
@@ -117,13 +136,17 @@ class Cohort:
             f.write(summary)
 
 
-def load_cohort(use_icu: bool, file_name: str) -> pd.DataFrame:
-    """Load cohort data from a CSV file."""
-    cohort_path = COHORT_PATH / f"{file_name}.csv.gz"
+def load_cohort(
+    use_icu: bool,
+    file_name: str,
+    output_format: OutputFormat = OutputFormat.CSV_GZIP,
+) -> pd.DataFrame:
+    """Load cohort data saved in the given format, partitioned or not."""
+    cohort_path = output_path(COHORT_PATH / f"{file_name}.csv.gz", output_format)
     try:
-        return pd.read_csv(
+        return load_data(
             cohort_path,
-            compression="gzip",
+            output_format,
             parse_dates=[
                 (
                     CohortWithIcuHeader.IN_TIME
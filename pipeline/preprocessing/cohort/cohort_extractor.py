@@ -1,5 +1,7 @@
-from pipeline.prediction_task import PredictionTask
+from typing import List
+from pipeline.prediction_task import PredictionTask, TargetType
 from pipeline.preprocessing.cohort.cohort import Cohort
+from pipeline.extract.csv_tools import OutputFormat
 from pipeline.extract.raw.hosp import load_patients, load_admissions, AdmissionsHeader
 from pipeline.extract.raw.icu import load_icustays
 from pipeline.preprocessing.cohort.visit import (
@@ -21,11 +23,21 @@ class CohortExtractor:
     Parameters:
     - prediction_task: The prediction task defining the type of cohort to extract.
     - output: Optional output path for saving the extracted cohort.
+    - output_format: Format of the saved cohort.
+    - nb_partitions: Number of files the saved cohort is split into by patient.
     """
 
-    def __init__(self, prediction_task: PredictionTask, output: str = None):
+    def __init__(
+        self,
+        prediction_task: PredictionTask,
+        output: str = None,
+        output_format: OutputFormat = OutputFormat.CSV_GZIP,
+        nb_partitions: int = 1,
+    ):
         self.prediction_task = prediction_task
         self.output = output
+        self.output_format = output_format
+        self.nb_partitions = nb_partitions
 
     def get_icu_status(self) -> str:
         """Determines the ICU status based on the prediction task."""
@@ -68,34 +80,110 @@ class CohortExtractor:
             self.prediction_task.disease_readmission,
             self.prediction_task.disease_selection,
         )
-        # Process patient data and filter by age
-        patients_data = make_patients(patients)
-        patients_filtered = patients_data.loc[patients_data["age"] >= 18]
-        admissions_info = admissions[
-            [
-                AdmissionsHeader.HOSPITAL_ADMISSION_ID,
-                AdmissionsHeader.INSURANCE,
-                AdmissionsHeader.RACE,
-            ]
-        ]
-        # Merge visits with patients and admissions data
-        visits = visits.merge(patients_filtered, on=CohortHeader.PATIENT_ID)
-        visits = visits.merge(admissions_info, on=CohortHeader.HOSPITAL_ADMISSION_ID)
-        return visits
+        return merge_visits(visits, make_patients(patients), admissions)
 
-    def extract(self) -> Cohort:
+    def make_cohort(self, visits: pd.DataFrame) -> Cohort:
+        """Labels the filtered and merged visits of the task, and saves them as a cohort."""
         if not self.output:
             self.fill_output()
-        patients = load_patients()
-        admissions = load_admissions()
-        visits = self.make_visits(patients, admissions)
-        visits = self.filter_and_merge_visits(visits, patients, admissions)
         cohort = Cohort(
             with_icu=self.prediction_task.use_icu,
             name=self.output,
+            output_format=self.output_format,
+            nb_partitions=self.nb_partitions,
         )
         cohort.prepare_labels(visits, self.prediction_task)
         cohort.save()
 
         cohort.save_summary()
         return cohort
+
+    def extract(self) -> Cohort:
+        if not self.output:
+            self.fill_output()
+        patients = load_patients()
+        admissions = load_admissions()
+        visits = self.make_visits(patients, admissions)
+        visits = self.filter_and_merge_visits(visits, patients, admissions)
+        return self.make_cohort(visits)
+
+
+class BatchCohortExtractor:
+    """
+    Extract the cohorts of several prediction tasks in one pass.
+
+    The raw tables are loaded and the patients are prepared once for all the tasks. The visits are
+    built once per ICU setting and readmission flag, which are the only parts of a task they
+    depend on, and filtered and merged once per combination of diseases.
+
+    Parameters:
+    - prediction_tasks: The prediction tasks to extract a cohort for.
+    - output_format: Format of the saved cohorts.
+    - nb_partitions: Number of files each saved cohort is split into by patient.
+    """
+
+    def __init__(
+        self,
+        prediction_tasks: List[PredictionTask],
+        output_format: OutputFormat = OutputFormat.CSV_GZIP,
+        nb_partitions: int = 1,
+    ):
+        self.prediction_tasks = prediction_tasks
+        self.output_format = output_format
+        self.nb_partitions = nb_partitions
+
+    def extract(self) -> List[Cohort]:
+        """Extracts and saves the cohort of each task, in the order of the tasks."""
+        patients = load_patients()
+        admissions = load_admissions()
+        patients_data = make_patients(patients)
+        visits_by_kind = {}
+        merged_visits = {}
+        cohorts = []
+        for prediction_task in self.prediction_tasks:
+            extractor = CohortExtractor(
+                prediction_task,
+                output_format=self.output_format,
+                nb_partitions=self.nb_partitions,
+            )
+            kind = (
+                prediction_task.use_icu,
+                prediction_task.target_type == TargetType.READMISSION,
+            )
+            if kind not in visits_by_kind:
+                visits_by_kind[kind] = extractor.make_visits(patients, admissions)
+            selection = kind + (
+                prediction_task.disease_readmission,
+                prediction_task.disease_selection,
+            )
+            if selection not in merged_visits:
+                visits = filter_visits(
+                    visits_by_kind[kind],
+                    prediction_task.disease_readmission,
+                    prediction_task.disease_selection,
+                )
+                merged_visits[selection] = merge_visits(
+                    visits, patients_data, admissions
+                )
+            # Labels are added to a copy, the merged visits are shared by the tasks
+            cohorts.append(extractor.make_cohort(merged_visits[selection].copy()))
+        return cohorts
+
+
+def merge_visits(
+    visits: pd.DataFrame, patients_data: pd.DataFrame, admissions: pd.DataFrame
+) -> pd.DataFrame:
+    """Merges visit records with the adult patients and their admission data."""
+    # Filter patients by age
+    patients_filtered = patients_data.loc[patients_data["age"] >= 18]
+    admissions_info = admissions[
+        [
+            AdmissionsHeader.HOSPITAL_ADMISSION_ID,
+            AdmissionsHeader.INSURANCE,
+            AdmissionsHeader.RACE,
+        ]
+    ]
+    # Merge visits with patients and admissions data
+    visits = visits.merge(patients_filtered, on=CohortHeader.PATIENT_ID)
+    visits = visits.merge(admissions_info, on=CohortHeader.HOSPITAL_ADMISSION_ID)
+    return visits
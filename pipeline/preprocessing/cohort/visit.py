@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 import pandas as pd
 from pipeline.file_info.raw.hosp import PatientsHeader
 from pipeline.file_info.raw.hosp import AdmissionsHeader
@@ -9,12 +9,11 @@ from pipeline.file_info.preproc.cohort import (
     CohortWithoutIcuHeader,
 )
 from pipeline.prediction_task import TargetType, DiseaseCode
-from pipeline.conversion.icd import IcdConverter
-
-from pipeline.file_info.raw.hosp import (
-    DiagnosesIcdHeader,
+from pipeline.conversion.icd_index import (
+    DiseaseCombination,
+    IcdRootIndex,
+    load_icd_root_index,
 )
-from pipeline.extract.raw.hosp import load_diagnosis_icd
 from pipeline.preprocessing.cohort.patient import make_patients
 
 
@@ -65,12 +64,11 @@ def make_visits_witout_icu(
 
 def filter_by_disease(
     visits: pd.DataFrame,
-    diag: pd.DataFrame,
-    disease: DiseaseCode,
-    icd_converter: IcdConverter,
+    diseases: List[DiseaseCode],
+    disease_index: IcdRootIndex,
 ) -> pd.DataFrame:
-    """Helper function to filter visits based on a disease."""
-    hids = icd_converter.get_pos_ids(diag, disease)
+    """Helper function to filter visits diagnosed with all the given diseases."""
+    hids = disease_index.select(diseases, DiseaseCombination.ALL)
     return visits[visits[CohortHeader.HOSPITAL_ADMISSION_ID].isin(hids)]
 
 
@@ -80,22 +78,9 @@ def filter_visits(
     disease_selection: Optional[DiseaseCode],
 ) -> pd.DataFrame:
     """# Filter visits based on readmission due to a specific disease and on disease selection"""
-
-    icd_converter = IcdConverter()
-
-    diag = load_diagnosis_icd()[
-        [
-            DiagnosesIcdHeader.ICD_CODE,
-            DiagnosesIcdHeader.ICD_VERSION,
-            DiagnosesIcdHeader.HOSPITAL_ADMISSION_ID,
-        ]
+    diseases = [
+        disease for disease in (disease_readmission, disease_selection) if disease
     ]
-    diag = icd_converter.standardize_icd(diag)
-    diag.dropna(subset=[DiagnosesIcdHeader.ROOT], inplace=True)
-    if disease_readmission:
-        visits = filter_by_disease(visits, diag, disease_readmission, icd_converter)
-
-    if disease_selection:
-        visits = filter_by_disease(visits, diag, disease_selection, icd_converter)
-
-    return visits
+    if not diseases:
+        return visits
+    return filter_by_disease(visits, diseases, load_icd_root_index())
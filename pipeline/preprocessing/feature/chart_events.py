@@ -1,46 +1,183 @@
 from tqdm import tqdm
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
+import hashlib
 import logging
+from pathlib import Path
+from typing import Iterator, List, Optional
 import pandas as pd
 
-from pipeline.file_info.raw.icu import ChartEventsHeader
+from pipeline.file_info.raw.icu import CHART_EVENTS_PATH, ChartEventsHeader
 from pipeline.extract.raw.icu import load_chart_events
+from pipeline.extract.fingerprint import file_fingerprint, frame_fingerprint
+from pipeline.file_info.cache import UOM_DECISIONS_PATH
 from pipeline.file_info.preproc.cohort import CohortWithIcuHeader
-from pipeline.file_info.preproc.feature.chart_events import ChartEventsFeatureHeader
-from pipeline.conversion.uom import drop_wrong_uom
+from pipeline.file_info.preproc.feature.chart_events import (
+    CHART_EVENTS_FEATURE_DTYPES,
+    ChartEventsFeatureHeader,
+)
+from pipeline.extract.dtypes import apply_dtypes, concat_frames
+from pipeline.preprocessing.feature.parallel import map_chunks, prefetch_chunks
+from pipeline.conversion.uom import (
+    apply_uom_decisions,
+    count_uom,
+    load_uom_decisions,
+    merge_uom_counts,
+    uom_decisions,
+)
+from pipeline.profiling import profiled
 
 logger = logging.getLogger()
 
+UOM_CUT_OFF = 0.95
+
 
 class ChartEvents(Feature):
-    def __init__(self, df: pd.DataFrame = pd.DataFrame(), chunksize: int = 10000000):
+    """
+    Chart events of the ICU stays of a cohort.
+
+    With n_workers > 1, the chunks are read sequentially and processed in a pool of n_workers
+    processes, with at most max_in_flight chunks pending at once. With prefetch > 0, that many
+    chunks are read ahead in a background thread while the current one is processed.
+
+    Read from the multi-member gzip copy, the chunks are its members of about 64 MiB of CSV
+    whatever chunksize, and max_in_flight also bounds the members read ahead, so that up to
+    about 2 * max_in_flight members are in memory at once.
+
+    With streaming_uom, the units of measurement are counted chunk by chunk in a first pass and the
+    resulting decision table is applied chunk by chunk in a second pass, so the chart events are never
+    held in memory before the unit filter. The decision table is saved and reused by later runs on the
+    same cohort and raw table, which then skip the first pass.
+
+    A uom_decision_table given upfront is applied chunk by chunk instead of deciding the units from
+    the cohort, e.g. to extract part of a cohort consistently with a previous run. The table used by
+    the last extraction is kept in used_uom_decisions.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame = pd.DataFrame(),
+        chunksize: int = 10000000,
+        streaming_uom: bool = False,
+        n_workers: int = 1,
+        max_in_flight: Optional[int] = None,
+        prefetch: int = 0,
+        uom_decision_table: Optional[pd.DataFrame] = None,
+    ):
         self.df = df
         self.chunksize = chunksize
+        self.streaming_uom = streaming_uom
+        self.n_workers = n_workers
+        self.max_in_flight = max_in_flight
+        self.prefetch = prefetch
+        self.uom_decision_table = uom_decision_table
+        self.used_uom_decisions: Optional[pd.DataFrame] = None
         self.final_df = pd.DataFrame()
 
     def group() -> str:
         return FeatureGroup.CHART
 
+    cache_ignored = Feature.cache_ignored + (
+        "n_workers",
+        "max_in_flight",
+        "prefetch",
+        "used_uom_decisions",
+    )
+
+    def source_paths(self) -> List[Path]:
+        return [CHART_EVENTS_PATH]
+
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         """Function for processing hospital observations from a pickled cohort, optimized for memory efficiency."""
         logger.info("[EXTRACTING CHART EVENTS DATA]")
-        processed_chunks = [
-            self.process_chunk_chart_events(chunk, cohort)
-            for chunk in tqdm(load_chart_events(self.chunksize))
+        if self.uom_decision_table is not None:
+            chart = self.extract_with_uom_decisions(cohort, self.uom_decision_table)
+        elif self.streaming_uom:
+            chart = self.extract_with_streaming_uom(cohort)
+        else:
+            processed_chunks = list(tqdm(self.process_chunks(cohort)))
+            chart = concat_frames(processed_chunks)
+
+            """Log statistics about the chart events before drop."""
+            self.log_statistics(chart)
+
+            decisions = uom_decisions(count_uom(chart), UOM_CUT_OFF)
+            chart = apply_uom_decisions(chart, decisions)
+            self.used_uom_decisions = decisions
+        """Log statistics about the chart events."""
+        self.log_statistics(chart)
+        chart = chart[[h.value for h in ChartEventsFeatureHeader]]
+        chart = apply_dtypes(chart, CHART_EVENTS_FEATURE_DTYPES)
+        self.df = chart
+        return chart
+
+    def extract_with_streaming_uom(self, cohort: pd.DataFrame) -> pd.DataFrame:
+        """Extract chart events and drop uncommon units chunk by chunk with a decision table."""
+        decisions_path = self.uom_decisions_path(cohort)
+        if decisions_path.exists():
+            logger.info(f"[REUSING UOM DECISIONS FROM {decisions_path}]")
+            decisions = load_uom_decisions(decisions_path)
+        else:
+            counts = None
+            for chunk in tqdm(self.process_chunks(cohort)):
+                counts = merge_uom_counts(counts, count_uom(chunk))
+            decisions = uom_decisions(counts, UOM_CUT_OFF)
+            decisions_path.parent.mkdir(parents=True, exist_ok=True)
+            decisions.to_csv(decisions_path, index=False)
+        return self.extract_with_uom_decisions(cohort, decisions)
+
+    def extract_with_uom_decisions(
+        self, cohort: pd.DataFrame, decisions: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Extract chart events and drop uncommon units chunk by chunk with a given decision table."""
+        self.used_uom_decisions = decisions
+        filtered_chunks = [
+            apply_uom_decisions(chunk, decisions)[
+                [h.value for h in ChartEventsFeatureHeader]
+            ]
+            for chunk in tqdm(self.process_chunks(cohort))
         ]
-        chart = pd.concat(processed_chunks, ignore_index=True)
+        return concat_frames(filtered_chunks)
 
-        """Log statistics about the chart events before drop."""
-        logger.info(
-            f"# Unique Events: {chart[ChartEventsFeatureHeader.ITEM_ID].nunique()}"
+    def load_cohort_chart_events(self, cohort: pd.DataFrame):
+        """Chunks of the chart events of the cohort stays, filtered before the dates are parsed."""
+        return load_chart_events(
+            self.chunksize,
+            stay_ids=cohort[CohortWithIcuHeader.STAY_ID],
+            max_in_flight=self.max_in_flight,
         )
-        logger.info(
-            f"# Admissions: {chart[ChartEventsFeatureHeader.STAY_ID].nunique()}"
+
+    def process_chunks(self, cohort: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        """Processed chunks of the chart events of the cohort, in file order."""
+        cohort = cohort[[CohortWithIcuHeader.STAY_ID, CohortWithIcuHeader.IN_TIME]]
+        chunks = self.load_cohort_chart_events(cohort)
+        # The reader thread stops when processing fails or the chunks are abandoned
+        with prefetch_chunks(
+            chunks, self.prefetch, "ChartEvents.prefetch_wait"
+        ) as chunks:
+            yield from map_chunks(
+                self.process_chunk_chart_events,
+                chunks,
+                self.n_workers,
+                self.max_in_flight,
+                shared={"cohort": cohort},
+            )
+
+    def uom_decisions_path(self, cohort: pd.DataFrame) -> Path:
+        """Location of the uom decision table, keyed on the cohort stays, the raw table and the cut-off."""
+        key = "|".join(
+            [
+                frame_fingerprint(cohort, [CohortWithIcuHeader.STAY_ID]),
+                file_fingerprint(CHART_EVENTS_PATH),
+                str(UOM_CUT_OFF),
+            ]
+        )
+        return (
+            UOM_DECISIONS_PATH
+            / f"chart_events_{hashlib.sha1(key.encode()).hexdigest()}.csv"
         )
-        logger.info(f"Total rows: {chart.shape[0]}")
 
-        chart = drop_wrong_uom(chart, 0.95)
-        """Log statistics about the chart events."""
+    def log_statistics(self, chart: pd.DataFrame) -> None:
         logger.info(
             f"# Unique Events: {chart[ChartEventsFeatureHeader.ITEM_ID].nunique()}"
         )
@@ -48,9 +185,6 @@ class ChartEvents(Feature):
             f"# Admissions: {chart[ChartEventsFeatureHeader.STAY_ID].nunique()}"
         )
         logger.info(f"Total rows: {chart.shape[0]}")
-        chart = chart[[h.value for h in ChartEventsFeatureHeader]]
-        self.df = chart
-        return chart
 
     def process_chunk_chart_events(
         self, chunk: pd.DataFrame, cohort: pd.DataFrame
@@ -1,14 +1,21 @@
 from enum import StrEnum
+from pathlib import Path
+from typing import List
 from pipeline.conversion.icd import IcdConverter
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
 import logging
 import pandas as pd
 from pipeline.file_info.preproc.feature.diagnoses import (
+    DIAGNOSES_FEATURE_DTYPES,
     DiagnosesFeatureHeader,
     DiagnosesFeatureWithIcuHeader,
 )
 from pipeline.file_info.preproc.cohort import CohortHeader, CohortWithIcuHeader
+from pipeline.file_info.code_map import MAP_PATH
+from pipeline.file_info.raw.hosp import HOSP_DIAGNOSES_ICD_PATH
 from pipeline.extract.raw.hosp import load_diagnosis_icd
+from pipeline.extract.dtypes import apply_dtypes
+from pipeline.profiling import profiled
 
 logger = logging.getLogger()
 
@@ -30,6 +37,10 @@ class Diagnoses(Feature):
     def group() -> str:
         return FeatureGroup.DIAGNOSES
 
+    def source_paths(self) -> List[Path]:
+        return [HOSP_DIAGNOSES_ICD_PATH, MAP_PATH]
+
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         logger.info("[EXTRACTING DIAGNOSIS DATA]")
         hosp_diagnose = load_diagnosis_icd()
@@ -52,5 +63,6 @@ class Diagnoses(Feature):
             [h.value for h in DiagnosesFeatureHeader]
             + ([DiagnosesFeatureWithIcuHeader.STAY_ID] if self.use_icu else [])
         ]
+        diag = apply_dtypes(diag, DIAGNOSES_FEATURE_DTYPES)
         self.df = diag
         return diag
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Tuple
 import pandas as pd
 from enum import StrEnum
 
@@ -13,6 +15,9 @@ class FeatureGroup(StrEnum):
 
 
 class Feature(ABC):
+    # Attributes that do not change the extracted data: outputs and execution settings
+    cache_ignored: Tuple[str, ...] = ("df", "final_df", "preproc_df")
+
     @staticmethod
     @abstractmethod
     def group() -> FeatureGroup:
@@ -28,3 +33,10 @@ class Feature(ABC):
         Generate the feature data from a cohort and return it as a DataFrame.
         """
         pass
+
+    @abstractmethod
+    def source_paths(self) -> List[Path]:
+        """
+        Raw and static files the feature data is extracted from.
+        """
+        pass
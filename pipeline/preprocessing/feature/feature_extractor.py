@@ -1,15 +1,23 @@
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
 import logging
-from pipeline.preprocessing.feature.feature_abc import Feature
+from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
 from pipeline.preprocessing.feature.medications import Medications
 from pipeline.preprocessing.feature.chart_events import ChartEvents
 from pipeline.preprocessing.feature.diagnoses import Diagnoses
 from pipeline.preprocessing.feature.lab_events import LabEvents
 from pipeline.preprocessing.feature.output_events import OutputEvents
 from pipeline.preprocessing.feature.procedures import Procedures
+from pipeline.preprocessing.feature.stage_cache import feature_cache
+from pipeline.preprocessing.feature.time_series import TimeSeriesBuilder
+from pipeline.preprocessing.feature.multi_hot import MultiHotEncoder
+from pipeline.preprocessing.feature.feature_store import FeatureStoreWriter
 from pipeline.preprocessing.cohort.cohort import load_cohort
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
 
 from pipeline.file_info.preproc.feature.medications import (
     FEATURE_MEDICATIONS_WITH_ICU_PATH,
@@ -26,7 +34,9 @@ from pipeline.file_info.preproc.feature.diagnoses import (
 from pipeline.file_info.preproc.feature.chart_events import FEATURE_CHART_EVENTS_PATH
 from pipeline.file_info.preproc.feature.lab_events import FEATURE_LAB_EVENTS_PATH
 from pipeline.file_info.preproc.feature.output_events import FEATURE_OUTPUT_EVENTS_PATH
-from pipeline.extract.csv_tools import save_data
+from pipeline.extract.csv_tools import OutputFormat, save_data
+from pipeline.file_info.cache import FEATURE_SPILL_PATH
+from pipeline.file_info.preproc.cohort import CohortHeader, CohortWithIcuHeader
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -46,6 +56,21 @@ class FeatureExtractor:
         for_procedures (bool): Flag to extract procedure features.
         for_medications (bool): Flag to extract medication features.
         for_labs (bool): Flag to extract lab event features.
+        n_workers (int): Number of features extracted concurrently, each in its own process.
+            Every feature is saved by the process that extracted it, so saving overlaps with the
+            extraction of the other features. With 1, features are extracted one after another.
+        output_format (OutputFormat): Format of the cohort to load and of the saved features.
+        nb_partitions (int): Number of files each saved feature is split into, by ICU stay with
+            ICU data and by patient otherwise.
+        use_cache (bool): Whether extracted features are stored in and loaded from the feature
+            cache, which skips the extraction of a feature already extracted from the same cohort
+            and source files with the same parameters and code. Off by default.
+        time_series (TimeSeriesBuilder, optional): Builder of the binned time series of the chart
+            and lab events, saved with the features, one row per stay or admission of the cohort.
+        multi_hot (MultiHotEncoder, optional): Encoder of the codes of the diagnoses, procedures
+            and medications into a sparse multi-hot matrix, saved with the features.
+        feature_store (FeatureStoreWriter, optional): Writer of the features to the feature store,
+            sorted by stay or admission for random access to the rows of one of them.
     """
 
     def __init__(
@@ -58,6 +83,13 @@ class FeatureExtractor:
         for_procedures: bool,
         for_medications: bool,
         for_labs: bool,
+        n_workers: int = 1,
+        output_format: OutputFormat = OutputFormat.CSV_GZIP,
+        nb_partitions: int = 1,
+        use_cache: bool = False,
+        time_series: Optional[TimeSeriesBuilder] = None,
+        multi_hot: Optional[MultiHotEncoder] = None,
+        feature_store: Optional[FeatureStoreWriter] = None,
     ):
         self.cohort_output = cohort_output
         self.use_icu = use_icu
@@ -67,15 +99,16 @@ class FeatureExtractor:
         self.for_procedures = for_procedures
         self.for_medications = for_medications
         self.for_labs = for_labs
+        self.n_workers = n_workers
+        self.output_format = output_format
+        self.nb_partitions = nb_partitions
+        self.use_cache = use_cache
+        self.time_series = time_series
+        self.multi_hot = multi_hot
+        self.feature_store = feature_store
 
-    def save_features(self) -> List[pd.DataFrame]:
-        """
-        Loads the cohort and extracts features based on the specified conditions.
-
-        Returns:
-            List[pd.DataFrame]: A list of DataFrames, each containing a type of extracted feature.
-        """
-        cohort = load_cohort(self.use_icu, self.cohort_output)
+    def enabled_features(self) -> List[Tuple[Feature, Path]]:
+        """The features to extract based on the specified conditions, with their output paths."""
         feature_conditions: List[Tuple[bool, Feature, Path]] = [
             (
                 self.for_diagnoses,
@@ -120,12 +153,137 @@ class FeatureExtractor:
                 FEATURE_LAB_EVENTS_PATH,
             ),
         ]
-        features = {}
-        for condition, feature, path in feature_conditions:
-            if condition:
-                extract_feature = feature.extract_from(cohort)
-                feature_name = feature.__class__.group()
-                features[feature_name] = extract_feature
-                save_data(extract_feature, path, feature_name)
+        return [
+            (feature, path)
+            for condition, feature, path in feature_conditions
+            if condition
+        ]
+
+    def save_options(self) -> dict:
+        """Options of save_data for the features."""
+        return dict(
+            output_format=self.output_format,
+            partition_by=(
+                CohortWithIcuHeader.STAY_ID if self.use_icu else CohortHeader.PATIENT_ID
+            ),
+            nb_partitions=self.nb_partitions,
+        )
+
+    def save_features(self) -> Mapping[FeatureGroup, pd.DataFrame]:
+        """
+        Loads the cohort and extracts features based on the specified conditions.
 
+        Returns:
+            Mapping[FeatureGroup, pd.DataFrame]: The extracted features by group. Those extracted
+            by worker processes are read from their spill files when first accessed.
+        """
+        cohort = load_cohort(self.use_icu, self.cohort_output, self.output_format)
+        enabled = self.enabled_features()
+        save_options = dict(self.save_options(), use_cache=self.use_cache)
+        if self.n_workers <= 1:
+            features = dict(
+                extract_and_save(feature, cohort, path, **save_options)
+                for feature, path in enabled
+            )
+        else:
+            FEATURE_SPILL_PATH.mkdir(parents=True, exist_ok=True)
+            spill_directory = Path(tempfile.mkdtemp(dir=FEATURE_SPILL_PATH))
+            spill_paths = [spill_directory / f"{i}.pkl" for i in range(len(enabled))]
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = [
+                    executor.submit(
+                        extract_save_and_spill,
+                        feature,
+                        cohort,
+                        path,
+                        spill_path,
+                        **save_options,
+                    )
+                    for (feature, path), spill_path in zip(enabled, spill_paths)
+                ]
+                groups = [future.result() for future in futures]
+            features = SpilledFeatures(spill_directory, dict(zip(groups, spill_paths)))
+        if self.time_series:
+            self.save_time_series(cohort, features)
+        if self.multi_hot:
+            self.multi_hot.build(cohort, features, self.use_icu)
+        if self.feature_store:
+            self.feature_store.write_features(features, self.use_icu)
         return features
+
+    def save_time_series(self, cohort: pd.DataFrame, features: dict) -> None:
+        """Bin the extracted chart and lab events of the cohort into time series."""
+        if FeatureGroup.CHART in features:
+            self.time_series.build_chart_events(
+                features[FeatureGroup.CHART], ids=cohort[CohortWithIcuHeader.STAY_ID]
+            )
+        if FeatureGroup.LAB in features:
+            self.time_series.build_lab_events(
+                features[FeatureGroup.LAB],
+                ids=cohort[CohortHeader.HOSPITAL_ADMISSION_ID],
+            )
+
+
+def extract_and_save(
+    feature: Feature,
+    cohort: pd.DataFrame,
+    path: Path,
+    output_format: OutputFormat = OutputFormat.CSV_GZIP,
+    partition_by: Optional[str] = None,
+    nb_partitions: int = 1,
+    use_cache: bool = False,
+) -> Tuple[FeatureGroup, pd.DataFrame]:
+    """Extracts a feature from the cohort, through the feature cache with use_cache, and saves it to the given path."""
+    extract_feature = (
+        feature_cache.extract(feature, cohort)
+        if use_cache
+        else feature.extract_from(cohort)
+    )
+    feature_name = feature.__class__.group()
+    save_data(
+        extract_feature,
+        path,
+        feature_name,
+        output_format,
+        partition_by,
+        nb_partitions,
+    )
+    return feature_name, extract_feature
+
+
+def extract_save_and_spill(
+    feature: Feature, cohort: pd.DataFrame, path: Path, spill_path: Path, **save_options
+) -> FeatureGroup:
+    """
+    Extracts and saves a feature in a worker process, spilling it to spill_path for the parent
+    process instead of sending it back.
+    """
+    feature_name, extract_feature = extract_and_save(
+        feature, cohort, path, **save_options
+    )
+    extract_feature.to_pickle(spill_path)
+    return feature_name
+
+
+class SpilledFeatures(Mapping):
+    """
+    Features spilled by worker processes, each read from its file on first access, so that the
+    parent process holds no copy of the features it does not use. The spill files are deleted
+    with the mapping.
+    """
+
+    def __init__(self, directory: Path, paths: Dict[FeatureGroup, Path]):
+        self.paths = paths
+        self._features: Dict[FeatureGroup, pd.DataFrame] = {}
+        self._cleanup = weakref.finalize(self, shutil.rmtree, directory, True)
+
+    def __getitem__(self, group: FeatureGroup) -> pd.DataFrame:
+        if group not in self._features:
+            self._features[group] = pd.read_pickle(self.paths[group])
+        return self._features[group]
+
+    def __iter__(self) -> Iterator[FeatureGroup]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
@@ -0,0 +1,231 @@
+import json
+import logging
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline.extract.meta_files import meta_written_last
+from pipeline.file_info.preproc.cohort import CohortHeader, CohortWithIcuHeader
+from pipeline.file_info.preproc.feature.feature_store import (
+    CATEGORIES_SUFFIX,
+    FEATURE_STORE_PATH,
+    LIST_OFFSETS_SUFFIX,
+    FeatureStoreFile,
+)
+from pipeline.preprocessing.feature.feature_abc import FeatureGroup
+from pipeline.profiling import profiled
+
+logger = logging.getLogger()
+
+
+def table_name(group: FeatureGroup) -> str:
+    """Name of the directory of a feature in the store, e.g. chart_events."""
+    return group.lower().replace(" ", "_")
+
+
+def id_column(group: FeatureGroup, use_icu: bool) -> str:
+    """Column the rows of a feature are grouped by: ICU stay for ICU events, else admission."""
+    if group in (FeatureGroup.CHART, FeatureGroup.OUTPUT) or (
+        use_icu and group != FeatureGroup.LAB
+    ):
+        return CohortWithIcuHeader.STAY_ID
+    return CohortHeader.HOSPITAL_ADMISSION_ID
+
+
+def _is_list_column(series: pd.Series) -> bool:
+    return (
+        series.dtype == object
+        and series.map(lambda value: isinstance(value, (list, tuple, np.ndarray))).any()
+    )
+
+
+def _flatten(series: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """Values of the lists of a column one after another, with the offsets of each list."""
+    lists = [
+        value if isinstance(value, (list, tuple, np.ndarray)) else []
+        for value in series
+    ]
+    lengths = np.fromiter(map(len, lists), dtype="int64", count=len(lists))
+    values = pd.Series(list(chain.from_iterable(lists)), dtype=object)
+    return values.infer_objects(), np.r_[0, np.cumsum(lengths)]
+
+
+class FeatureTable:
+    """
+    Feature of the store, its columns memory-mapped read-only.
+
+    The rows of an id are a contiguous range of every column, found through the offset index, so
+    reading them is a slice of the mapped files: no copy, and the pages are shared by all the
+    processes reading the same table.
+
+    Attributes:
+        meta (dict): Id column, number of rows and type of each column.
+        ids (np.ndarray): Sorted unique stay or admission ids.
+        offsets (np.ndarray): Rows of ids[i] are offsets[i]:offsets[i + 1].
+        columns (Dict[str, np.ndarray]): Memory-mapped values of each column in id order, int32
+            codes for the columns of strings. The values of the lists of a column of lists, such
+            as the EPC classes of medications, are flattened one after another.
+        categories (Dict[str, np.ndarray]): Values of the codes of the columns of strings.
+        list_offsets (Dict[str, np.ndarray]): Memory-mapped positions in the flattened values of
+            the list of each row of the columns of lists, the list of row i ending where the list
+            of row i + 1 starts.
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path / FeatureStoreFile.META) as f:
+            self.meta = json.load(f)
+        self.ids = np.load(path / FeatureStoreFile.IDS)
+        self.offsets = np.load(path / FeatureStoreFile.OFFSETS)
+        self._positions = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        columns = path / FeatureStoreFile.COLUMNS
+        self.columns = {
+            column: np.load(columns / f"{column}.npy", mmap_mode="r")
+            for column in self.meta["columns"]
+        }
+        self.categories = {
+            column: np.load(columns / f"{column}{CATEGORIES_SUFFIX}")
+            for column, kind in self.meta["columns"].items()
+            if kind == "categorical"
+        }
+        self.list_offsets = {
+            column: np.load(columns / f"{column}{LIST_OFFSETS_SUFFIX}", mmap_mode="r")
+            for column in self.meta["lists"]
+        }
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._positions
+
+    def rows(self, id: int) -> slice:
+        """Range of the rows of an id, empty for an absent id."""
+        position = self._positions.get(id)
+        if position is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[position]), int(self.offsets[position + 1]))
+
+    def _values_rows(self, column: str, rows: slice) -> slice:
+        """Range of the values of a column on a range of rows."""
+        if column not in self.list_offsets:
+            return rows
+        offsets = self.list_offsets[column]
+        return slice(int(offsets[rows.start]), int(offsets[rows.stop]))
+
+    def get(self, id: int) -> Dict[str, np.ndarray]:
+        """
+        Read-only views of the columns on the rows of an id, the flattened values of their lists
+        for the columns of lists.
+        """
+        rows = self.rows(id)
+        return {
+            column: values[self._values_rows(column, rows)]
+            for column, values in self.columns.items()
+        }
+
+    def frame(self, id: int) -> pd.DataFrame:
+        """Copy of the rows of an id as a DataFrame, with the strings and lists decoded."""
+        rows = self.rows(id)
+        values = self.get(id)
+        for column, categories in self.categories.items():
+            codes = values[column]
+            values[column] = np.asarray(
+                pd.Categorical.from_codes(codes, categories).astype(object)
+            )
+        for column, offsets in self.list_offsets.items():
+            bounds = offsets[rows.start : rows.stop + 1] - offsets[rows.start]
+            lists = np.empty(len(bounds) - 1, dtype=object)
+            for row, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+                lists[row] = list(values[column][start:stop])
+            values[column] = lists
+        return pd.DataFrame({column: np.array(v) for column, v in values.items()})
+
+
+class FeatureStore:
+    """Tables of the features written by FeatureStoreWriter, opened on first access."""
+
+    def __init__(self, path: Path = FEATURE_STORE_PATH):
+        self.path = Path(path)
+        self._tables: Dict[str, FeatureTable] = {}
+
+    def __getitem__(self, group: FeatureGroup) -> FeatureTable:
+        name = table_name(FeatureGroup(group))
+        if name not in self._tables:
+            self._tables[name] = FeatureTable(self.path / name)
+        return self._tables[name]
+
+
+class FeatureStoreWriter:
+    """
+    Write extracted features sorted by stay or admission as one .npy file per column, with an
+    offset index from each id to its range of rows.
+
+    Numbers, booleans, dates and durations are stored with their numpy types, strings as int32
+    codes (-1 for missing values) with the array of their values. Columns of lists are stored as
+    their flattened values with the offsets of the list of each row, missing lists being empty.
+    Rows with no id are dropped.
+
+    Attributes:
+        path (Path): Directory of the store, with one subdirectory per feature.
+    """
+
+    def __init__(self, path: Path = FEATURE_STORE_PATH):
+        self.path = Path(path)
+
+    def write_features(
+        self, features: Dict[FeatureGroup, pd.DataFrame], use_icu: bool
+    ) -> FeatureStore:
+        for group, feature in features.items():
+            self.write(
+                feature, id_column(group, use_icu), self.path / table_name(group)
+            )
+        return FeatureStore(self.path)
+
+    @profiled
+    def write(self, df: pd.DataFrame, id_column: str, path: Path) -> FeatureTable:
+        """Write the rows of df sorted by id_column to path, keeping their order within an id."""
+        path = Path(path)
+        columns = path / FeatureStoreFile.COLUMNS
+        columns.mkdir(parents=True, exist_ok=True)
+        df = df[df[id_column].notna()]
+        with meta_written_last(path / FeatureStoreFile.META) as meta:
+            row_ids = df[id_column].to_numpy("int64")
+            order = np.argsort(row_ids, kind="stable")
+            ids, counts = np.unique(row_ids[order], return_counts=True)
+            np.save(path / FeatureStoreFile.IDS, ids)
+            np.save(path / FeatureStoreFile.OFFSETS, np.r_[0, np.cumsum(counts)])
+
+            kinds, lists = {}, []
+            for column in df.columns:
+                series = df[column].iloc[order]
+                if _is_list_column(series):
+                    lists.append(column)
+                    series, list_offsets = _flatten(series)
+                    np.save(columns / f"{column}{LIST_OFFSETS_SUFFIX}", list_offsets)
+                values, categories = self.encode(series)
+                np.save(columns / f"{column}.npy", values)
+                if categories is None:
+                    kinds[column] = str(values.dtype)
+                else:
+                    kinds[column] = "categorical"
+                    np.save(columns / f"{column}{CATEGORIES_SUFFIX}", categories)
+            meta.update(id_column=id_column, rows=len(df), columns=kinds, lists=lists)
+        logger.info(f"[SAVED {len(df)} ROWS OF {len(ids)} IDS TO FEATURE STORE {path}]")
+        return FeatureTable(path)
+
+    @staticmethod
+    def encode(series: pd.Series) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Values of a column as an array of a fixed-size type, with the values of its codes."""
+        if pd.api.types.is_numeric_dtype(series) and series.hasnans:
+            # Missing integers and booleans become NaN
+            values = series.to_numpy("float64", na_value=np.nan)
+        else:
+            values = np.asarray(series.to_numpy())
+        if values.dtype.kind in "biufmM":
+            return values, None
+        codes, categories = pd.factorize(series)
+        return codes.astype(np.int32), np.asarray(categories.astype(str), dtype=str)
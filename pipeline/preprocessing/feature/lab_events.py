@@ -1,18 +1,27 @@
+from pathlib import Path
+from typing import List, Optional
 from tqdm import tqdm
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
+from pipeline.preprocessing.feature.parallel import map_chunks, prefetch_chunks
 import logging
 import pandas as pd
 from pipeline.file_info.preproc.cohort import CohortHeader, CohortWithoutIcuHeader
 from pipeline.file_info.raw.hosp import (
+    HOSP_ADMISSIONS_PATH,
+    HOSP_LAB_EVENTS_PATH,
+    LAB_EVENTS_DTYPES,
     AdmissionsHeader,
     LabEventsHeader,
 )
+from pipeline.file_info.preproc.feature.lab_events import LAB_EVENTS_FEATURE_DTYPES
+from pipeline.extract.dtypes import apply_dtypes, concat_frames
 from pipeline.extract.raw.hosp import load_admissions
 from pipeline.extract.raw.hosp import load_lab_events
 from pipeline.preprocessing.admission_imputer import (
     INPUTED_HOSPITAL_ADMISSION_ID_HEADER,
     impute_hadm_ids,
 )
+from pipeline.profiling import profiled
 
 logger = logging.getLogger()
 
@@ -21,14 +30,35 @@ class LabEvents(Feature):
     def group() -> str:
         return FeatureGroup.LAB
 
-    def __init__(self, df: pd.DataFrame = pd.DataFrame(), chunksize: int = 10000000):
+    cache_ignored = Feature.cache_ignored + ("n_workers", "max_in_flight", "prefetch")
+
+    def source_paths(self) -> List[Path]:
+        # Admissions are used to impute the missing admission ids
+        return [HOSP_LAB_EVENTS_PATH, HOSP_ADMISSIONS_PATH]
+
+    def __init__(
+        self,
+        df: pd.DataFrame = pd.DataFrame(),
+        chunksize: int = 10000000,
+        n_workers: int = 1,
+        max_in_flight: Optional[int] = None,
+        prefetch: int = 0,
+    ):
         self.df = df
         self.chunksize = chunksize
+        # Chunks are processed in a pool of n_workers processes when n_workers > 1
+        self.n_workers = n_workers
+        # Also bounds the members of the multi-member gzip copy read ahead, which are the chunks
+        # whatever chunksize, so that up to about 2 * max_in_flight members are in memory at once
+        self.max_in_flight = max_in_flight
+        # Chunks read ahead in a background thread while the current one is processed
+        self.prefetch = prefetch
         self.final_df = pd.DataFrame()
 
     def df(self):
         return self.df
 
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         """Process and transform lab events data."""
         logger.info("[EXTRACTING LABS DATA]")
@@ -48,14 +78,35 @@ class LabEvents(Feature):
             LabEventsHeader.VALUE_NUM,
             LabEventsHeader.VALUE_UOM,
         ]
-        processed_chunks = [
-            self.process_lab_chunk(chunk, admissions, cohort)
-            for chunk in tqdm(
-                load_lab_events(chunksize=self.chunksize, use_cols=usecols)
+        # Only the admissions of the cohort patients are used to impute their lab events
+        admissions = admissions[
+            admissions[AdmissionsHeader.PATIENT_ID].isin(
+                cohort[CohortHeader.PATIENT_ID]
             )
         ]
-        labevents = pd.concat(processed_chunks, ignore_index=True)
+        chunks = load_lab_events(
+            chunksize=self.chunksize,
+            use_cols=usecols,
+            subject_ids=cohort[CohortHeader.PATIENT_ID],
+            max_in_flight=self.max_in_flight,
+        )
+        with prefetch_chunks(
+            chunks, self.prefetch, "LabEvents.prefetch_wait"
+        ) as chunks:
+            processed_chunks = list(
+                tqdm(
+                    map_chunks(
+                        self.process_lab_chunk,
+                        chunks,
+                        self.n_workers,
+                        self.max_in_flight,
+                        shared={"admissions": admissions, "cohort": cohort},
+                    )
+                )
+            )
+        labevents = concat_frames(processed_chunks)
         labevents = labevents[[h.value for h in LabEventsHeader]]
+        labevents = apply_dtypes(labevents, LAB_EVENTS_FEATURE_DTYPES)
         self.df = labevents
         return labevents
 
@@ -63,9 +114,7 @@ class LabEvents(Feature):
         self, chunk: pd.DataFrame, admissions: pd.DataFrame, cohort: pd.DataFrame
     ) -> pd.DataFrame:
         """Process a single chunk of lab events."""
-        chunk = chunk.dropna(subset=[LabEventsHeader.VALUE_NUM]).fillna(
-            {LabEventsHeader.VALUE_UOM: 0}
-        )
+        chunk = chunk.dropna(subset=[LabEventsHeader.VALUE_NUM])
         chunk = chunk[
             chunk[LabEventsHeader.PATIENT_ID].isin(cohort[CohortHeader.PATIENT_ID])
         ]
@@ -77,7 +126,7 @@ class LabEvents(Feature):
         chunk_imputed = impute_hadm_ids(chunk_no_hadm.copy(), admissions)
         chunk_imputed[LabEventsHeader.HOSPITAL_ADMISSION_ID] = chunk_imputed[
             INPUTED_HOSPITAL_ADMISSION_ID_HEADER
-        ]
+        ].astype(LAB_EVENTS_DTYPES[LabEventsHeader.HOSPITAL_ADMISSION_ID])
         chunk_imputed = chunk_imputed[
             [
                 LabEventsHeader.PATIENT_ID,
@@ -88,7 +137,7 @@ class LabEvents(Feature):
                 LabEventsHeader.VALUE_UOM,
             ]
         ]
-        merged_chunk = pd.concat([chunk_with_hadm, chunk_imputed], ignore_index=True)
+        merged_chunk = concat_frames([chunk_with_hadm, chunk_imputed])
         return self.merge_with_cohort_and_calculate_lab_time(merged_chunk, cohort)
 
     # in utils?
@@ -112,4 +161,7 @@ class LabEvents(Feature):
         chunk[LabEventsHeader.LAB_TIME_FROM_ADMIT.value] = (
             chunk[LabEventsHeader.CHART_TIME] - chunk[LabEventsHeader.ADMIT_TIME]
         )
-        return chunk.dropna()
+        # Lab events without unit are kept
+        return chunk.dropna(
+            subset=[c for c in chunk.columns if c != LabEventsHeader.VALUE_UOM]
+        )
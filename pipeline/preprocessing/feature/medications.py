@@ -1,21 +1,26 @@
+from pathlib import Path
+from typing import List
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
 from pipeline.file_info.preproc.cohort import (
     CohortWithIcuHeader,
     CohortHeader,
     CohortWithoutIcuHeader,
 )
+from pipeline.extract.dtypes import apply_dtypes
 from pipeline.file_info.preproc.feature.medications import (
+    MEDICATIONS_FEATURE_DTYPES,
     MedicationsFeatureHeader,
     MedicationsFeatureWithIcuHeader,
     MedicationsFeatureWithoutIcuHeader,
 )
 from pipeline.extract.raw.icu import load_input_events
 from pipeline.extract.raw.hosp import load_prescriptions
-from pipeline.file_info.raw.icu import InputEventsHeader
-from pipeline.file_info.raw.hosp import PrescriptionsHeader
+from pipeline.file_info.raw.icu import INPUT_EVENT_PATH, InputEventsHeader
+from pipeline.file_info.raw.hosp import HOSP_PREDICTIONS_PATH, PrescriptionsHeader
 import pandas as pd
 from pipeline.conversion.ndc import prepare_ndc_mapping, get_EPC, convert_ndc_to_string
-from pipeline.file_info.code_map import NdcMapHeader
+from pipeline.file_info.code_map import MAP_NDC_PATH, NdcMapHeader
+from pipeline.profiling import profiled
 
 
 class Medications(Feature):
@@ -40,6 +45,13 @@ class Medications(Feature):
         """Returns the feature group for medications."""
         return FeatureGroup.MEDICATIONS
 
+    def source_paths(self) -> List[Path]:
+        """Returns the input events for ICU data, else the prescriptions and the NDC mapping."""
+        if self.with_icu:
+            return [INPUT_EVENT_PATH]
+        return [HOSP_PREDICTIONS_PATH, MAP_NDC_PATH]
+
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         """
         Extract medication data from the cohort and merge with prescription or ICU input events.
@@ -111,7 +123,7 @@ class Medications(Feature):
                 else MedicationsFeatureWithoutIcuHeader
             )
         ]
-        medications = medications[cols]
+        medications = apply_dtypes(medications[cols], MEDICATIONS_FEATURE_DTYPES)
 
         self.df = medications
         return medications
@@ -143,16 +155,14 @@ class Medications(Feature):
         )
 
         # Convert NDC codes to strings
-        med[NdcMapHeader.NEW_NDC] = med[PrescriptionsHeader.NDC].apply(
-            convert_ndc_to_string
-        )
+        med[NdcMapHeader.NEW_NDC] = convert_ndc_to_string(med[PrescriptionsHeader.NDC])
 
         # Merge with NDC mapping table
         ndc_map = prepare_ndc_mapping()
         med = med.merge(ndc_map, on=NdcMapHeader.NEW_NDC, how="left")
 
         # Extract pharmacological class information
-        med[MedicationsFeatureWithoutIcuHeader.EPC] = med[
-            NdcMapHeader.PHARM_CLASSES
-        ].apply(get_EPC)
+        med[MedicationsFeatureWithoutIcuHeader.EPC] = get_EPC(
+            med[NdcMapHeader.PHARM_CLASSES]
+        )
         return med
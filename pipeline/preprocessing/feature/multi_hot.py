@@ -0,0 +1,193 @@
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+from pipeline.file_info.preproc.cohort import CohortHeader, CohortWithIcuHeader
+from pipeline.file_info.preproc.feature.diagnoses import DiagnosesFeatureHeader
+from pipeline.file_info.preproc.feature.medications import (
+    MedicationsFeatureWithIcuHeader,
+    MedicationsFeatureWithoutIcuHeader,
+)
+from pipeline.file_info.preproc.feature.multi_hot import (
+    MULTI_HOT_PATH,
+    MultiHotFile,
+    VocabularyHeader,
+)
+from pipeline.file_info.preproc.feature.procedures import (
+    ProceduresFeatureWithIcuHeader,
+    ProceduresFeatureWithoutIcuHeader,
+)
+from pipeline.preprocessing.feature.feature_abc import FeatureGroup
+from pipeline.profiling import profiled
+
+logger = logging.getLogger()
+
+# Column of the codes of each feature group, with and without ICU data
+CODE_COLUMNS = {
+    FeatureGroup.DIAGNOSES: (DiagnosesFeatureHeader.ROOT, DiagnosesFeatureHeader.ROOT),
+    FeatureGroup.PROCEDURES: (
+        ProceduresFeatureWithIcuHeader.ITEM_ID,
+        ProceduresFeatureWithoutIcuHeader.ICD_CODE,
+    ),
+    FeatureGroup.MEDICATIONS: (
+        MedicationsFeatureWithIcuHeader.ITEM_ID,
+        MedicationsFeatureWithoutIcuHeader.EPC,
+    ),
+}
+
+
+def _codes(
+    feature: pd.DataFrame,
+    group: FeatureGroup,
+    use_icu: bool,
+    id_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Codes of a feature as strings in a code column, with the id_column if given. Lists of codes,
+    such as the EPC classes of a drug, have one row per code.
+    """
+    column = CODE_COLUMNS[group][0 if use_icu else 1]
+    columns = [column] if id_column is None else [id_column, column]
+    codes = (
+        feature[columns]
+        .reset_index(drop=True)
+        .explode(column)
+        .dropna(subset=[column])
+        .rename(columns={column: VocabularyHeader.CODE})
+    )
+    return codes.assign(
+        **{VocabularyHeader.CODE: codes[VocabularyHeader.CODE].astype(str)}
+    )
+
+
+def fit_vocabulary(
+    features: Dict[FeatureGroup, pd.DataFrame], use_icu: bool, min_count: int = 1
+) -> pd.DataFrame:
+    """Codes of the features found in at least min_count rows, sorted within each group."""
+    vocabulary = []
+    for group, feature in features.items():
+        counts = _codes(feature, group, use_icu)[VocabularyHeader.CODE].value_counts()
+        codes = np.sort(counts.index[counts.to_numpy() >= min_count].to_numpy(str))
+        vocabulary.append(
+            pd.DataFrame({VocabularyHeader.GROUP: group, VocabularyHeader.CODE: codes})
+        )
+    if not vocabulary:
+        return pd.DataFrame(columns=[VocabularyHeader.GROUP, VocabularyHeader.CODE])
+    return pd.concat(vocabulary, ignore_index=True)
+
+
+def load_vocabulary(path: Path = MULTI_HOT_PATH) -> pd.DataFrame:
+    return pd.read_csv(
+        Path(path) / MultiHotFile.VOCABULARY, dtype=str, keep_default_na=False
+    )
+
+
+class MultiHot:
+    """
+    Multi-hot matrix loaded from disk.
+
+    Attributes:
+        matrix (scipy.sparse.csr_matrix): 1 where the stay or admission of the row has the code of
+            the column.
+        ids (np.ndarray): Stay or admission ids of the rows.
+        vocabulary (pd.DataFrame): Group and code of each column.
+    """
+
+    def __init__(self, path: Path = MULTI_HOT_PATH):
+        path = Path(path)
+        self.matrix = scipy.sparse.load_npz(path / MultiHotFile.MATRIX)
+        self.ids = np.load(path / MultiHotFile.IDS)
+        self.vocabulary = load_vocabulary(path)
+
+
+class MultiHotEncoder:
+    """
+    Combine the codes of the diagnoses, procedures and medications of a cohort into a sparse
+    multi-hot matrix, one row per ICU stay or hospital admission and one column per code.
+
+    Lists of codes, such as the EPC classes of the drugs without ICU data, give a column per code.
+    Rows and codes are turned into integer positions, and the sorted unique cell positions give
+    the CSR arrays directly, so no dense matrix or pivot table is ever built. Without vocabulary,
+    one is fit on the features and saved with the matrix. Given one, e.g. the vocabulary of a
+    training cohort, the columns are the same and the codes outside it are dropped.
+
+    Attributes:
+        vocabulary (pd.DataFrame, optional): Group and code of each column.
+        min_count (int): Fewest rows of a code for it to be in a fit vocabulary.
+    """
+
+    def __init__(self, vocabulary: Optional[pd.DataFrame] = None, min_count: int = 1):
+        self.vocabulary = vocabulary
+        self.min_count = min_count
+
+    def columns(
+        self, vocabulary: pd.DataFrame, group: FeatureGroup, codes: pd.Series
+    ) -> np.ndarray:
+        """Columns of the codes of a group, -1 for the codes outside the vocabulary."""
+        in_group = np.flatnonzero(
+            vocabulary[VocabularyHeader.GROUP].to_numpy() == group
+        )
+        group_codes = pd.Index(vocabulary[VocabularyHeader.CODE].to_numpy()[in_group])
+        positions = group_codes.get_indexer(codes.to_numpy())
+        # Codes outside the vocabulary have position -1, so they get the appended -1
+        return np.append(in_group, -1)[positions]
+
+    @profiled
+    def build(
+        self,
+        cohort: pd.DataFrame,
+        features: Dict[FeatureGroup, pd.DataFrame],
+        use_icu: bool,
+        path: Path = MULTI_HOT_PATH,
+    ) -> MultiHot:
+        """
+        Write the multi-hot matrix of the coded features of the cohort to path, one row per ICU
+        stay with ICU data and per hospital admission otherwise, in the order of the cohort.
+        """
+        id_column = (
+            CohortWithIcuHeader.STAY_ID
+            if use_icu
+            else CohortHeader.HOSPITAL_ADMISSION_ID
+        )
+        features = {
+            group: feature
+            for group, feature in features.items()
+            if group in CODE_COLUMNS
+        }
+        vocabulary = self.vocabulary
+        if vocabulary is None:
+            vocabulary = fit_vocabulary(features, use_icu, self.min_count)
+        ids = cohort[id_column].drop_duplicates().to_numpy("int64")
+        id_index = pd.Index(ids)
+        n_columns = len(vocabulary)
+
+        cells = []
+        for group, feature in features.items():
+            codes = _codes(feature, group, use_icu, id_column)
+            rows = id_index.get_indexer(codes[id_column].to_numpy("int64"))
+            columns = self.columns(vocabulary, group, codes[VocabularyHeader.CODE])
+            kept = (rows >= 0) & (columns >= 0)
+            cells.append(rows[kept].astype("int64") * n_columns + columns[kept])
+        # Sorted cells are the row-major order of CSR, duplicates are counted once
+        cells = np.unique(np.concatenate(cells)) if cells else np.array([], "int64")
+        rows, columns = np.divmod(cells, max(n_columns, 1))
+        indptr = np.searchsorted(rows, np.arange(len(ids) + 1))
+        matrix = scipy.sparse.csr_matrix(
+            (np.ones(len(cells), dtype=np.uint8), columns.astype(np.int32), indptr),
+            shape=(len(ids), n_columns),
+        )
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        scipy.sparse.save_npz(path / MultiHotFile.MATRIX, matrix, compressed=True)
+        np.save(path / MultiHotFile.IDS, ids)
+        vocabulary.to_csv(path / MultiHotFile.VOCABULARY, index=False)
+        logger.info(
+            f"[SAVED MULTI-HOT MATRIX OF {len(ids)} IDS AND {n_columns} CODES, "
+            f"{matrix.nnz} NON-ZERO, TO {path}]"
+        )
+        return MultiHot(path)
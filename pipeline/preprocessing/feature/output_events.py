@@ -1,10 +1,17 @@
+from pathlib import Path
+from typing import List
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
 import logging
 import pandas as pd
-from pipeline.file_info.preproc.feature.output_events import OutputEventsFeatureHeader
+from pipeline.file_info.preproc.feature.output_events import (
+    OUTPUT_EVENTS_FEATURE_DTYPES,
+    OutputEventsFeatureHeader,
+)
+from pipeline.extract.dtypes import apply_dtypes
 from pipeline.file_info.preproc.cohort import CohortWithIcuHeader
-from pipeline.file_info.raw.icu import OutputEventsHeader
+from pipeline.file_info.raw.icu import OUTPUT_EVENT_PATH, OutputEventsHeader
 from pipeline.extract.raw.icu import load_output_events
+from pipeline.profiling import profiled
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
@@ -18,6 +25,10 @@ class OutputEvents(Feature):
     def group() -> str:
         return FeatureGroup.OUTPUT
 
+    def source_paths(self) -> List[Path]:
+        return [OUTPUT_EVENT_PATH]
+
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         """Function for getting hosp observations pertaining to a pickled cohort.
         Function is structured to save memory when reading and transforming data."""
@@ -43,5 +54,6 @@ class OutputEvents(Feature):
         logger.info(f"# Admissions: {out[OutputEventsHeader.STAY_ID].nunique()}")
         logger.info(f"Total rows: {out.shape[0]}")
         out = out[[h.value for h in OutputEventsFeatureHeader]]
+        out = apply_dtypes(out, OUTPUT_EVENTS_FEATURE_DTYPES)
         self.df = out
         return out
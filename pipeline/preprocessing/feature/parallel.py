@@ -0,0 +1,198 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from pipeline.profiling import run_profiler
+
+logger = logging.getLogger()
+
+# Seconds between the checks of a blocked reader for the consumer stopping
+_STOP_CHECK_INTERVAL = 0.1
+
+# Chunk function of a worker process of map_chunks, with its shared arguments bound
+_worker_func: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None
+
+
+def _init_worker(func: Callable, shared: Dict[str, Any]) -> None:
+    global _worker_func
+    _worker_func = partial(func, **shared)
+
+
+def _process_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    return _worker_func(chunk)
+
+
+def map_chunks(
+    func: Callable[..., pd.DataFrame],
+    chunks: Iterable[pd.DataFrame],
+    n_workers: int = 1,
+    max_in_flight: Optional[int] = None,
+    shared: Optional[Dict[str, Any]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Apply a function to a stream of chunks, yielding the results in chunk order.
+
+    With n_workers > 1 the function runs in a pool of processes while the chunks are still read
+    one after another by the caller. The function and its shared arguments, e.g. the cohort, are
+    sent once to each worker when it starts, and only the chunks are sent with the tasks. At most
+    max_in_flight chunks (2 * n_workers by default) are submitted and not yet yielded, which
+    bounds the memory held by pending chunks and results.
+
+    Args:
+        func (Callable): Picklable function processing a single chunk, func(chunk, **shared).
+        chunks (Iterable[pd.DataFrame]): The chunks to process.
+        n_workers (int): Number of worker processes, 1 to process the chunks in this process.
+        max_in_flight (int, optional): Maximum number of chunks submitted and not yet yielded.
+        shared (Dict[str, Any], optional): Keyword arguments of func common to all the chunks.
+    """
+    shared = shared or {}
+    if n_workers <= 1:
+        for chunk in chunks:
+            yield func(chunk, **shared)
+        return
+
+    max_in_flight = max(max_in_flight or 2 * n_workers, 1)
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(func, shared)
+    ) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_process_chunk, chunk))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+class _Done:
+    """End of the chunks, with the error that ended them if any."""
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+class Prefetcher:
+    """
+    Iterator over chunks read ahead in a background thread.
+
+    The thread reads and parses up to depth chunks while the consumer processes the current one,
+    and then blocks, so at most depth + 1 chunks are held at once besides the one being processed.
+    Parsing overlaps with processing to the extent the reader releases the GIL, as the pandas and
+    pyarrow parsers and the decompression do for most of their work. Errors of the reader are raised
+    to the consumer. Used as a context manager, the thread is stopped on exit, so a consumer that
+    fails or stops early does not leave it blocked on a full queue.
+
+    The time the consumer was blocked waiting for a chunk is kept in wait_seconds, and recorded in
+    the wait_stage of a profiled run: close to zero when processing is the bottleneck, close to
+    read_seconds when reading is.
+
+    Attributes:
+        depth (int): Maximum number of chunks read ahead.
+        wait_seconds (float): Time the consumer waited for chunks.
+        read_seconds (float): Time the thread spent reading chunks.
+        chunks (int): Number of chunks consumed.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        depth: int = 1,
+        wait_stage: str = "Prefetcher.wait",
+    ):
+        if depth < 1:
+            raise ValueError("at least one chunk should be read ahead.")
+        self.depth = depth
+        self.wait_stage = wait_stage
+        self.wait_seconds = 0.0
+        self.read_seconds = 0.0
+        self.chunks = 0
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(
+            target=self._read, args=(iter(chunks),), daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        """Queue an item once there is room, False if the consumer stopped first."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=_STOP_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self, chunks: Iterator[pd.DataFrame]) -> None:
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    self.read_seconds += time.perf_counter() - start
+                if not self._put(chunk):
+                    break
+        except BaseException as error:
+            self._put(_Done(error))
+            return
+        finally:
+            # Release the files of a reader stopped before its end
+            if self._stop.is_set() and hasattr(chunks, "close"):
+                chunks.close()
+        self._put(_Done())
+
+    def __iter__(self) -> "Prefetcher":
+        return self
+
+    def __next__(self) -> pd.DataFrame:
+        if self._done:
+            raise StopIteration
+        start = time.perf_counter()
+        with run_profiler.stage(self.wait_stage, count_call=False):
+            item = self._queue.get()
+        self.wait_seconds += time.perf_counter() - start
+        if isinstance(item, _Done):
+            self._done = True
+            self._thread.join()
+            logger.info(
+                f"[PREFETCHED {self.chunks} CHUNKS: READ IN {self.read_seconds:.2f}s, "
+                f"WAITED {self.wait_seconds:.2f}s FOR THEM]"
+            )
+            if item.error is not None:
+                raise item.error
+            raise StopIteration
+        self.chunks += 1
+        return item
+
+    def close(self) -> None:
+        """Stop the reader thread, e.g. when the consumer does not read all the chunks."""
+        self._done = True
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def prefetch_chunks(
+    chunks: Iterable[pd.DataFrame], depth: int, wait_stage: str
+) -> ContextManager[Iterable[pd.DataFrame]]:
+    """Chunks read ahead by a Prefetcher closed on exit, or the chunks as they are for depth 0."""
+    if depth > 0:
+        return Prefetcher(chunks, depth, wait_stage)
+    return nullcontext(chunks)
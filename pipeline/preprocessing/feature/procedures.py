@@ -1,7 +1,10 @@
+from pathlib import Path
+from typing import List
 from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
 import logging
 import pandas as pd
 from pipeline.file_info.preproc.feature.procedures import (
+    PROCEDURES_FEATURE_DTYPES,
     ProceduresFeatureHeader,
     ProceduresFeatureWithIcuHeader,
     ProceduresFeatureWithoutIcuHeader,
@@ -11,9 +14,12 @@ from pipeline.file_info.preproc.cohort import (
     CohortWithIcuHeader,
     CohortWithoutIcuHeader,
 )
-from pipeline.file_info.raw.hosp import ProceduresIcdHeader
+from pipeline.file_info.raw.hosp import HOSP_PROCEDURES_ICD_PATH, ProceduresIcdHeader
+from pipeline.file_info.raw.icu import PROCEDURE_EVENTS_PATH
 from pipeline.extract.raw.hosp import load_procedures_icd
 from pipeline.extract.raw.icu import load_procedure_events
+from pipeline.extract.dtypes import apply_dtypes
+from pipeline.profiling import profiled
 
 logger = logging.getLogger()
 
@@ -40,6 +46,10 @@ class Procedures(Feature):
     def group() -> str:
         return FeatureGroup.PROCEDURES
 
+    def source_paths(self) -> List[Path]:
+        return [PROCEDURE_EVENTS_PATH if self.use_icu else HOSP_PROCEDURES_ICD_PATH]
+
+    @profiled
     def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
         logger.info("[EXTRACTING PROCEDURES DATA]")
         raw_procedures = (
@@ -97,5 +107,6 @@ class Procedures(Feature):
                 )
             ]
         ]
+        procedures = apply_dtypes(procedures, PROCEDURES_FEATURE_DTYPES)
         self.df = procedures
         return procedures
@@ -0,0 +1,142 @@
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from pipeline.extract.fingerprint import file_fingerprint, frame_fingerprint
+from pipeline.file_info.cache import FEATURE_CACHE_PATH
+from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
+
+logger = logging.getLogger()
+
+DEFAULT_MAX_BYTES = 20 * 1024**3
+ENTRY_SUFFIX = ".pkl"
+# Part of every key, to bump when a change outside the feature modules alters extracted data
+CACHE_VERSION = 1
+
+
+def _parameter_fingerprint(value) -> str:
+    if isinstance(value, pd.DataFrame):
+        return frame_fingerprint(value, list(value.columns))
+    return repr(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _module_fingerprint(module_name: str) -> str:
+    """Hash of the source of a module, so that editing an extraction invalidates its entries."""
+    try:
+        source = inspect.getsource(sys.modules[module_name])
+    except (KeyError, OSError, TypeError):
+        return ""
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _group_prefix(group: FeatureGroup) -> str:
+    return group.lower().replace(" ", "_")
+
+
+class FeatureCache:
+    """
+    On-disk memo of the data extracted by Feature.extract_from.
+
+    An entry is keyed on the content of the cohort, the class, parameters and module source of the
+    feature, the fingerprints of its source files and CACHE_VERSION, so it is only reused for an
+    identical extraction. The least
+    recently used entries are deleted when the entries exceed max_bytes.
+
+    Attributes:
+        path (Path): Directory of the entries.
+        max_bytes (int): Disk budget of the entries.
+    """
+
+    def __init__(
+        self, path: Path = FEATURE_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+    def key(self, feature: Feature, cohort: pd.DataFrame) -> str:
+        """Hash of everything the data extracted by the feature from the cohort depends on."""
+        parameters = sorted(
+            (name, _parameter_fingerprint(value))
+            for name, value in vars(feature).items()
+            if name not in feature.cache_ignored
+        )
+        parts = [
+            str(CACHE_VERSION),
+            type(feature).__qualname__,
+            _module_fingerprint(type(feature).__module__),
+            frame_fingerprint(cohort, list(cohort.columns)),
+            repr(parameters),
+            *(f"{path}:{file_fingerprint(path)}" for path in feature.source_paths()),
+        ]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def entry_path(self, feature: Feature, cohort: pd.DataFrame) -> Path:
+        prefix = _group_prefix(type(feature).group())
+        return self.path / f"{prefix}_{self.key(feature, cohort)}{ENTRY_SUFFIX}"
+
+    def extract(self, feature: Feature, cohort: pd.DataFrame) -> pd.DataFrame:
+        """Data of the feature for the cohort, loaded from the cache or extracted and stored."""
+        path = self.entry_path(feature, cohort)
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+            # The modification time orders the entries for eviction
+            os.utime(path)
+            logger.info(f"[LOADED {type(feature).group()} DATA FROM {path}]")
+            feature.df = data
+            return data
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+
+        data = feature.extract_from(cohort)
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+        self.evict()
+        return data
+
+    def _entries(self, group: Optional[FeatureGroup] = None):
+        prefix = f"{_group_prefix(group)}_" if group else ""
+        return self.path.glob(f"{prefix}*{ENTRY_SUFFIX}")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self) -> None:
+        """Delete the least recently used entries until the entries fit in max_bytes."""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Deleted by another process meanwhile
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+    def invalidate(self, group: Optional[FeatureGroup] = None) -> int:
+        """Delete the entries of a feature group, or all of them, returning how many were deleted."""
+        entries = list(self._entries(group))
+        for entry in entries:
+            entry.unlink(missing_ok=True)
+        return len(entries)
+
+
+feature_cache = FeatureCache()
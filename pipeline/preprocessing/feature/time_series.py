@@ -0,0 +1,242 @@
+import json
+import logging
+import math
+from enum import StrEnum
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from pipeline.extract.meta_files import meta_written_last
+from pipeline.file_info.preproc.feature.chart_events import ChartEventsFeatureHeader
+from pipeline.file_info.preproc.feature.lab_events import LabEventsFeatureHeader
+from pipeline.file_info.preproc.feature.time_series import (
+    CHART_EVENTS_TIME_SERIES_PATH,
+    LAB_EVENTS_TIME_SERIES_PATH,
+    TimeSeriesFile,
+)
+from pipeline.profiling import profiled
+
+logger = logging.getLogger()
+
+
+class Aggregation(StrEnum):
+    MEAN = "mean"
+    LAST = "last"  # Value of the latest event of the bucket
+    MIN = "min"
+    MAX = "max"
+
+
+class TimeSeries:
+    """
+    Binned time series loaded from disk, the values and mask being memory-mapped read-only.
+
+    Attributes:
+        values (np.ndarray): float32 (ids, buckets, items), 0 where mask is False.
+        mask (np.ndarray): bool (ids, buckets, items), whether the bucket has observations.
+        ids (np.ndarray): Sorted stay or admission ids of the first axis.
+        items (np.ndarray): Sorted item ids of the last axis.
+        meta (dict): Bucket width and horizon in hours, aggregation and columns binned.
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path / TimeSeriesFile.META) as f:
+            self.meta = json.load(f)
+        self.values = np.load(path / TimeSeriesFile.VALUES, mmap_mode="r")
+        self.mask = np.load(path / TimeSeriesFile.MASK, mmap_mode="r")
+        self.ids = np.load(path / TimeSeriesFile.IDS)
+        self.items = np.load(path / TimeSeriesFile.ITEMS)
+
+    def positions(self, ids: Iterable[int]) -> np.ndarray:
+        """Positions along the first axis of the given ids, -1 for the absent ones."""
+        return _positions(np.asarray(list(ids), "int64"), self.ids)
+
+
+def _hours(times: pd.Series) -> np.ndarray:
+    """Hours of time deltas, read back as strings from CSV outputs too."""
+    return (pd.to_timedelta(times) / pd.Timedelta(hours=1)).to_numpy(
+        "float64", na_value=np.nan
+    )
+
+
+def _positions(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Positions of values in sorted_values, -1 for the values absent from it."""
+    if not len(sorted_values):
+        return np.full(len(values), -1)
+    positions = np.searchsorted(sorted_values, values)
+    clipped = np.minimum(positions, len(sorted_values) - 1)
+    return np.where(sorted_values[clipped] == values, clipped, -1)
+
+
+def _aggregate(
+    values: np.ndarray, starts: np.ndarray, aggregation: Aggregation
+) -> np.ndarray:
+    """Aggregate of each run of values starting at starts, the values of a run sorted by time."""
+    if not len(starts):
+        return values[:0]
+    if aggregation == Aggregation.MEAN:
+        return np.add.reduceat(values, starts) / np.diff(np.r_[starts, len(values)])
+    if aggregation == Aggregation.LAST:
+        return values[np.r_[starts[1:], len(values)] - 1]
+    if aggregation == Aggregation.MIN:
+        return np.minimum.reduceat(values, starts)
+    return np.maximum.reduceat(values, starts)
+
+
+class TimeSeriesBuilder:
+    """
+    Bin events into fixed-width time buckets and write them as dense tensors to memory-mapped files.
+
+    The events of each (id, bucket, item) cell are aggregated through a sort of the events by cell
+    followed by reductions over the runs of equal cells, so only the observed cells are held in
+    memory, never a pivot table. The dense tensors are then filled on disk.
+
+    Attributes:
+        bucket_hours (float): Width of a bucket, in hours.
+        horizon_hours (float): Events after this time from admission are dropped, as those before it.
+        aggregation (Aggregation): How the values of the events of a cell are combined.
+    """
+
+    def __init__(
+        self,
+        bucket_hours: float = 1.0,
+        horizon_hours: float = 48.0,
+        aggregation: Aggregation = Aggregation.MEAN,
+    ):
+        if bucket_hours <= 0 or horizon_hours <= 0:
+            raise ValueError("the bucket width and the horizon should be positive.")
+        self.bucket_hours = bucket_hours
+        self.horizon_hours = horizon_hours
+        self.aggregation = Aggregation(aggregation)
+
+    @property
+    def n_buckets(self) -> int:
+        return math.ceil(self.horizon_hours / self.bucket_hours)
+
+    def build_chart_events(
+        self,
+        chart: pd.DataFrame,
+        ids: Optional[Iterable[int]] = None,
+        items: Optional[Iterable[int]] = None,
+        path: Path = CHART_EVENTS_TIME_SERIES_PATH,
+    ) -> TimeSeries:
+        """Time series of chart events per ICU stay, from the ICU admission."""
+        return self.build(
+            chart,
+            ChartEventsFeatureHeader.STAY_ID,
+            ChartEventsFeatureHeader.EVENT_TIME_FROM_ADMIT,
+            path,
+            ids,
+            items,
+        )
+
+    def build_lab_events(
+        self,
+        labs: pd.DataFrame,
+        ids: Optional[Iterable[int]] = None,
+        items: Optional[Iterable[int]] = None,
+        path: Path = LAB_EVENTS_TIME_SERIES_PATH,
+    ) -> TimeSeries:
+        """Time series of lab events per hospital admission, from the admission."""
+        return self.build(
+            labs,
+            LabEventsFeatureHeader.HOSPITAL_ADMISSION_ID,
+            LabEventsFeatureHeader.LAB_TIME_FROM_ADMIT,
+            path,
+            ids,
+            items,
+        )
+
+    @profiled
+    def build(
+        self,
+        events: pd.DataFrame,
+        id_column: str,
+        time_column: str,
+        path: Path,
+        ids: Optional[Iterable[int]] = None,
+        items: Optional[Iterable[int]] = None,
+        item_column: str = ChartEventsFeatureHeader.ITEM_ID,
+        value_column: str = ChartEventsFeatureHeader.VALUE_NUM,
+    ) -> TimeSeries:
+        """
+        Write the time series of events to path, one row per id and one column per item.
+
+        The ids and items default to those of the events. Given ones fix the axes, e.g. to the stays
+        of a cohort or to the items of a training set, and events of other ids or items are dropped.
+        """
+        path = Path(path)
+        event_ids = events[id_column].to_numpy("int64")
+        event_items = events[item_column].to_numpy("int64")
+        ids = np.unique(event_ids if ids is None else np.asarray(list(ids), "int64"))
+        items = np.unique(
+            event_items if items is None else np.asarray(list(items), "int64")
+        )
+        hours = _hours(events[time_column])
+        values = events[value_column].to_numpy("float64", na_value=np.nan)
+
+        id_positions = _positions(event_ids, ids)
+        item_positions = _positions(event_items, items)
+        # NaN hours and values fail the comparisons and are dropped
+        kept = (
+            (id_positions >= 0)
+            & (item_positions >= 0)
+            & (hours >= 0)
+            & (hours < self.horizon_hours)
+            & ~np.isnan(values)
+        )
+        buckets = (hours[kept] // self.bucket_hours).astype("int64")
+        cells = (id_positions[kept] * self.n_buckets + buckets) * len(
+            items
+        ) + item_positions[kept]
+
+        # Events sorted by cell, then by time for the last value of each cell
+        order = np.lexsort((hours[kept], cells))
+        cells = cells[order]
+        values = values[kept][order]
+        starts = np.flatnonzero(np.r_[len(cells) > 0, cells[1:] != cells[:-1]])
+        aggregated = _aggregate(values, starts, self.aggregation)
+        with meta_written_last(path / TimeSeriesFile.META) as meta:
+            self.write(path, ids, items, cells[starts], aggregated)
+            meta.update(
+                bucket_hours=self.bucket_hours,
+                horizon_hours=self.horizon_hours,
+                aggregation=self.aggregation,
+                id_column=id_column,
+                time_column=time_column,
+                events=int(kept.sum()),
+            )
+        logger.info(
+            f"[SAVED TIME SERIES OF {len(ids)} IDS, {self.n_buckets} BUCKETS AND "
+            f"{len(items)} ITEMS TO {path}]"
+        )
+        return TimeSeries(path)
+
+    def write(
+        self,
+        path: Path,
+        ids: np.ndarray,
+        items: np.ndarray,
+        cells: np.ndarray,
+        aggregated: np.ndarray,
+    ) -> None:
+        """Write the dense tensors, zero but for the observed cells, without holding them in memory."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / TimeSeriesFile.IDS, ids)
+        np.save(path / TimeSeriesFile.ITEMS, items)
+        shape = (len(ids), self.n_buckets, len(items))
+        values = open_memmap(
+            path / TimeSeriesFile.VALUES, mode="w+", dtype=np.float32, shape=shape
+        )
+        values.reshape(-1)[cells] = aggregated
+        values.flush()
+        mask = open_memmap(
+            path / TimeSeriesFile.MASK, mode="w+", dtype=np.bool_, shape=shape
+        )
+        mask.reshape(-1)[cells] = True
+        mask.flush()
+        del values, mask
@@ -0,0 +1,306 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from pipeline.conversion.uom import load_uom_decisions
+from pipeline.extract.csv_tools import (
+    load_data,
+    output_fingerprint,
+    output_path,
+    save_data,
+)
+from pipeline.extract.dtypes import align_dtypes, concat_frames
+from pipeline.extract.raw.hosp import (
+    load_admissions,
+    load_diagnosis_icd,
+    load_patients,
+)
+from pipeline.extract.raw.icu import load_icustays
+from pipeline.file_info.preproc.cohort import (
+    COHORT_PATH,
+    CohortHeader,
+    CohortWithIcuHeader,
+)
+from pipeline.file_info.preproc.watermark import WATERMARK_PATH, WatermarkHeader
+from pipeline.file_info.raw.hosp import PatientsHeader
+from pipeline.preprocessing.cohort.cohort import Cohort, load_cohort
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.chart_events import ChartEvents
+from pipeline.preprocessing.feature.feature_abc import Feature
+from pipeline.preprocessing.feature.feature_extractor import (
+    FeatureExtractor,
+    extract_and_save,
+)
+
+logger = logging.getLogger()
+
+
+def _table_digests(table: pd.DataFrame) -> pd.Series:
+    """Hash of the rows of each patient in a raw table, independent of the order of the rows."""
+    # Timestamps hash by their integer value, which depends on their unit
+    table = table.assign(
+        **{
+            column: table[column].astype("datetime64[ns]")
+            for column in table.columns
+            if pd.api.types.is_datetime64_any_dtype(table[column])
+        }
+    )
+    hashes = pd.util.hash_pandas_object(table, index=False)
+    # The sum wraps around like the hashes, so it stays exact
+    return hashes.groupby(table[CohortHeader.PATIENT_ID].to_numpy()).sum()
+
+
+def subject_digests(use_icu: bool) -> pd.DataFrame:
+    """Hashes of the rows of each patient in the raw tables a cohort is built from."""
+    tables = {
+        WatermarkHeader.PATIENTS: load_patients,
+        WatermarkHeader.ADMISSIONS: load_admissions,
+        WatermarkHeader.DIAGNOSES_ICD: load_diagnosis_icd,
+    }
+    if use_icu:
+        tables[WatermarkHeader.ICU_STAYS] = load_icustays
+    digests = pd.concat(
+        [_table_digests(load()).rename(name) for name, load in tables.items()],
+        axis=1,
+    )
+    # A patient without rows in a table gets a hash of 0 for it
+    digests = digests.fillna(0).astype("uint64")
+    digests.index.name = WatermarkHeader.PATIENT_ID
+    return digests
+
+
+def changed_subjects(previous: pd.DataFrame, current: pd.DataFrame) -> pd.Index:
+    """Patients added, removed or with different hashes between two watermarks."""
+    common = current.index.intersection(previous.index)
+    differ = (current.loc[common] != previous.loc[common, current.columns]).any(axis=1)
+    return common[differ.to_numpy()].union(
+        current.index.symmetric_difference(previous.index)
+    )
+
+
+class IncrementalExtractor:
+    """
+    Keep a cohort and its features up to date with the raw tables, re-extracting only the patients
+    whose records changed.
+
+    Each refresh records a watermark with a hash per patient of their rows in the tables the cohort
+    is built from: patients, admissions, diagnoses and ICU stays. The next refresh re-extracts the
+    patients whose hashes differ, new and removed ones included, and replaces their rows in the saved
+    cohort and features. All the visits of such a patient are labelled again together, so that
+    readmission labels, which depend on the next admission of the patient, stay correct.
+
+    Changes limited to the event tables (chart events, lab events, ...) of a patient are not seen by
+    the watermark, such patients can be given to refresh. The chart events of the refreshed patients
+    keep the unit decisions of the last full extraction, and the code mappings are assumed unchanged.
+    A full refresh is needed after changes of either.
+
+    Parameters:
+    - cohort_extractor: Extractor of the cohort kept up to date.
+    - feature_extractor: Optional extractor of the features of that cohort kept up to date.
+    """
+
+    def __init__(
+        self,
+        cohort_extractor: CohortExtractor,
+        feature_extractor: Optional[FeatureExtractor] = None,
+    ):
+        self.cohort_extractor = cohort_extractor
+        self.feature_extractor = feature_extractor
+        self.use_icu = cohort_extractor.prediction_task.use_icu
+        if not cohort_extractor.output:
+            cohort_extractor.fill_output()
+        self.name = cohort_extractor.output
+
+    @property
+    def watermark_path(self) -> Path:
+        return WATERMARK_PATH / f"{self.name}.parquet"
+
+    @property
+    def uom_decisions_path(self) -> Path:
+        return WATERMARK_PATH / f"{self.name}_chart_uom.csv"
+
+    @property
+    def feature_outputs_path(self) -> Path:
+        return WATERMARK_PATH / f"{self.name}_features.json"
+
+    def load_watermark(self) -> Optional[pd.DataFrame]:
+        if not self.watermark_path.exists():
+            return None
+        return pd.read_parquet(self.watermark_path)
+
+    def save_watermark(self, digests: pd.DataFrame) -> None:
+        WATERMARK_PATH.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.watermark_path.with_suffix(".tmp")
+        digests.to_parquet(tmp_path)
+        tmp_path.replace(self.watermark_path)
+
+    def cohort_exists(self) -> bool:
+        path = output_path(
+            COHORT_PATH / f"{self.name}.csv.gz", self.cohort_extractor.output_format
+        )
+        return path.exists() or path.with_name(path.name.split(".")[0]).is_dir()
+
+    def refresh(
+        self, subject_ids: Optional[Iterable[int]] = None, full: bool = False
+    ) -> Cohort:
+        """
+        Bring the saved cohort and features up to date, re-extracting the changed patients and the
+        given subject_ids. Everything is extracted when full is set or when no watermark exists.
+        """
+        digests = subject_digests(self.use_icu)
+        previous = self.load_watermark()
+        if (
+            full
+            or previous is None
+            or set(previous.columns) != set(digests.columns)
+            or not self.cohort_exists()
+        ):
+            logger.info(f"[FULL EXTRACTION OF {self.name}]")
+            cohort = self.cohort_extractor.extract()
+            if self.feature_extractor:
+                self.extract_features()
+            self.save_watermark(digests)
+            return cohort
+
+        affected = changed_subjects(previous, digests)
+        if subject_ids is not None:
+            affected = affected.union(pd.Index(subject_ids))
+        logger.info(f"[REFRESHING {len(affected)} PATIENTS OF {self.name}]")
+        if affected.empty:
+            cohort = Cohort(
+                with_icu=self.use_icu,
+                name=self.name,
+                df=load_cohort(
+                    self.use_icu, self.name, self.cohort_extractor.output_format
+                ),
+                output_format=self.cohort_extractor.output_format,
+                nb_partitions=self.cohort_extractor.nb_partitions,
+            )
+            previous_cohort = cohort.df
+        else:
+            previous_cohort, cohort = self.refresh_cohort(affected)
+        if self.feature_extractor:
+            self.refresh_features(affected, previous_cohort)
+        self.save_watermark(digests)
+        return cohort
+
+    def refresh_cohort(self, affected: pd.Index) -> Tuple[pd.DataFrame, Cohort]:
+        """Replace the visits of the affected patients in the saved cohort, returning the previous one."""
+        extractor = self.cohort_extractor
+        previous = load_data(
+            COHORT_PATH / f"{self.name}.csv.gz", extractor.output_format
+        )
+        patients = load_patients()
+        admissions = load_admissions()
+        # Visits are built per patient, so restricting the patients restricts the whole cohort
+        patients = patients[patients[PatientsHeader.ID].isin(affected)]
+        visits = extractor.make_visits(patients, admissions)
+        visits = extractor.filter_and_merge_visits(visits, patients, admissions)
+
+        cohort = Cohort(
+            with_icu=self.use_icu,
+            name=self.name,
+            output_format=extractor.output_format,
+            nb_partitions=extractor.nb_partitions,
+        )
+        cohort.prepare_labels(visits, extractor.prediction_task)
+        kept = previous[~previous[CohortHeader.PATIENT_ID].isin(affected)]
+        cohort.df = concat_frames([align_dtypes(kept, cohort.df), cohort.df])
+        cohort.df = cohort.df.sort_values(
+            by=[CohortHeader.PATIENT_ID, cohort.admit_col]
+        )
+        cohort.save()
+        cohort.save_summary()
+        return previous, cohort
+
+    def load_feature_outputs(self) -> Dict[str, str]:
+        if not self.feature_outputs_path.exists():
+            return {}
+        with open(self.feature_outputs_path) as f:
+            return json.load(f)
+
+    def save_feature_outputs(self, fingerprints: Dict[str, str]) -> None:
+        WATERMARK_PATH.mkdir(parents=True, exist_ok=True)
+        with open(self.feature_outputs_path, "w") as f:
+            json.dump(fingerprints, f)
+
+    def extract_features(self) -> None:
+        """Extract all the features of the cohort, recording the chart unit decisions."""
+        cohort = load_cohort(
+            self.use_icu, self.name, self.feature_extractor.output_format
+        )
+        self.save_feature_outputs(
+            {
+                str(path): self.extract_feature(feature, cohort, path)
+                for feature, path in self.feature_extractor.enabled_features()
+            }
+        )
+
+    def extract_feature(
+        self, feature: Feature, cohort: pd.DataFrame, path: Path
+    ) -> str:
+        """Extract a feature of the whole cohort, returning the fingerprint of its output."""
+        extract_and_save(feature, cohort, path, **self.feature_extractor.save_options())
+        if isinstance(feature, ChartEvents):
+            WATERMARK_PATH.mkdir(parents=True, exist_ok=True)
+            feature.used_uom_decisions.to_csv(self.uom_decisions_path, index=False)
+        return output_fingerprint(path, self.feature_extractor.output_format)
+
+    def refresh_features(
+        self, affected: pd.Index, previous_cohort: pd.DataFrame
+    ) -> None:
+        """Replace the rows of the affected patients in the saved features."""
+        output_format = self.feature_extractor.output_format
+        cohort = load_cohort(self.use_icu, self.name, output_format)
+        affected_cohort = cohort[cohort[CohortHeader.PATIENT_ID].isin(affected)]
+        # Features without patient ids are matched by stay, old and new ones
+        affected_stays = (
+            pd.concat(
+                [
+                    frame.loc[
+                        frame[CohortHeader.PATIENT_ID].isin(affected),
+                        CohortWithIcuHeader.STAY_ID,
+                    ]
+                    for frame in (previous_cohort, cohort)
+                ]
+            )
+            if self.use_icu
+            else pd.Series()
+        )
+        outputs = self.load_feature_outputs()
+        fingerprints = {}
+        for feature, path in self.feature_extractor.enabled_features():
+            # Feature outputs are shared by all cohorts, one saved since the last refresh of
+            # this cohort belongs to another one and is extracted again
+            if outputs.get(str(path)) != output_fingerprint(path, output_format) or (
+                isinstance(feature, ChartEvents)
+                and not self.uom_decisions_path.exists()
+            ):
+                fingerprints[str(path)] = self.extract_feature(feature, cohort, path)
+                continue
+            fingerprints[str(path)] = outputs[str(path)]
+            if affected.empty:
+                continue
+            if isinstance(feature, ChartEvents):
+                feature.uom_decision_table = load_uom_decisions(self.uom_decisions_path)
+
+            previous = load_data(path, output_format)
+            if CohortHeader.PATIENT_ID in previous.columns:
+                stale = previous[CohortHeader.PATIENT_ID].isin(affected)
+            else:
+                stale = previous[CohortWithIcuHeader.STAY_ID].isin(affected_stays)
+            if affected_cohort.empty:
+                refreshed = previous.iloc[:0]
+            else:
+                refreshed = feature.extract_from(affected_cohort)
+            save_data(
+                concat_frames([align_dtypes(previous[~stale], refreshed), refreshed]),
+                path,
+                feature.__class__.group(),
+                **self.feature_extractor.save_options(),
+            )
+            fingerprints[str(path)] = output_fingerprint(path, output_format)
+        self.save_feature_outputs(fingerprints)
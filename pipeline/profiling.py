@@ -0,0 +1,331 @@
+import functools
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator as IteratorABC
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from pipeline.file_info.profile import PROFILE_PATH, StageStatHeader
+
+logger = logging.getLogger()
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# Fields of /proc/self/io recorded for each stage
+IO_FIELDS = {
+    "rchar": StageStatHeader.READ_BYTES,
+    "wchar": StageStatHeader.WRITTEN_BYTES,
+    "read_bytes": StageStatHeader.DISK_READ_BYTES,
+    "write_bytes": StageStatHeader.DISK_WRITTEN_BYTES,
+}
+
+
+def _io_counters() -> Dict[str, int]:
+    """Bytes read and written by the process so far, none where /proc/self/io is missing."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return {}
+    return {
+        header: int(counters[field])
+        for field, header in IO_FIELDS.items()
+        if field in counters
+    }
+
+
+def _read_peak_rss() -> int:
+    """Highest resident memory of the process since the last reset, in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak_rss() -> bool:
+    """Lower the peak resident memory of the process to the current one, if the kernel allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rows(value) -> int:
+    return len(value) if isinstance(value, pd.DataFrame) else 0
+
+
+class StageStats:
+    """Resources used by the calls of a stage, summed over the calls but for the peak memory."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.io = Counter()
+
+    def to_dict(self) -> dict:
+        return {
+            StageStatHeader.STAGE: self.stage,
+            StageStatHeader.CALLS: self.calls,
+            StageStatHeader.WALL_SECONDS: self.wall_seconds,
+            StageStatHeader.CPU_SECONDS: self.cpu_seconds,
+            StageStatHeader.PEAK_RSS_MIB: self.peak_rss / 1024**2,
+            StageStatHeader.ROWS_IN: self.rows_in,
+            StageStatHeader.ROWS_OUT: self.rows_out,
+            **{header: self.io[header] for header in IO_FIELDS.values()},
+        }
+
+
+class OpenStage:
+    """A call of a stage in progress, whose rows_out is set by the caller."""
+
+    def __init__(self, stage: str, rows_in: int):
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = 0
+        self.peak_rss = 0
+        self.start = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_io = _io_counters()
+
+
+class _Sampler(threading.Thread):
+    """Thread counting the call stacks of another thread at a fixed interval."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self) -> None:
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                # Folded stacks, outermost call first, as read by flame graph tools
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class RunProfiler:
+    """
+    Resources used by each stage of a pipeline run: wall and CPU time, peak resident memory, rows
+    in and out and bytes read and written.
+
+    The functions decorated with profiled are recorded while the profiler is started. Stages are
+    inclusive: the time of a feature extraction includes the loaders it calls. The peak memory of a
+    stage is the one of the process during the stage, and of the whole run where the kernel does not
+    allow resetting it. The CPU time and bytes are the ones of the process, so work done in worker
+    processes is not included.
+
+    A stage can also be sampled: while it runs, a thread records the call stacks of the thread
+    running it every sample_interval seconds.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stats: Dict[str, StageStats] = {}
+        self.samples: Dict[str, Counter] = {}
+        self.sample_stage: Optional[str] = None
+        self.sample_interval = DEFAULT_SAMPLE_INTERVAL
+        self.stage_peaks = False
+        self.started_at: Optional[datetime] = None
+        self.wall_seconds = 0.0
+        self._start = 0.0
+        self._open: List[OpenStage] = []
+        self._samplers: Dict[str, _Sampler] = {}
+        self._lock = threading.Lock()
+
+    def start(
+        self,
+        sample_stage: Optional[str] = None,
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ) -> None:
+        """Start recording a new run, sampling the stacks of sample_stage if given."""
+        self.stats = {}
+        self.samples = {}
+        self.sample_stage = sample_stage
+        self.sample_interval = sample_interval
+        self.stage_peaks = _reset_peak_rss()
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def _update_peaks(self) -> None:
+        """Record the peak memory since the last update in all the open stages, then reset it."""
+        peak = _read_peak_rss()
+        for open_stage in self._open:
+            open_stage.peak_rss = max(open_stage.peak_rss, peak)
+        if self.stage_peaks:
+            _reset_peak_rss()
+
+    @contextmanager
+    def stage(
+        self, name: str, rows_in: int = 0, count_call: bool = True
+    ) -> Iterator[OpenStage]:
+        """Record the resources used by the enclosed code as a call of the stage name."""
+        open_stage = OpenStage(name, rows_in)
+        if not self.enabled:
+            yield open_stage
+            return
+        with self._lock:
+            self._update_peaks()
+            self._open.append(open_stage)
+            sampler = None
+            if name == self.sample_stage and name not in self._samplers:
+                sampler = _Sampler(threading.get_ident(), self.sample_interval)
+                self._samplers[name] = sampler
+                sampler.start()
+        try:
+            yield open_stage
+        finally:
+            if sampler is not None:
+                sampler.done.set()
+                sampler.join()
+            end_io = _io_counters()
+            with self._lock:
+                if sampler is not None:
+                    del self._samplers[name]
+                    self.samples.setdefault(name, Counter()).update(sampler.stacks)
+                self._update_peaks()
+                self._open.remove(open_stage)
+                stats = self.stats.setdefault(name, StageStats(name))
+                stats.calls += count_call
+                stats.wall_seconds += time.perf_counter() - open_stage.start
+                stats.cpu_seconds += time.process_time() - open_stage.start_cpu
+                stats.peak_rss = max(stats.peak_rss, open_stage.peak_rss)
+                stats.rows_in += open_stage.rows_in
+                stats.rows_out += open_stage.rows_out
+                stats.io.update(
+                    {
+                        header: end_io[header] - open_stage.start_io.get(header, 0)
+                        for header in end_io
+                    }
+                )
+
+    def profile_chunks(
+        self, name: str, chunks: Iterable[pd.DataFrame]
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Chunks of a stage, the reading of each chunk being recorded in the stage.
+
+        The chunks are closed when they are abandoned, so that their reader, e.g. a generator
+        holding a file or a pool, is released without waiting for garbage collection.
+        """
+        chunks = iter(chunks)
+        try:
+            while True:
+                with self.stage(name, count_call=False) as open_stage:
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                    open_stage.rows_out = _rows(chunk)
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def report(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "wall_seconds": self.wall_seconds,
+            "peak_rss_scope": "stage" if self.stage_peaks else "run",
+            "stages": [stats.to_dict() for stats in self.stats.values()],
+            "samples": {
+                name: {
+                    "interval_seconds": self.sample_interval,
+                    "stacks": dict(stacks.most_common()),
+                }
+                for name, stacks in self.samples.items()
+            },
+        }
+
+    def save_report(self, path: Optional[Path] = None) -> Path:
+        """Write the report of the run as JSON, by default in PROFILE_PATH."""
+        if path is None:
+            path = PROFILE_PATH / f"run_{self.started_at:%Y%m%d_%H%M%S}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+
+run_profiler = RunProfiler()
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Record the calls of func as a stage of run_profiler, named after its qualified name.
+
+    The rows in are those of the DataFrame arguments. The rows out are those of the returned
+    DataFrame, of the chunks of a returned iterator, whose reading is recorded too, or of the df
+    attribute of the object of a method returning nothing.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not run_profiler.enabled:
+            return func(*args, **kwargs)
+        rows_in = sum(_rows(arg) for arg in [*args, *kwargs.values()])
+        with run_profiler.stage(name, rows_in) as open_stage:
+            result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                open_stage.rows_out = len(result)
+            elif result is None and args:
+                open_stage.rows_out = _rows(getattr(args[0], "df", None))
+        if isinstance(result, IteratorABC):
+            return run_profiler.profile_chunks(name, result)
+        return result
+
+    return wrapper
+
+
+@contextmanager
+def profile_run(
+    path: Optional[Path] = None,
+    sample_stage: Optional[str] = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+) -> Iterator[RunProfiler]:
+    """Profile the enclosed pipeline run and save its report, in PROFILE_PATH by default."""
+    run_profiler.start(sample_stage, sample_interval)
+    try:
+        yield run_profiler
+    finally:
+        run_profiler.stop()
+        report_path = run_profiler.save_report(path)
+        logger.info(f"[SAVED PROFILE OF THE RUN TO {report_path}]")
@@ -0,0 +1,286 @@
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.request
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from pipeline.conversion.icd import load_icd_9_to_10_mapping
+from pipeline.conversion.icd_index import load_icd_root_index
+from pipeline.conversion.ndc import prepare_ndc_mapping
+from pipeline.extract.csv_tools import OutputFormat
+from pipeline.extract.raw.hosp import (
+    load_admissions,
+    load_diagnosis_icd,
+    load_patients,
+    load_prescriptions,
+    load_procedures_icd,
+)
+from pipeline.extract.raw.icu import (
+    load_icustays,
+    load_input_events,
+    load_output_events,
+    load_procedure_events,
+)
+from pipeline.extract.table_registry import table_registry
+from pipeline.prediction_task import DiseaseCode, PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.feature_extractor import FeatureExtractor
+
+logger = logging.getLogger()
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Tables and indexes loaded at startup, so that the first request does not pay for them
+WARM_LOADERS: Dict[str, Callable] = {
+    "patients": load_patients,
+    "admissions": load_admissions,
+    "diagnoses_icd": load_diagnosis_icd,
+    "procedures_icd": load_procedures_icd,
+    "prescriptions": load_prescriptions,
+    "icustays": load_icustays,
+    "outputevents": load_output_events,
+    "inputevents": load_input_events,
+    "procedureevents": load_procedure_events,
+    "icd_9_to_10_mapping": load_icd_9_to_10_mapping,
+    "icd_root_index": load_icd_root_index,
+    "ndc_mapping": prepare_ndc_mapping,
+}
+
+ENDPOINTS = ("/cohort", "/features")
+
+FEATURE_FLAGS = [
+    "for_diagnoses",
+    "for_output_events",
+    "for_chart_events",
+    "for_procedures",
+    "for_medications",
+    "for_labs",
+]
+
+
+def _enum(enum_type, value):
+    """Member of an enum from its value or its name, None for None."""
+    if value is None:
+        return None
+    try:
+        return enum_type(value)
+    except ValueError:
+        try:
+            return enum_type[value]
+        except KeyError:
+            raise ValueError(f"unknown {enum_type.__name__}: {value}") from None
+
+
+def parse_prediction_task(request: dict) -> PredictionTask:
+    """PredictionTask of a cohort request, the enums given by value or name."""
+    return PredictionTask(
+        target_type=_enum(TargetType, request["target_type"]),
+        disease_readmission=_enum(DiseaseCode, request.get("disease_readmission")),
+        disease_selection=_enum(DiseaseCode, request.get("disease_selection")),
+        nb_days=request.get("nb_days"),
+        use_icu=bool(request["use_icu"]),
+    )
+
+
+def _records(df: pd.DataFrame) -> dict:
+    return json.loads(df.to_json(orient="split", index=False, date_format="iso"))
+
+
+class PipelineService:
+    """
+    Cohort and feature extraction in a long-running process, sharing its loaded tables between
+    requests.
+
+    The raw tables read whole and the code mappings are kept in the table registry and the
+    compiled caches of the process, so only the first request loads them, or none with warm. The
+    chart and lab events are still streamed by every request, from their Parquet or multi-member
+    copies when built. Requests run in concurrent threads on the same tables. Cohorts of the same
+    name are extracted one at a time, and not while features are extracted from them. Features are
+    extracted one at a time too, as they are all saved to the same files.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.warm_seconds: Dict[str, float] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._cohort_locks: Dict[str, threading.Lock] = {}
+        self._feature_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Load the shared tables and indexes, skipping those whose files are missing."""
+        for name, load in WARM_LOADERS.items():
+            start = time.perf_counter()
+            try:
+                load()
+            except FileNotFoundError as error:
+                logger.info(f"[NOT WARMING {name}: {error}]")
+                continue
+            self.warm_seconds[name] = time.perf_counter() - start
+            logger.info(f"[WARMED {name} IN {self.warm_seconds[name]:.2f}s]")
+
+    def status(self) -> dict:
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "requests": self.requests,
+            "warm_seconds": self.warm_seconds,
+            "registry_bytes": table_registry.nbytes,
+        }
+
+    def _cohort_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._cohort_locks.setdefault(name, threading.Lock())
+
+    def extract_cohort(self, request: dict) -> dict:
+        """Extract and save the cohort of a prediction task."""
+        extractor = CohortExtractor(
+            parse_prediction_task(request),
+            output=request.get("output"),
+            output_format=OutputFormat(
+                request.get("output_format", OutputFormat.CSV_GZIP)
+            ),
+            nb_partitions=request.get("nb_partitions", 1),
+        )
+        if not extractor.output:
+            extractor.fill_output()
+        with self._cohort_lock(extractor.output):
+            cohort = extractor.extract()
+        response = {"name": cohort.name, "rows": len(cohort.df)}
+        if request.get("include_data"):
+            response["data"] = _records(cohort.df)
+        return response
+
+    def extract_features(self, request: dict) -> dict:
+        """Extract and save the selected features of a saved cohort."""
+        extractor = FeatureExtractor(
+            cohort_output=request["cohort_output"],
+            use_icu=bool(request["use_icu"]),
+            **{flag: bool(request.get(flag, False)) for flag in FEATURE_FLAGS},
+            n_workers=request.get("n_workers", 1),
+            output_format=OutputFormat(
+                request.get("output_format", OutputFormat.CSV_GZIP)
+            ),
+            nb_partitions=request.get("nb_partitions", 1),
+            use_cache=request.get("use_cache", False),
+        )
+        # The cohort is not rewritten by a cohort request while its features are extracted
+        with self._cohort_lock(extractor.cohort_output), self._feature_lock:
+            features = extractor.save_features()
+        response = {"rows": {group: len(df) for group, df in features.items()}}
+        if request.get("include_data"):
+            response["data"] = {group: _records(df) for group, df in features.items()}
+        return response
+
+    def handle(self, endpoint: str, request: dict) -> dict:
+        with self._lock:
+            self.requests += 1
+        if endpoint == "/cohort":
+            return self.extract_cohort(request)
+        return self.extract_features(request)
+
+
+def _handler(service: PipelineService) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: HTTPStatus, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path == "/status":
+                self._send(HTTPStatus.OK, service.status())
+            else:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path not in ENDPOINTS:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                start = time.perf_counter()
+                response = service.handle(self.path, request)
+                response["seconds"] = time.perf_counter() - start
+                self._send(HTTPStatus.OK, response)
+            except KeyError as error:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": f"missing field {error}"})
+            except (ValueError, TypeError) as error:
+                self._send(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+            except FileNotFoundError as error:
+                self._send(HTTPStatus.NOT_FOUND, {"error": str(error)})
+            except Exception as error:
+                logger.exception(f"[REQUEST TO {self.path} FAILED]")
+                self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)})
+
+        def log_message(self, format: str, *args) -> None:
+            logger.info(f"[{self.address_string()}] {format % args}")
+
+    return Handler
+
+
+def make_server(
+    service: Optional[PipelineService] = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+) -> ThreadingHTTPServer:
+    """HTTP server of a service, handling each request in its own thread."""
+    server = ThreadingHTTPServer((host, port), _handler(service or PipelineService()))
+    server.daemon_threads = True
+    return server
+
+
+def request_service(
+    endpoint: str,
+    request: dict,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    timeout: Optional[float] = None,
+) -> dict:
+    """Send a request to a running service, e.g. request_service("/cohort", {...})."""
+    http_request = urllib.request.Request(
+        f"http://{host}:{port}{endpoint}",
+        data=json.dumps(request).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve cohort and feature extraction on a local HTTP endpoint."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--no-warm", action="store_true", help="load the tables on first use"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    service = PipelineService()
+    if not args.no_warm:
+        service.warm()
+    server = make_server(service, args.host, args.port)
+    logger.info(f"[SERVING ON http://{args.host}:{args.port}]")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
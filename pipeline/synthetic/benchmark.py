@@ -0,0 +1,234 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pipeline.extract.raw.parquet_cache import build_raw_cache
+from pipeline.file_info.path_prefix import RAW_PATH
+from pipeline.file_info.preproc.cohort import COHORT_PATH
+from pipeline.file_info.preproc.feature.path_prefix import (
+    FEATURE_EXTRACT_PATH,
+    FEATURE_PREPROC_PATH,
+    FEATURE_SUMMARY_PATH,
+)
+from pipeline.file_info.raw.hosp import HOSP
+from pipeline.file_info.raw.icu import ICU
+from pipeline.prediction_task import PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort import load_cohort
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.chart_events import ChartEvents
+from pipeline.preprocessing.feature.diagnoses import Diagnoses
+from pipeline.preprocessing.feature.feature_abc import Feature
+from pipeline.preprocessing.feature.lab_events import LabEvents
+from pipeline.preprocessing.feature.medications import Medications
+from pipeline.preprocessing.feature.output_events import OutputEvents
+from pipeline.preprocessing.feature.procedures import Procedures
+from pipeline.profiling import run_profiler
+from pipeline.synthetic.mimic_generator import MANIFEST_NAME, SyntheticMimic
+
+logger = logging.getLogger()
+
+"""
+Throughput and peak memory of each stage of the pipeline on synthetic MIMIC-IV tables.
+"""
+
+ICU_TASK = PredictionTask(TargetType.READMISSION, None, None, 30, True)
+HOSP_TASK = PredictionTask(TargetType.READMISSION, None, None, 30, False)
+COHORT_TABLES = [f"{HOSP}/patients", f"{HOSP}/admissions", f"{HOSP}/diagnoses_icd"]
+
+
+def _cohort_name(task: PredictionTask) -> str:
+    extractor = CohortExtractor(task)
+    extractor.fill_output()
+    return extractor.output
+
+
+def _extract_cohort(task: PredictionTask) -> int:
+    return len(CohortExtractor(task).extract().df)
+
+
+def _extract_feature(feature: Feature, task: PredictionTask) -> int:
+    cohort = load_cohort(task.use_icu, _cohort_name(task))
+    return len(feature.extract_from(cohort))
+
+
+def _build_raw_cache() -> int:
+    return sum(
+        pq.ParquetFile(path).metadata.num_rows for path in build_raw_cache(force=True)
+    )
+
+
+class Stage:
+    """
+    A stage of the pipeline, run in its own process.
+
+    Attributes:
+        tables (List[str]): Raw tables read by the stage, relative to the raw root.
+        run (Callable[[], int]): Runs the stage and returns the number of rows it produced.
+    """
+
+    def __init__(self, tables: List[str], run: Callable[[], int]):
+        self.tables = tables
+        self.run = run
+
+
+# Features are extracted from the cohorts, which run first
+STAGES: Dict[str, Stage] = {
+    "raw_cache": Stage([], _build_raw_cache),
+    "cohort_icu": Stage(
+        [*COHORT_TABLES, f"{ICU}/icustays"], lambda: _extract_cohort(ICU_TASK)
+    ),
+    "cohort_hosp": Stage(COHORT_TABLES, lambda: _extract_cohort(HOSP_TASK)),
+    "diagnoses": Stage(
+        [f"{HOSP}/diagnoses_icd"],
+        lambda: _extract_feature(Diagnoses(use_icu=True), ICU_TASK),
+    ),
+    "procedures": Stage(
+        [f"{ICU}/procedureevents"],
+        lambda: _extract_feature(Procedures(use_icu=True), ICU_TASK),
+    ),
+    "medications": Stage(
+        [f"{ICU}/inputevents"],
+        lambda: _extract_feature(Medications(with_icu=True), ICU_TASK),
+    ),
+    "output_events": Stage(
+        [f"{ICU}/outputevents"], lambda: _extract_feature(OutputEvents(), ICU_TASK)
+    ),
+    "chart_events": Stage(
+        [f"{ICU}/chartevents"], lambda: _extract_feature(ChartEvents(), ICU_TASK)
+    ),
+    "prescriptions": Stage(
+        [f"{HOSP}/prescriptions"],
+        lambda: _extract_feature(Medications(with_icu=False), HOSP_TASK),
+    ),
+    "lab_events": Stage(
+        [f"{HOSP}/labevents", f"{HOSP}/admissions"],
+        lambda: _extract_feature(LabEvents(), HOSP_TASK),
+    ),
+}
+DEFAULT_STAGES = [name for name in STAGES if name != "raw_cache"]
+
+
+def _measure(name: str) -> dict:
+    """Run a stage in the current process, returning its rows, times, peak memory and profile."""
+    logging.disable(logging.INFO)
+    run_profiler.start()
+    with run_profiler.stage(name) as stage:
+        stage.rows_out = STAGES[name].run()
+    run_profiler.stop()
+    stats = run_profiler.stats[name]
+    return {
+        "seconds": stats.wall_seconds,
+        "cpu_seconds": stats.cpu_seconds,
+        "output_rows": stats.rows_out,
+        "peak_rss_mib": stats.peak_rss / 1024**2,
+        # Resources of the profiled functions called by the stage
+        "profile": run_profiler.report()["stages"][1:],
+    }
+
+
+def run_stage(name: str, table_rows: Dict[str, int]) -> dict:
+    """
+    Run a stage in a fresh process, so that its peak memory and times are not affected by the
+    stages run before, with the throughput over the rows of the raw tables it reads.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        result = pool.apply(_measure, (name,))
+    stage = STAGES[name]
+    tables = stage.tables or list(table_rows)
+    input_rows = sum(table_rows.get(table, 0) for table in tables)
+    return {
+        "stage": name,
+        "input_rows": input_rows,
+        **result,
+        "rows_per_second": (
+            input_rows / result["seconds"] if result["seconds"] else None
+        ),
+    }
+
+
+def prepare_data(generator: SyntheticMimic) -> Dict[str, int]:
+    """Rows of the synthetic tables, generated unless those of the same parameters exist."""
+    manifest_path = RAW_PATH / MANIFEST_NAME
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["parameters"] == generator.parameters():
+            logger.info("[REUSING SYNTHETIC TABLES]")
+            return manifest["rows"]
+    start = time.perf_counter()
+    rows = generator.generate()
+    logger.info(f"[GENERATED SYNTHETIC TABLES IN {time.perf_counter() - start:.1f}s]")
+    return rows
+
+
+def run_benchmark(
+    generator: SyntheticMimic, stages: Optional[List[str]] = None
+) -> List[dict]:
+    """Generate the tables in the working directory and measure each stage on them."""
+    table_rows = prepare_data(generator)
+    for path in [
+        COHORT_PATH,
+        FEATURE_EXTRACT_PATH,
+        FEATURE_PREPROC_PATH,
+        FEATURE_SUMMARY_PATH,
+    ]:
+        path.mkdir(parents=True, exist_ok=True)
+    report = []
+    for name in stages or DEFAULT_STAGES:
+        logger.info(f"[RUNNING {name}]")
+        report.append(run_stage(name, table_rows))
+    return report
+
+
+def format_report(report: List[dict]) -> str:
+    df = pd.DataFrame(report).drop(columns="profile").set_index("stage")
+    return df.to_string(
+        float_format=lambda value: f"{value:,.1f}",
+        formatters={column: "{:,}".format for column in ["input_rows", "output_rows"]},
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline stages on synthetic MIMIC-IV tables."
+    )
+    parser.add_argument("--workdir", type=Path, required=True)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chart-events-per-stay", type=float, default=500)
+    parser.add_argument("--lab-events-per-admission", type=float, default=150)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES))
+    parser.add_argument("--output", type=Path, help="JSON file of the report")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    output = args.output.resolve() if args.output else None
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    # The data paths of the pipeline are relative to the working directory
+    os.chdir(args.workdir)
+    generator = SyntheticMimic(
+        args.patients,
+        seed=args.seed,
+        chart_events_per_stay=args.chart_events_per_stay,
+        lab_events_per_admission=args.lab_events_per_admission,
+    )
+    report = run_benchmark(generator, args.stages)
+    print(format_report(report))
+    if output:
+        with open(output, "w") as f:
+            json.dump(
+                {"parameters": generator.parameters(), "stages": report}, f, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
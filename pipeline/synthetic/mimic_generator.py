@@ -0,0 +1,665 @@
+import argparse
+import gzip
+import io
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline.file_info.code_map import IcdMapHeader
+from pipeline.file_info.path_prefix import MAPPING_PATH, RAW_PATH
+from pipeline.file_info.raw.hosp import HOSP
+from pipeline.file_info.raw.icu import ICU
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+"""
+Deterministic synthetic MIMIC-IV tables at any scale, with the columns read by the pipeline.
+"""
+
+MANIFEST_NAME = "synthetic_manifest.json"
+FIRST_SUBJECT_ID = 10000000
+FIRST_HADM_ID = 20000000
+FIRST_STAY_ID = 30000000
+SECONDS_PER_DAY = 24 * 3600
+
+# ICD-10 roots with the ICD-9 root they map to and their relative frequency
+DIAGNOSIS_ROOTS: List[Tuple[str, str, float]] = [
+    ("I10", "401", 10),
+    ("E78", "272", 8),
+    ("I25", "414", 6),
+    ("E11", "250", 6),
+    ("I50", "428", 5),
+    ("Z87", "V15", 5),
+    ("N18", "585", 4),
+    ("K21", "530", 4),
+    ("I48", "427", 4),
+    ("J44", "491", 3),
+    ("N17", "584", 3),
+    ("J18", "486", 3),
+    ("F32", "311", 3),
+    ("D64", "285", 3),
+]
+PROCEDURE_CODES: List[Tuple[str, int]] = [
+    ("3893", 9),
+    ("9604", 9),
+    ("9671", 9),
+    ("3961", 9),
+    ("02HV33Z", 10),
+    ("0BH17EZ", 10),
+    ("5A1955Z", 10),
+    ("B2111ZZ", 10),
+]
+# Drug name, NDC labeler and product codes, pharmacological classes
+DRUGS: List[Tuple[str, str, str]] = [
+    ("Heparin", "63323-0262", "Anticoagulant [EPC],Heparin [CS]"),
+    ("Insulin", "00409-4888", "Insulin [EPC],Insulin [CS]"),
+    (
+        "Furosemide",
+        "00054-4297",
+        "Loop Diuretic [EPC],Increased Diuresis at Loop of Henle [PE]",
+    ),
+    (
+        "Metoprolol",
+        "00378-0018",
+        "beta-Adrenergic Blocker [EPC],Adrenergic beta-Antagonists [MoA]",
+    ),
+    ("Acetaminophen", "00904-1982", "Analgesic [EPC]"),
+    ("Ondansetron", "68462-0105", "Serotonin-3 Receptor Antagonist [EPC]"),
+    (
+        "Potassium Chloride",
+        "00603-1556",
+        "Potassium Salt [EPC],Potassium Compounds [CS]",
+    ),
+    (
+        "Atorvastatin",
+        "00071-0155",
+        "HMG-CoA Reductase Inhibitor [EPC],Hydroxymethylglutaryl-CoA Reductase Inhibitors [MoA]",
+    ),
+    ("Pantoprazole", "00008-0841", "Proton Pump Inhibitor [EPC]"),
+    ("Sodium Chloride 0.9%", "00338-0049", None),
+]
+# Item id, unit, mean and standard deviation of the values, other unit sometimes recorded
+LAB_ITEMS: List[Tuple[int, str, float, float, str]] = [
+    (50912, "mg/dL", 1.2, 0.6, "umol/L"),  # Creatinine
+    (50971, "mEq/L", 4.2, 0.5, "mmol/L"),  # Potassium
+    (50983, "mEq/L", 139, 4, "mmol/L"),  # Sodium
+    (51006, "mg/dL", 22, 12, "mmol/L"),  # Urea nitrogen
+    (51221, "%", 32, 5, "g/dL"),  # Hematocrit
+    (51222, "g/dL", 10.5, 2, "g/L"),  # Hemoglobin
+    (51265, "K/uL", 220, 80, "10^9/L"),  # Platelets
+    (51301, "K/uL", 9, 4, "10^9/L"),  # White blood cells
+]
+CHART_ITEMS: List[Tuple[int, str, float, float, str]] = [
+    (220045, "bpm", 85, 15, "bpm"),  # Heart rate
+    (220179, "mmHg", 120, 20, "cmH2O"),  # Non invasive systolic blood pressure
+    (220180, "mmHg", 65, 12, "cmH2O"),  # Non invasive diastolic blood pressure
+    (220210, "insp/min", 19, 5, "breaths/min"),  # Respiratory rate
+    (220277, "%", 96, 3, "%"),  # SpO2
+    (223761, "°F", 98.4, 1.2, "°C"),  # Temperature, often recorded in both units
+    (220621, "mg/dL", 130, 40, "mmol/L"),  # Glucose
+]
+MIXED_UNIT_CHART_ITEMS = {223761: 0.3}  # Share of the rows with the other unit
+OUTPUT_ITEMS = [226559, 226560, 226561, 226584, 227510]
+INPUT_ITEMS = [225158, 220949, 225943, 221906, 222168, 225799]
+PROCEDURE_EVENT_ITEMS = [225459, 224275, 225792, 221214, 225402]
+CARE_UNITS = [
+    "Medical Intensive Care Unit (MICU)",
+    "Surgical Intensive Care Unit (SICU)",
+    "Cardiac Vascular Intensive Care Unit (CVICU)",
+    "Coronary Care Unit (CCU)",
+    "Trauma SICU (TSICU)",
+]
+ANCHOR_YEAR_GROUPS = ["2008 - 2010", "2011 - 2013", "2014 - 2016", "2017 - 2019"]
+INSURANCES = (["Medicare", "Medicaid", "Other"], [0.45, 0.1, 0.45])
+RACES = (
+    ["WHITE", "BLACK/AFRICAN AMERICAN", "HISPANIC/LATINO", "ASIAN", "OTHER", "UNKNOWN"],
+    [0.65, 0.13, 0.06, 0.04, 0.07, 0.05],
+)
+
+
+def _children(rng: np.random.Generator, mean: float, n_parents: int) -> np.ndarray:
+    """Positions of the parents of child rows, with a Poisson number of children per parent."""
+    return np.repeat(np.arange(n_parents), rng.poisson(mean, n_parents))
+
+
+def _rank_within(parents: np.ndarray) -> np.ndarray:
+    """Rank of each row among the rows of its parent, the parents being sorted."""
+    starts = np.flatnonzero(np.r_[True, parents[1:] != parents[:-1]])
+    counts = np.diff(np.r_[starts, len(parents)])
+    return np.arange(len(parents)) - np.repeat(starts, counts)
+
+
+def _times_within(
+    rng: np.random.Generator, start: np.ndarray, end: np.ndarray
+) -> np.ndarray:
+    """Uniform times, to the second, between start and end."""
+    seconds = (end - start).astype("timedelta64[s]").astype(np.int64)
+    offsets = (rng.random(len(start)) * seconds).astype(np.int64)
+    return start + offsets.astype("timedelta64[s]")
+
+
+def _weights(values: List[float]) -> np.ndarray:
+    weights = np.asarray(values, dtype=float)
+    return weights / weights.sum()
+
+
+def _measurements(
+    rng: np.random.Generator,
+    items: List[Tuple[int, str, float, float, str]],
+    n: int,
+    other_unit_share: float,
+    missing_value_share: float,
+    mixed_units: Dict[int, float],
+) -> Dict[str, np.ndarray]:
+    """Item ids, values and units of measurements, some with another unit or without value."""
+    item = rng.integers(0, len(items), n)
+    itemids = np.array([i[0] for i in items])[item]
+    means = np.array([i[2] for i in items])[item]
+    stds = np.array([i[3] for i in items])[item]
+    values = np.round(rng.normal(means, stds), 2)
+    values[rng.random(n) < missing_value_share] = np.nan
+    other_share = np.full(n, other_unit_share)
+    for itemid, share in mixed_units.items():
+        other_share[itemids == itemid] = share
+    units = np.where(
+        rng.random(n) < other_share,
+        np.array([i[4] for i in items], dtype=object)[item],
+        np.array([i[1] for i in items], dtype=object)[item],
+    )
+    return {"itemid": itemids, "valuenum": values, "valueuom": units}
+
+
+class _GzipCsvWriter:
+    """Gzip CSV written block by block, with the header of the first block."""
+
+    def __init__(self, path: Path, compresslevel: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.raw = open(path, "wb")
+        # A fixed modification time in the gzip header keeps the files identical across runs
+        self.file = io.TextIOWrapper(
+            gzip.GzipFile(
+                fileobj=self.raw, mode="wb", compresslevel=compresslevel, mtime=0
+            ),
+            newline="",
+        )
+        self.header = True
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+        self.rows += len(df)
+
+    def close(self) -> None:
+        self.file.close()
+        self.raw.close()
+
+
+class SyntheticMimic:
+    """
+    Deterministic generator of synthetic MIMIC-IV hosp and icu tables and of the code mappings.
+
+    Patients are generated in blocks of block_patients, each from its own random stream, so the
+    tables are the same for a given seed and scale and are written without holding them in
+    memory. The distributions mimic the ones the pipeline deals with: several admissions per
+    patient with readmissions, in-hospital deaths, ICD-9 and ICD-10 diagnoses, lab events without
+    admission id, some of them outside of any admission, and measurements recorded with another unit
+    or without value.
+
+    Attributes:
+        n_patients (int): Number of patients.
+        seed (int): Seed of the random streams.
+        admissions_per_patient (float): Mean number of admissions of a patient.
+        icu_share (float): Share of the admissions with an ICU stay.
+        chart_events_per_stay (float): Mean number of chart events of an ICU stay.
+        lab_events_per_admission (float): Mean number of lab events of an admission.
+        missing_lab_hadm_share (float): Share of the lab events without admission id.
+        other_unit_share (float): Share of the measurements recorded with another unit.
+        block_patients (int): Number of patients generated at once.
+        compresslevel (int): Gzip compression level of the tables.
+    """
+
+    def __init__(
+        self,
+        n_patients: int,
+        seed: int = 0,
+        admissions_per_patient: float = 2.0,
+        icu_share: float = 0.6,
+        chart_events_per_stay: float = 500,
+        lab_events_per_admission: float = 150,
+        missing_lab_hadm_share: float = 0.2,
+        other_unit_share: float = 0.02,
+        block_patients: int = 1000,
+        compresslevel: int = 1,
+    ):
+        self.n_patients = n_patients
+        self.seed = seed
+        self.admissions_per_patient = admissions_per_patient
+        self.icu_share = icu_share
+        self.chart_events_per_stay = chart_events_per_stay
+        self.lab_events_per_admission = lab_events_per_admission
+        self.missing_lab_hadm_share = missing_lab_hadm_share
+        self.other_unit_share = other_unit_share
+        self.block_patients = block_patients
+        self.compresslevel = compresslevel
+
+    def parameters(self) -> dict:
+        """Parameters determining the generated tables."""
+        parameters = dict(vars(self))
+        del parameters["compresslevel"]
+        return parameters
+
+    def generate(
+        self, root: Path = RAW_PATH, mapping_root: Path = MAPPING_PATH
+    ) -> Dict[str, int]:
+        """Write the tables under root and the mappings under mapping_root, returning their rows."""
+        root, mapping_root = Path(root), Path(mapping_root)
+        self.write_mappings(mapping_root)
+        writers: Dict[str, _GzipCsvWriter] = {}
+        next_ids = {"hadm_id": FIRST_HADM_ID, "stay_id": FIRST_STAY_ID, "row": 0}
+        try:
+            for block, first in enumerate(
+                range(0, self.n_patients, self.block_patients)
+            ):
+                rng = np.random.default_rng([self.seed, block])
+                n = min(self.block_patients, self.n_patients - first)
+                tables = self.generate_block(rng, FIRST_SUBJECT_ID + first, n, next_ids)
+                for name, df in tables.items():
+                    if name not in writers:
+                        writers[name] = _GzipCsvWriter(
+                            root / f"{name}.csv.gz", self.compresslevel
+                        )
+                    writers[name].write(df)
+                logger.info(f"[GENERATED {first + n}/{self.n_patients} PATIENTS]")
+        finally:
+            for writer in writers.values():
+                writer.close()
+        rows = {name: writer.rows for name, writer in writers.items()}
+        with open(root / MANIFEST_NAME, "w") as f:
+            json.dump({"parameters": self.parameters(), "rows": rows}, f, indent=2)
+        return rows
+
+    def write_mappings(self, mapping_root: Path) -> None:
+        """Write the ICD-9 to ICD-10 mapping and the NDC product table of the generated codes."""
+        mapping_root.mkdir(parents=True, exist_ok=True)
+        icd_map = pd.DataFrame(
+            [
+                (kind, code, "", icd9, icd10, 0)
+                for icd10, icd9, _ in DIAGNOSIS_ROOTS
+                for kind, code, icd9, icd10 in [
+                    ("D", icd9, icd9, f"{icd10}9"),
+                    ("D", f"{icd9}0", f"{icd9}0", f"{icd10}0"),
+                ]
+            ],
+            columns=[
+                IcdMapHeader.DIAGNOSIS_TYPE,
+                IcdMapHeader.DIAGNOSIS_CODE,
+                IcdMapHeader.DIAGNOSIS_DESCRIPTION,
+                IcdMapHeader.ICD9,
+                IcdMapHeader.ICD10,
+                IcdMapHeader.FLAGS,
+            ],
+        )
+        icd_map.to_csv(
+            mapping_root / "ICD9_to_ICD10_mapping.txt", sep="\t", index=False
+        )
+        ndc_map = pd.DataFrame(
+            {
+                "PRODUCTID": [f"{ndc}_{i}" for i, (_, ndc, _) in enumerate(DRUGS)],
+                "PRODUCTNDC": [ndc for _, ndc, _ in DRUGS],
+                "NONPROPRIETARYNAME": [drug.upper() for drug, _, _ in DRUGS],
+                "PHARM_CLASSES": [classes for _, _, classes in DRUGS],
+            }
+        )
+        ndc_map.to_csv(mapping_root / "ndc_product.txt", sep="\t", index=False)
+
+    def generate_block(
+        self,
+        rng: np.random.Generator,
+        first_subject_id: int,
+        n: int,
+        next_ids: Dict[str, int],
+    ) -> Dict[str, pd.DataFrame]:
+        """Tables of n patients, by path relative to the root, with ids following next_ids."""
+        patients = pd.DataFrame(
+            {
+                "subject_id": first_subject_id + np.arange(n),
+                "gender": rng.choice(["F", "M"], n),
+                "anchor_age": np.clip(np.round(rng.normal(58, 19, n)), 16, 91).astype(
+                    int
+                ),
+                "anchor_year": rng.integers(2110, 2186, n),
+                "anchor_year_group": rng.choice(ANCHOR_YEAR_GROUPS, n),
+            }
+        )
+        admissions = self.admissions(rng, patients, next_ids)
+        self.add_deaths(rng, patients, admissions)
+        stays = self.icustays(rng, admissions, next_ids)
+        return {
+            f"{HOSP}/patients": patients,
+            f"{HOSP}/admissions": admissions,
+            f"{HOSP}/diagnoses_icd": self.diagnoses(rng, admissions),
+            f"{HOSP}/procedures_icd": self.procedures(rng, admissions),
+            f"{HOSP}/prescriptions": self.prescriptions(rng, admissions),
+            f"{HOSP}/labevents": self.lab_events(rng, admissions, next_ids),
+            f"{ICU}/icustays": stays,
+            f"{ICU}/chartevents": self.chart_events(rng, stays),
+            f"{ICU}/outputevents": self.output_events(rng, stays),
+            f"{ICU}/inputevents": self.input_events(rng, stays, next_ids),
+            f"{ICU}/procedureevents": self.procedure_events(rng, stays),
+        }
+
+    def admissions(
+        self, rng: np.random.Generator, patients: pd.DataFrame, next_ids: Dict[str, int]
+    ) -> pd.DataFrame:
+        """Successive admissions of each patient, with gaps short enough for some readmissions."""
+        parents = np.repeat(
+            np.arange(len(patients)),
+            1 + rng.poisson(self.admissions_per_patient - 1, len(patients)),
+        )
+        n = len(parents)
+        stay_seconds = np.clip(
+            rng.lognormal(np.log(4 * SECONDS_PER_DAY), 0.8, n),
+            4 * 3600,
+            60 * SECONDS_PER_DAY,
+        ).astype(np.int64)
+        gap_seconds = (rng.exponential(150, n) * SECONDS_PER_DAY).astype(np.int64)
+        first = _rank_within(parents) == 0
+        gap_seconds[first] = rng.integers(0, 2 * 365 * SECONDS_PER_DAY, first.sum())
+        # Each admission starts after the previous ones of the patient and the gaps between them
+        elapsed = np.cumsum(gap_seconds + stay_seconds) - stay_seconds
+        elapsed -= np.repeat(elapsed[first] - gap_seconds[first], np.bincount(parents))
+        years = (patients["anchor_year"].to_numpy() - 1970).astype("datetime64[Y]")
+        admittime = years.astype("datetime64[s]")[parents] + elapsed.astype(
+            "timedelta64[s]"
+        )
+        hadm_ids = next_ids["hadm_id"] + np.arange(n)
+        next_ids["hadm_id"] += n
+        return pd.DataFrame(
+            {
+                "subject_id": patients["subject_id"].to_numpy()[parents],
+                "hadm_id": hadm_ids,
+                "admittime": admittime,
+                "dischtime": admittime + stay_seconds.astype("timedelta64[s]"),
+                "admission_type": rng.choice(["EW EMER.", "ELECTIVE", "URGENT"], n),
+                "insurance": rng.choice(INSURANCES[0], n, p=INSURANCES[1]),
+                "race": rng.choice(RACES[0], n, p=RACES[1]),
+                "hospital_expire_flag": 0,
+            }
+        )
+
+    def add_deaths(
+        self, rng: np.random.Generator, patients: pd.DataFrame, admissions: pd.DataFrame
+    ) -> None:
+        """Dates of death of some patients, during their last admission for part of them."""
+        last = admissions.drop_duplicates("subject_id", keep="last")
+        dead = last[rng.random(len(last)) < 0.12]
+        in_hospital = rng.random(len(dead)) < 0.5
+        admissions.loc[dead.index[in_hospital], "hospital_expire_flag"] = 1
+        days_after = np.where(in_hospital, 0, rng.integers(1, 700, len(dead)))
+        dod = dead["dischtime"].dt.floor("D") + pd.to_timedelta(days_after, unit="D")
+        patients["dod"] = patients["subject_id"].map(
+            pd.Series(dod.dt.strftime("%Y-%m-%d").to_numpy(), index=dead["subject_id"])
+        )
+
+    def icustays(
+        self,
+        rng: np.random.Generator,
+        admissions: pd.DataFrame,
+        next_ids: Dict[str, int],
+    ) -> pd.DataFrame:
+        """At most one ICU stay per admission, within the admission."""
+        stays = admissions[rng.random(len(admissions)) < self.icu_share]
+        n = len(stays)
+        admit = stays["admittime"].to_numpy()
+        disch = stays["dischtime"].to_numpy()
+        intime = _times_within(rng, admit, admit + (disch - admit) // 4)
+        length = np.clip(
+            rng.lognormal(np.log(2 * SECONDS_PER_DAY), 0.9, n).astype(np.int64),
+            2 * 3600,
+            (disch - intime).astype("timedelta64[s]").astype(np.int64),
+        )
+        outtime = intime + length.astype("timedelta64[s]")
+        stay_ids = next_ids["stay_id"] + np.arange(n)
+        next_ids["stay_id"] += n
+        care_units = rng.choice(CARE_UNITS, n)
+        return pd.DataFrame(
+            {
+                "subject_id": stays["subject_id"].to_numpy(),
+                "hadm_id": stays["hadm_id"].to_numpy(),
+                "stay_id": stay_ids,
+                "first_careunit": care_units,
+                "last_careunit": np.where(
+                    rng.random(n) < 0.9, care_units, rng.choice(CARE_UNITS, n)
+                ),
+                "intime": intime,
+                "outtime": outtime,
+                "los": np.round(length / SECONDS_PER_DAY, 6),
+            }
+        )
+
+    def diagnoses(
+        self, rng: np.random.Generator, admissions: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Diagnoses of each admission, coded in ICD-9 or ICD-10."""
+        parents = np.repeat(
+            np.arange(len(admissions)), 1 + rng.poisson(7, len(admissions))
+        )
+        n = len(parents)
+        root = rng.choice(
+            len(DIAGNOSIS_ROOTS), n, p=_weights([r[2] for r in DIAGNOSIS_ROOTS])
+        )
+        version = np.where(rng.random(len(admissions)) < 0.4, 9, 10)[parents]
+        roots = np.where(
+            version == 9,
+            np.array([r[1] for r in DIAGNOSIS_ROOTS], dtype=object)[root],
+            np.array([r[0] for r in DIAGNOSIS_ROOTS], dtype=object)[root],
+        )
+        return pd.DataFrame(
+            {
+                "subject_id": admissions["subject_id"].to_numpy()[parents],
+                "hadm_id": admissions["hadm_id"].to_numpy()[parents],
+                "seq_num": _rank_within(parents) + 1,
+                "icd_code": roots + rng.integers(0, 10, n).astype(str).astype(object),
+                "icd_version": version,
+            }
+        )
+
+    def procedures(
+        self, rng: np.random.Generator, admissions: pd.DataFrame
+    ) -> pd.DataFrame:
+        parents = _children(rng, 1.5, len(admissions))
+        code = rng.integers(0, len(PROCEDURE_CODES), len(parents))
+        chartdate = _times_within(
+            rng,
+            admissions["admittime"].to_numpy()[parents],
+            admissions["dischtime"].to_numpy()[parents],
+        ).astype("datetime64[D]")
+        return pd.DataFrame(
+            {
+                "subject_id": admissions["subject_id"].to_numpy()[parents],
+                "hadm_id": admissions["hadm_id"].to_numpy()[parents],
+                "seq_num": _rank_within(parents) + 1,
+                "chartdate": chartdate,
+                "icd_code": np.array([c[0] for c in PROCEDURE_CODES])[code],
+                "icd_version": np.array([c[1] for c in PROCEDURE_CODES])[code],
+            }
+        )
+
+    def prescriptions(
+        self, rng: np.random.Generator, admissions: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Prescriptions with inconsistently written drug names and some missing NDC codes."""
+        parents = _children(rng, 20, len(admissions))
+        n = len(parents)
+        drug = rng.choice(
+            len(DRUGS), n, p=_weights([1 / (i + 1) for i in range(len(DRUGS))])
+        )
+        names = np.array([d[0] for d in DRUGS], dtype=object)[drug]
+        spelling = rng.integers(0, 3, n)
+        names = np.where(spelling == 1, pd.Series(names).str.upper(), names)
+        names = np.where(spelling == 2, pd.Series(names) + " ", names)
+        ndc = np.array(
+            [int(d[1].replace("-", "")) * 100 + 1 for d in DRUGS], dtype=float
+        )[drug]
+        ndc[rng.random(n) < 0.1] = np.nan
+        ndc[rng.random(n) < 0.03] = 0
+        starttime = _times_within(
+            rng,
+            admissions["admittime"].to_numpy()[parents],
+            admissions["dischtime"].to_numpy()[parents],
+        )
+        return pd.DataFrame(
+            {
+                "subject_id": admissions["subject_id"].to_numpy()[parents],
+                "hadm_id": admissions["hadm_id"].to_numpy()[parents],
+                "starttime": starttime,
+                "stoptime": starttime
+                + rng.integers(3600, 5 * SECONDS_PER_DAY, n).astype("timedelta64[s]"),
+                "drug": names,
+                "ndc": pd.array(ndc, dtype="Int64"),
+                "dose_val_rx": rng.choice(["1", "2", "0.5", "1-2"], n),
+            }
+        )
+
+    def lab_events(
+        self,
+        rng: np.random.Generator,
+        admissions: pd.DataFrame,
+        next_ids: Dict[str, int],
+    ) -> pd.DataFrame:
+        """Lab events of the admissions, part of them without admission id and some outside of it."""
+        parents = _children(rng, self.lab_events_per_admission, len(admissions))
+        n = len(parents)
+        admit = admissions["admittime"].to_numpy()[parents]
+        charttime = _times_within(
+            rng, admit, admissions["dischtime"].to_numpy()[parents]
+        )
+        hadm_ids = pd.array(admissions["hadm_id"].to_numpy()[parents], dtype="Int64")
+        missing = rng.random(n) < self.missing_lab_hadm_share
+        hadm_ids[missing] = pd.NA
+        # Outpatient labs: before the admission, without admission id
+        before = missing & (rng.random(n) < 0.3)
+        charttime[before] = admit[before] - rng.integers(
+            3600, 3 * SECONDS_PER_DAY, before.sum()
+        ).astype("timedelta64[s]")
+        measurements = _measurements(rng, LAB_ITEMS, n, self.other_unit_share, 0.03, {})
+        measurements["valueuom"][rng.random(n) < 0.02] = None
+        lab_ids = next_ids["row"] + np.arange(n)
+        next_ids["row"] += n
+        return pd.DataFrame(
+            {
+                "labevent_id": lab_ids,
+                "subject_id": admissions["subject_id"].to_numpy()[parents],
+                "hadm_id": hadm_ids,
+                "itemid": measurements["itemid"],
+                "charttime": charttime,
+                "valuenum": measurements["valuenum"],
+                "valueuom": measurements["valueuom"],
+            }
+        )
+
+    def _stay_events(
+        self, rng: np.random.Generator, stays: pd.DataFrame, mean: float
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Parents of events of ICU stays and their ids and times within the stays."""
+        parents = _children(rng, mean, len(stays))
+        return parents, {
+            "subject_id": stays["subject_id"].to_numpy()[parents],
+            "hadm_id": stays["hadm_id"].to_numpy()[parents],
+            "stay_id": stays["stay_id"].to_numpy()[parents],
+            "charttime": _times_within(
+                rng,
+                stays["intime"].to_numpy()[parents],
+                stays["outtime"].to_numpy()[parents],
+            ),
+        }
+
+    def chart_events(
+        self, rng: np.random.Generator, stays: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Vital signs of the ICU stays, some with another unit or without value."""
+        parents, events = self._stay_events(rng, stays, self.chart_events_per_stay)
+        n = len(parents)
+        events.update(
+            _measurements(
+                rng,
+                CHART_ITEMS,
+                n,
+                self.other_unit_share,
+                0.03,
+                MIXED_UNIT_CHART_ITEMS,
+            )
+        )
+        chart = pd.DataFrame(events)
+        chart["storetime"] = chart["charttime"] + pd.to_timedelta(
+            rng.integers(0, 3600, n), unit="s"
+        )
+        return chart.sort_values(["subject_id", "stay_id", "charttime"], kind="stable")
+
+    def output_events(
+        self, rng: np.random.Generator, stays: pd.DataFrame
+    ) -> pd.DataFrame:
+        parents, events = self._stay_events(rng, stays, 20)
+        n = len(parents)
+        output = pd.DataFrame(events)
+        output["itemid"] = rng.choice(OUTPUT_ITEMS, n)
+        output["value"] = np.round(rng.lognormal(np.log(150), 0.8, n))
+        output["valueuom"] = "ml"
+        return output
+
+    def input_events(
+        self, rng: np.random.Generator, stays: pd.DataFrame, next_ids: Dict[str, int]
+    ) -> pd.DataFrame:
+        parents, events = self._stay_events(rng, stays, 15)
+        n = len(parents)
+        inputs = pd.DataFrame(events).rename(columns={"charttime": "starttime"})
+        inputs["endtime"] = inputs["starttime"] + pd.to_timedelta(
+            rng.integers(60, 12 * 3600, n), unit="s"
+        )
+        inputs["itemid"] = rng.choice(INPUT_ITEMS, n)
+        inputs["amount"] = np.round(rng.lognormal(np.log(50), 1, n), 3)
+        inputs["rate"] = np.where(
+            rng.random(n) < 0.5, np.round(rng.lognormal(np.log(20), 1, n), 3), np.nan
+        )
+        inputs["orderid"] = next_ids["row"] + np.arange(n)
+        next_ids["row"] += n
+        return inputs
+
+    def procedure_events(
+        self, rng: np.random.Generator, stays: pd.DataFrame
+    ) -> pd.DataFrame:
+        parents, events = self._stay_events(rng, stays, 3)
+        procedures = pd.DataFrame(events).rename(columns={"charttime": "starttime"})
+        procedures["endtime"] = procedures["starttime"] + pd.to_timedelta(
+            rng.integers(60, 24 * 3600, len(parents)), unit="s"
+        )
+        procedures["itemid"] = rng.choice(PROCEDURE_EVENT_ITEMS, len(parents))
+        return procedures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic MIMIC-IV tables.")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chart-events-per-stay", type=float, default=500)
+    parser.add_argument("--lab-events-per-admission", type=float, default=150)
+    parser.add_argument("--root", type=Path, default=RAW_PATH)
+    parser.add_argument("--mapping-root", type=Path, default=MAPPING_PATH)
+    args = parser.parse_args()
+    rows = SyntheticMimic(
+        args.patients,
+        seed=args.seed,
+        chart_events_per_stay=args.chart_events_per_stay,
+        lab_events_per_admission=args.lab_events_per_admission,
+    ).generate(args.root, args.mapping_root)
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
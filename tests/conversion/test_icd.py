@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from pipeline.conversion import icd
+from pipeline.conversion.icd import IcdConverter
+
+
+def standardize_icd_per_row(converter: IcdConverter, df: pd.DataFrame) -> pd.DataFrame:
+    """The row by row conversion standardize_icd replaced."""
+    df["root_icd10_convert"] = df.apply(
+        lambda row: converter.convert_icd(row["icd_code"], row["icd_version"]),
+        axis=1,
+    )
+    df["root"] = df["root_icd10_convert"].apply(
+        lambda x: x[:3] if isinstance(x, str) else np.nan
+    )
+    return df
+
+
+def test_standardize_icd_matches_per_row_conversion(monkeypatch):
+    monkeypatch.setattr(
+        icd, "load_icd_9_to_10_mapping", lambda: {"401": "I10", "250": "E119"}
+    )
+    converter = IcdConverter()
+    diagnoses = pd.DataFrame(
+        {
+            "subject_id": range(8),
+            "icd_code": ["4019", "25000", "9999", "V3000", "I10", "E119", None, "A0"],
+            "icd_version": [9, 9, 9, 9, 10, 10, 10, 10],
+        }
+    )
+    expected = standardize_icd_per_row(converter, diagnoses.copy())
+    standardized = converter.standardize_icd(diagnoses.copy())
+    assert standardized.columns.tolist() == expected.columns.tolist()
+    pd.testing.assert_frame_equal(standardized, expected, check_dtype=False)
+    # ICD-9 codes without a mapping and missing codes have no root
+    assert standardized["root"].tolist()[:2] == ["I10", "E11"]
+    assert standardized["root"].isna().tolist() == [
+        False,
+        False,
+        True,
+        True,
+        False,
+        False,
+        True,
+        False,
+    ]
+
+    # The per-row conversion fails on missing ICD-9 codes, which have no root
+    missing = converter.standardize_icd(
+        pd.DataFrame({"icd_code": [None, "4019"], "icd_version": [9, 9]})
+    )
+    assert missing["root"].isna().tolist() == [True, False]
@@ -0,0 +1,21 @@
+import pandas as pd
+from pipeline.conversion.icd_index import DiseaseCombination, IcdRootIndex
+
+
+def test_icd_root_index(tmp_path):
+    diag = pd.DataFrame(
+        {
+            "hadm_id": [3, 1, 1, 2, 3, 4],
+            "root": ["I50", "I50", "I25", "I25", "I50", None],
+        }
+    )
+    index = IcdRootIndex.from_diagnoses(diag)
+    index.save(tmp_path / "index.npz", "v1")
+    assert IcdRootIndex.load(tmp_path / "index.npz", "v2") is None
+    index = IcdRootIndex.load(tmp_path / "index.npz", "v1")
+
+    assert index.get_pos_ids("I50").tolist() == [1, 3]
+    assert index.get_pos_ids("I").tolist() == [1, 2, 3]
+    assert index.get_pos_ids("J44").tolist() == []
+    assert index.select(["I50", "I25"]).tolist() == [1]
+    assert index.select(["I50", "I25"], DiseaseCombination.ANY).tolist() == [1, 2, 3]
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from pipeline.conversion.ndc import (
+    convert_ndc_to_string,
+    format_ndc_table,
+    get_EPC,
+    explode_EPC,
+    multi_hot_EPC,
+)
+
+
+def test_ndc_formats():
+    ndc = pd.Series([409488801, -1, 12345678901], dtype="Int64")
+    assert convert_ndc_to_string(ndc).tolist()[::2] == ["004094888", "123456789"]
+    assert pd.isna(convert_ndc_to_string(ndc)[1])
+    table_ndc = pd.Series(["0409-4888", "63323-262", "1-2-3"])
+    assert format_ndc_table(table_ndc).tolist() == [
+        "004094888",
+        "633230262",
+        "000010002",
+    ]
+
+
+def test_EPC_forms():
+    pharm_classes = pd.Series(
+        ["Insulin [EPC],Insulin [CS]", np.nan, "Heparin [CS]", "Insulin [EPC]"]
+    )
+    epc = get_EPC(pharm_classes)
+    assert epc[0] == ["Insulin [EPC]"] and pd.isna(epc[1]) and epc[2] == []
+    assert explode_EPC(pharm_classes).index.tolist() == [0, 3]
+    multi_hot = multi_hot_EPC(pharm_classes)
+    assert multi_hot["Insulin [EPC]"].tolist() == [1, 0, 0, 1]
@@ -0,0 +1,81 @@
+import pandas as pd
+from pipeline.conversion.uom import (
+    apply_uom_decisions,
+    count_uom,
+    drop_wrong_uom,
+    load_uom_decisions,
+    uom_decisions,
+)
+
+
+def test_uom_decisions_round_trip(tmp_path):
+    data = pd.DataFrame(
+        {"itemid": [1, 1, 1, 2, 2], "valueuom": ["NA", "NA", "mg", "mL", None]}
+    )
+    decisions = uom_decisions(count_uom(data), 0.5)
+    decisions.to_csv(tmp_path / "uom.csv", index=False)
+    loaded = load_uom_decisions(tmp_path / "uom.csv")
+    assert loaded["valueuom"].tolist() == ["NA", "mL"]
+    assert loaded["keep_only_most_frequent"].tolist() == [True, False]
+    assert apply_uom_decisions(data, loaded)["valueuom"].tolist()[:2] == ["NA", "NA"]
+    assert len(apply_uom_decisions(data, loaded)) == 4
+
+
+def test_uom_decisions_without_data(tmp_path):
+    decisions = uom_decisions(None, 0.5)
+    decisions.to_csv(tmp_path / "uom.csv", index=False)
+    loaded = load_uom_decisions(tmp_path / "uom.csv")
+    assert loaded.dtypes.astype(str).tolist() == decisions.dtypes.astype(str).tolist()
+    assert loaded["keep_only_most_frequent"].dtype == bool
+    data = pd.DataFrame({"itemid": [1], "valueuom": ["mg"]})
+    assert len(apply_uom_decisions(data, loaded)) == 1
+
+
+def drop_wrong_uom_per_item(data: pd.DataFrame, cut_off: float) -> pd.DataFrame:
+    """The grouped apply drop_wrong_uom replaced, rows kept in their input order."""
+
+    def filter_by_uom_frequency(group):
+        value_counts = group["valueuom"].value_counts()
+        most_frequent_uom = value_counts.idxmax()
+        frequency = value_counts.max()
+        if frequency / len(group) > cut_off:
+            return group[group["valueuom"] == most_frequent_uom]
+        return group
+
+    kept = [filter_by_uom_frequency(group) for _, group in data.groupby("itemid")]
+    return pd.concat(kept).sort_index().reset_index(drop=True)
+
+
+def test_drop_wrong_uom_matches_per_item_filter():
+    items = {
+        # A single unit, with a missing one
+        1: ["mg"] * 3 + [None],
+        # Exactly at the cut-off, so nothing is dropped
+        2: ["mL"] * 3 + ["L"],
+        # Above the cut-off
+        3: ["bpm"] * 9 + ["/min"],
+        # Tied units, above the lowest cut-off
+        4: ["F", "C", "F", "C"],
+        # Missing units count in the share of the most frequent one
+        5: ["%"] * 7 + [None] * 3,
+        6: ["cm"],
+    }
+    data = pd.DataFrame(
+        [(item, uom) for item, units in items.items() for uom in units],
+        columns=["itemid", "valueuom"],
+    )
+    data = data.sample(frac=1, random_state=0).reset_index(drop=True)
+    data["valuenum"] = range(len(data))
+    # Ties are broken by first appearance, or by category order like the chart events units
+    categorical = data.astype({"valueuom": "category"})
+    for cut_off in [0.3, 0.5, 0.75, 0.95]:
+        for frame in (data, categorical):
+            pd.testing.assert_frame_equal(
+                drop_wrong_uom(frame, cut_off), drop_wrong_uom_per_item(frame, cut_off)
+            )
+    assert set(drop_wrong_uom(data, 0.75)["itemid"]) == set(items)
+    assert (drop_wrong_uom(data, 0.75)["itemid"] == 3).sum() == 9
+
+    # Items without any unit are kept, where the grouped apply failed
+    no_unit = pd.DataFrame({"itemid": [7, 7], "valueuom": [None, None]})
+    assert len(drop_wrong_uom(no_unit, 0.5)) == 2
@@ -0,0 +1,51 @@
+import pandas as pd
+from pipeline.preprocessing.admission_imputer import (
+    INPUTED_HOSPITAL_ADMISSION_ID_HEADER,
+    impute_hadm_ids,
+)
+
+
+def test_impute_hadm_ids():
+    admissions = pd.DataFrame(
+        {
+            "subject_id": [1, 1, 1, 2],
+            "hadm_id": [10, 11, 12, 20],
+            "admittime": pd.to_datetime(
+                ["2100-01-01", "2100-01-05", "2100-01-03", "2100-01-01"]
+            ),
+            "dischtime": pd.to_datetime(
+                ["2100-01-10", "2100-01-06", "2100-01-04", "2100-01-02"]
+            ),
+        }
+    )
+    lab = pd.DataFrame(
+        {
+            "subject_id": [1, 1, 1, 1, 2, 3],
+            "hadm_id": [None, None, None, 10, None, None],
+            "charttime": pd.to_datetime(
+                [
+                    "2100-01-02 00:00",  # only in 10
+                    "2100-01-05 12:00",  # in 10 and 11, 11 started last
+                    "2100-01-08 00:00",  # back in 10 after 11 was discharged
+                    "2100-01-05 12:00",  # known admission is kept
+                    "2100-01-03 00:00",  # after the only admission of the patient
+                    "2100-01-02 00:00",  # patient without admission
+                ]
+            ),
+        }
+    )
+    imputed = impute_hadm_ids(lab, admissions)
+    assert imputed[INPUTED_HOSPITAL_ADMISSION_ID_HEADER].tolist()[:4] == [
+        10,
+        11,
+        10,
+        10,
+    ]
+    assert imputed[INPUTED_HOSPITAL_ADMISSION_ID_HEADER].iloc[4:].isna().all()
+    assert imputed["admittime"].iloc[1] == pd.Timestamp("2100-01-05")
+    assert imputed["dischtime"].iloc[2] == pd.Timestamp("2100-01-10")
+    assert imputed.columns.tolist() == lab.columns.tolist() + [
+        INPUTED_HOSPITAL_ADMISSION_ID_HEADER,
+        "admittime",
+        "dischtime",
+    ]
@@ -0,0 +1,44 @@
+import pandas as pd
+from pipeline.file_info.preproc.cohort import COHORT_PATH
+from pipeline.prediction_task import PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature import chart_events
+from pipeline.preprocessing.feature.chart_events import ChartEvents
+from pipeline.synthetic.mimic_generator import MIXED_UNIT_CHART_ITEMS, SyntheticMimic
+
+
+def test_streaming_uom_matches_in_memory_filter(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    SyntheticMimic(30, chart_events_per_stay=50, other_unit_share=0.1).generate()
+    COHORT_PATH.mkdir(parents=True)
+    task = PredictionTask(TargetType.READMISSION, None, None, 30, use_icu=True)
+    cohort = CohortExtractor(task).extract().df
+
+    in_memory = ChartEvents(chunksize=500)
+    expected = in_memory.extract_from(cohort)
+    streaming = ChartEvents(chunksize=500, streaming_uom=True)
+    pd.testing.assert_frame_equal(streaming.extract_from(cohort), expected)
+    pd.testing.assert_frame_equal(
+        streaming.used_uom_decisions,
+        in_memory.used_uom_decisions,
+        check_dtype=False,
+        check_index_type=False,
+    )
+    # Items with other units are restricted to their main one, the mixed items are not
+    decisions = streaming.used_uom_decisions.set_index("itemid")
+    assert decisions["keep_only_most_frequent"].any()
+    assert not decisions.loc[
+        list(MIXED_UNIT_CHART_ITEMS), "keep_only_most_frequent"
+    ].any()
+
+    # A later run reuses the saved decisions without counting the units again
+    assert streaming.uom_decisions_path(cohort).exists()
+
+    def count_uom(data):
+        raise AssertionError("units counted again")
+
+    monkeypatch.setattr(chart_events, "count_uom", count_uom)
+    pd.testing.assert_frame_equal(
+        ChartEvents(chunksize=500, streaming_uom=True).extract_from(cohort), expected
+    )
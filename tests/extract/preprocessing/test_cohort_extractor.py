@@ -1,5 +1,8 @@
 import pytest
-from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.cohort.cohort_extractor import (
+    BatchCohortExtractor,
+    CohortExtractor,
+)
 from pipeline.prediction_task import PredictionTask, TargetType
 from pipeline.file_info.preproc.cohort import (
     CohortHeader,
@@ -83,3 +86,23 @@ def test_extract_cohort_without_icu(
         == expected_admission_records_count
     )
     assert df[CohortHeader.LABEL].sum() == expected_positive_cases_count
+
+
+def test_batch_extraction_matches_single_extractions():
+    prediction_tasks = [
+        PredictionTask(target_type, disease, None, nb_days, use_icu)
+        for use_icu in [True, False]
+        for target_type, nb_days, disease in [
+            (TargetType.MORTALITY, 0, None),
+            (TargetType.LOS, 3, None),
+            (TargetType.READMISSION, 30, None),
+            (TargetType.READMISSION, 90, None),
+            (TargetType.READMISSION, 30, "I50"),
+        ]
+    ]
+    cohorts = BatchCohortExtractor(prediction_tasks).extract()
+    assert len(cohorts) == len(prediction_tasks)
+    for prediction_task, cohort in zip(prediction_tasks, cohorts):
+        expected = CohortExtractor(prediction_task=prediction_task).extract()
+        assert cohort.name == expected.name
+        assert cohort.df.equals(expected.df)
@@ -1,7 +1,14 @@
+import pandas as pd
+from pipeline.file_info.cache import FEATURE_SPILL_PATH
+from pipeline.file_info.preproc.cohort import COHORT_PATH
+from pipeline.file_info.preproc.feature.path_prefix import FEATURE_EXTRACT_PATH
+from pipeline.prediction_task import PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
 from pipeline.preprocessing.feature.feature_extractor import (
     FeatureExtractor,
 )
 from pipeline.preprocessing.feature.feature_abc import FeatureGroup
+from pipeline.synthetic.mimic_generator import SyntheticMimic
 
 
 def test_feature_icu_all_true():
@@ -125,3 +132,35 @@ def test_feature_non_icu_all_true():
         "valuenum",
         "valueuom",
     ]
+
+
+def test_parallel_features_match_sequential(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    SyntheticMimic(30, chart_events_per_stay=20, lab_events_per_admission=10).generate()
+    COHORT_PATH.mkdir(parents=True)
+    FEATURE_EXTRACT_PATH.mkdir(parents=True)
+    for use_icu in [True, False]:
+        task = PredictionTask(TargetType.READMISSION, None, None, 30, use_icu=use_icu)
+        cohort_extractor = CohortExtractor(task)
+        cohort_extractor.extract()
+        features = {}
+        for n_workers in [1, 2]:
+            features[n_workers] = FeatureExtractor(
+                cohort_output=cohort_extractor.output,
+                use_icu=use_icu,
+                for_diagnoses=True,
+                for_output_events=use_icu,
+                for_chart_events=use_icu,
+                for_procedures=True,
+                for_medications=True,
+                for_labs=not use_icu,
+                n_workers=n_workers,
+            ).save_features()
+        assert list(features[2]) == list(features[1])
+        for group, feature in features[1].items():
+            assert len(feature) > 0
+            pd.testing.assert_frame_equal(features[2][group], feature)
+        spill_files = list(FEATURE_SPILL_PATH.rglob("*.pkl"))
+        del features
+        assert spill_files and not any(path.exists() for path in spill_files)
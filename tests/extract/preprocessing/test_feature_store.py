@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from pipeline.file_info.preproc.cohort import COHORT_PATH
+from pipeline.prediction_task import PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.feature_abc import FeatureGroup
+from pipeline.preprocessing.feature.feature_store import FeatureStoreWriter
+from pipeline.preprocessing.feature.medications import Medications
+from pipeline.synthetic.mimic_generator import SyntheticMimic
+
+
+def test_write_and_read(tmp_path):
+    chart = pd.DataFrame(
+        {
+            "stay_id": [3, 1, 3, 1, 2],
+            "itemid": [10, 20, 30, 40, 50],
+            "valuenum": [1.0, 2.0, np.nan, 4.0, 5.0],
+            "valueuom": ["bpm", None, "bpm", "°C", "bpm"],
+            "event_time_from_admit": pd.to_timedelta(["1h", "2h", "3h", "4h", "5h"]),
+        }
+    )
+    store = FeatureStoreWriter(tmp_path).write_features(
+        {FeatureGroup.CHART: chart}, use_icu=True
+    )
+    table = store[FeatureGroup.CHART]
+    assert len(table) == 5
+    assert table.ids.tolist() == [1, 2, 3]
+    # Rows of an id are contiguous and keep their order
+    stay = table.get(3)
+    assert stay["itemid"].tolist() == [10, 30]
+    assert isinstance(stay["itemid"].base, np.memmap)
+    assert table.get(4)["itemid"].tolist() == []
+    assert 4 not in table
+    frame = table.frame(1)
+    assert frame["valueuom"].tolist()[1] == "°C"
+    assert pd.isna(frame["valueuom"][0])
+    assert frame["event_time_from_admit"].tolist() == list(
+        pd.to_timedelta(["2h", "4h"])
+    )
+
+
+def test_write_medications_without_icu(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    SyntheticMimic(30, chart_events_per_stay=5, lab_events_per_admission=5).generate()
+    COHORT_PATH.mkdir(parents=True)
+    task = PredictionTask(TargetType.READMISSION, None, None, 30, use_icu=False)
+    cohort = CohortExtractor(task).extract().df
+    medications = Medications(with_icu=False).extract_from(cohort)
+    # EPC holds the list of the pharmacologic classes of each drug
+    assert medications["EPC"].map(lambda value: isinstance(value, list)).any()
+
+    store = FeatureStoreWriter(tmp_path / "store").write_features(
+        {FeatureGroup.MEDICATIONS: medications}, use_icu=False
+    )
+    table = store[FeatureGroup.MEDICATIONS]
+    assert table.meta["lists"] == ["EPC"]
+    hadm_id = int(medications["hadm_id"].iloc[0])
+    expected = medications[medications["hadm_id"] == hadm_id]
+    frame = table.frame(hadm_id)
+    assert frame["drug"].tolist() == expected["drug"].tolist()
+    assert frame["EPC"].tolist() == [
+        value if isinstance(value, list) else [] for value in expected["EPC"]
+    ]
+    assert len(table.get(hadm_id)["EPC"]) == sum(map(len, frame["EPC"]))
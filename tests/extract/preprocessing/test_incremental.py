@@ -0,0 +1,85 @@
+import pandas as pd
+from pipeline.extract.csv_tools import load_data
+from pipeline.file_info.preproc.cohort import COHORT_PATH, CohortHeader
+from pipeline.file_info.preproc.feature.path_prefix import FEATURE_EXTRACT_PATH
+from pipeline.prediction_task import PredictionTask, TargetType
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.feature_extractor import FeatureExtractor
+from pipeline.preprocessing.incremental import IncrementalExtractor, changed_subjects
+from pipeline.synthetic.mimic_generator import SyntheticMimic
+
+
+def test_changed_subjects():
+    previous = pd.DataFrame(
+        {"admissions": [1, 2, 3], "patients": [7, 8, 9]},
+        index=[10, 11, 12],
+        dtype="uint64",
+    )
+    current = pd.DataFrame(
+        {"admissions": [1, 5, 6], "patients": [7, 8, 2**64 - 1]},
+        index=[10, 11, 13],
+        dtype="uint64",
+    )
+    # 11 has a new admission, 12 is removed and 13 is new
+    assert changed_subjects(previous, current).tolist() == [11, 12, 13]
+
+
+def sorted_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({column: str for column in df.columns if df[column].dtype == object})
+    return df.sort_values(list(df.columns), ignore_index=True)
+
+
+def test_refresh_matches_full_extraction(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    COHORT_PATH.mkdir(parents=True)
+    FEATURE_EXTRACT_PATH.mkdir(parents=True)
+    task = PredictionTask(TargetType.READMISSION, None, None, 30, use_icu=True)
+
+    def extractors():
+        cohort_extractor = CohortExtractor(task)
+        cohort_extractor.fill_output()
+        feature_extractor = FeatureExtractor(
+            cohort_extractor.output,
+            use_icu=True,
+            for_diagnoses=True,
+            for_output_events=True,
+            for_chart_events=True,
+            for_procedures=True,
+            for_medications=True,
+            for_labs=True,
+        )
+        return cohort_extractor, feature_extractor
+
+    # Refreshed chart events keep the unit decisions of the first extraction, which only stay
+    # those of a full one when every item has a single unit
+    generator = dict(
+        chart_events_per_stay=20,
+        lab_events_per_admission=10,
+        other_unit_share=0,
+        block_patients=10,
+    )
+    SyntheticMimic(20, **generator).generate()
+    IncrementalExtractor(*extractors()).refresh()
+    # Patients are generated by blocks, so the first 20 ones are unchanged
+    SyntheticMimic(30, **generator).generate()
+    cohort_extractor, feature_extractor = extractors()
+    refreshed = IncrementalExtractor(cohort_extractor, feature_extractor).refresh()
+    refreshed_features = {
+        path: load_data(path) for _, path in feature_extractor.enabled_features()
+    }
+
+    cohort_extractor, feature_extractor = extractors()
+    full = cohort_extractor.extract()
+    feature_extractor.save_features()
+    assert full.df[CohortHeader.PATIENT_ID].nunique() > 20
+    assert all(len(feature) for feature in refreshed_features.values())
+    pd.testing.assert_frame_equal(
+        sorted_frame(refreshed.df), sorted_frame(full.df), check_dtype=False
+    )
+    for _, path in feature_extractor.enabled_features():
+        pd.testing.assert_frame_equal(
+            sorted_frame(refreshed_features[path]),
+            sorted_frame(load_data(path)),
+            check_dtype=False,
+        )
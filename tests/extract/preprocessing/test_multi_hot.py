@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pipeline.preprocessing.feature.feature_abc import FeatureGroup
+from pipeline.preprocessing.feature.multi_hot import MultiHotEncoder
+
+
+@pytest.fixture
+def cohort():
+    return pd.DataFrame({"hadm_id": [30, 10, 20]})
+
+
+@pytest.fixture
+def features():
+    return {
+        FeatureGroup.DIAGNOSES: pd.DataFrame(
+            {
+                "hadm_id": [10, 10, 10, 30, 40],
+                "root": ["I10", "E11", "I10", "I10", "J18"],
+            }
+        ),
+        FeatureGroup.PROCEDURES: pd.DataFrame(
+            {"hadm_id": [20, 30], "icd_code": ["0040", "3E0"]}
+        ),
+        # EPC classes are lists, as returned by get_EPC
+        FeatureGroup.MEDICATIONS: pd.DataFrame(
+            {
+                "hadm_id": [10, 20, 30, 30],
+                "EPC": [
+                    ["HMG-CoA Reductase Inhibitor [EPC]"],
+                    np.nan,
+                    ["Anticoagulant [EPC]", "Factor Xa Inhibitor [EPC]"],
+                    [],
+                ],
+            }
+        ),
+    }
+
+
+def test_build(cohort, features, tmp_path):
+    multi_hot = MultiHotEncoder().build(cohort, features, use_icu=False, path=tmp_path)
+    assert multi_hot.ids.tolist() == [30, 10, 20]
+    assert multi_hot.vocabulary["code"].tolist() == [
+        "E11",
+        "I10",
+        "J18",
+        "0040",
+        "3E0",
+        "Anticoagulant [EPC]",
+        "Factor Xa Inhibitor [EPC]",
+        "HMG-CoA Reductase Inhibitor [EPC]",
+    ]
+    assert multi_hot.matrix.dtype == np.uint8
+    # Repeated codes count once, a drug has a column per EPC class, rows follow the cohort
+    assert multi_hot.matrix.toarray().tolist() == [
+        [0, 1, 0, 0, 1, 1, 1, 0],
+        [1, 1, 0, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 0, 0, 0, 0],
+    ]
+
+
+def test_given_vocabulary(cohort, features, tmp_path):
+    vocabulary = (
+        MultiHotEncoder(min_count=2)
+        .build(cohort, features, use_icu=False, path=tmp_path / "train")
+        .vocabulary
+    )
+    assert vocabulary["code"].tolist() == ["I10"]
+    multi_hot = MultiHotEncoder(vocabulary).build(
+        cohort, features, use_icu=False, path=tmp_path / "test"
+    )
+    assert multi_hot.matrix.toarray().ravel().tolist() == [1, 1, 0]
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from pipeline.preprocessing.feature.parallel import (
+    Prefetcher,
+    map_chunks,
+    prefetch_chunks,
+)
+
+
+def double(chunk: pd.DataFrame) -> pd.DataFrame:
+    return chunk * 2
+
+
+def test_map_chunks_keeps_chunk_order():
+    chunks = [pd.DataFrame({"value": range(i, i + 3)}) for i in range(0, 30, 3)]
+    for n_workers, max_in_flight in [(1, None), (3, None), (2, 1)]:
+        results = list(map_chunks(double, iter(chunks), n_workers, max_in_flight))
+        assert pd.concat(results)["value"].tolist() == list(range(0, 60, 2))
+
+
+def scale(chunk: pd.DataFrame, factors: pd.DataFrame) -> pd.DataFrame:
+    return chunk * factors["factor"].sum()
+
+
+def test_map_chunks_with_shared_arguments():
+    chunks = [pd.DataFrame({"value": [i]}) for i in range(10)]
+    factors = pd.DataFrame({"factor": [1, 2]})
+    for n_workers in [1, 2]:
+        results = list(
+            map_chunks(scale, iter(chunks), n_workers, shared={"factors": factors})
+        )
+        assert pd.concat(results)["value"].tolist() == list(range(0, 30, 3))
+
+
+def test_prefetcher_reads_ahead():
+    read = []
+
+    def chunks():
+        for i in range(5):
+            read.append(i)
+            yield pd.DataFrame({"value": [i]})
+
+    prefetcher = Prefetcher(chunks(), depth=2)
+    time.sleep(0.2)
+    # Two chunks queued and one waiting for room
+    assert read == [0, 1, 2]
+    assert [chunk["value"][0] for chunk in prefetcher] == list(range(5))
+    assert prefetcher.chunks == 5
+    assert prefetcher.wait_seconds >= 0
+
+
+def test_prefetcher_raises_reader_errors():
+    def chunks():
+        yield pd.DataFrame({"value": [0]})
+        raise ValueError("bad chunk")
+
+    prefetcher = Prefetcher(chunks())
+    next(prefetcher)
+    with pytest.raises(ValueError, match="bad chunk"):
+        next(prefetcher)
+
+
+def endless_chunks(closed: threading.Event):
+    try:
+        i = 0
+        while True:
+            yield pd.DataFrame({"value": [i]})
+            i += 1
+    finally:
+        closed.set()
+
+
+def fail(chunk: pd.DataFrame) -> pd.DataFrame:
+    raise ValueError("bad processing")
+
+
+def process_prefetched(func, chunks):
+    with prefetch_chunks(chunks, 2, "test.wait") as chunks:
+        yield from map_chunks(func, chunks)
+
+
+def test_prefetcher_stops_when_abandoned():
+    closed = threading.Event()
+    with Prefetcher(endless_chunks(closed), depth=2) as prefetcher:
+        assert next(prefetcher)["value"][0] == 0
+    assert closed.is_set()
+
+    # So does a consumer closing the processed chunks early
+    closed.clear()
+    processed = process_prefetched(double, endless_chunks(closed))
+    assert next(processed)["value"][0] == 0
+    processed.close()
+    assert closed.is_set()
+
+
+def test_prefetched_chunks_stop_on_processing_error():
+    closed = threading.Event()
+    with pytest.raises(ValueError, match="bad processing"):
+        list(process_prefetched(fail, endless_chunks(closed)))
+    assert closed.is_set()
@@ -0,0 +1,66 @@
+from pathlib import Path
+from typing import List
+import pandas as pd
+from pipeline.preprocessing.feature.feature_abc import Feature, FeatureGroup
+from pipeline.preprocessing.feature import stage_cache
+from pipeline.preprocessing.feature.stage_cache import FeatureCache
+
+
+class Counted(Feature):
+    def __init__(self, source: Path, factor: int):
+        self.source = source
+        self.factor = factor
+        self.n_extractions = 0
+
+    def group() -> str:
+        return FeatureGroup.LAB
+
+    cache_ignored = Feature.cache_ignored + ("n_extractions",)
+
+    def source_paths(self) -> List[Path]:
+        return [self.source]
+
+    def extract_from(self, cohort: pd.DataFrame) -> pd.DataFrame:
+        self.n_extractions += 1
+        return cohort * self.factor
+
+
+def test_feature_cache(tmp_path):
+    source = tmp_path / "events.csv"
+    source.write_text("a")
+    cache = FeatureCache(tmp_path / "cache")
+    cohort = pd.DataFrame({"stay_id": [1, 2, 3]})
+    feature = Counted(source, 2)
+
+    assert cache.extract(feature, cohort)["stay_id"].tolist() == [2, 4, 6]
+    assert cache.extract(feature, cohort)["stay_id"].tolist() == [2, 4, 6]
+    assert feature.n_extractions == 1
+
+    # Another cohort, other parameters or a changed source file are extracted again
+    cache.extract(feature, cohort.iloc[:2])
+    cache.extract(Counted(source, 3), cohort)
+    source.write_text("ab")
+    cache.extract(feature, cohort)
+    assert feature.n_extractions == 3
+
+    # Only the most recent entry fits in the budget
+    cache.max_bytes = cache.nbytes // 4
+    cache.extract(feature, cohort.iloc[:1])
+    assert len(list(cache.path.iterdir())) == 1
+    assert cache.invalidate(FeatureGroup.CHART) == 0
+    assert cache.invalidate(FeatureGroup.LAB) == 1
+    cache.extract(feature, cohort.iloc[:1])
+    assert feature.n_extractions == 5
+
+
+def test_feature_cache_version(tmp_path, monkeypatch):
+    source = tmp_path / "events.csv"
+    source.write_text("a")
+    cache = FeatureCache(tmp_path / "cache")
+    cohort = pd.DataFrame({"stay_id": [1, 2, 3]})
+    feature = Counted(source, 2)
+
+    key = cache.key(feature, cohort)
+    assert cache.key(feature, cohort) == key
+    monkeypatch.setattr(stage_cache, "CACHE_VERSION", stage_cache.CACHE_VERSION + 1)
+    assert cache.key(feature, cohort) != key
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pipeline.preprocessing.feature.time_series import TimeSeriesBuilder
+
+
+@pytest.fixture
+def chart():
+    return pd.DataFrame(
+        {
+            "stay_id": [2, 2, 2, 1, 1, 1],
+            "itemid": [10, 10, 20, 10, 20, 20],
+            "valuenum": [1.0, 3.0, 5.0, 7.0, np.nan, 9.0],
+            # As read back from a CSV output
+            "event_time_from_admit": [
+                "0 days 00:10:00",
+                "0 days 00:50:00",
+                "0 days 01:30:00",
+                "0 days 02:00:00",
+                "0 days 00:00:00",
+                "0 days 05:00:00",
+            ],
+        }
+    )
+
+
+def test_build_chart_events(chart, tmp_path):
+    series = TimeSeriesBuilder(bucket_hours=1, horizon_hours=4).build_chart_events(
+        chart, ids=[1, 2, 3], path=tmp_path
+    )
+    assert series.values.shape == (3, 4, 2)
+    assert series.values.dtype == np.float32
+    assert series.ids.tolist() == [1, 2, 3]
+    assert series.items.tolist() == [10, 20]
+    stay_2 = series.positions([2])[0]
+    assert series.values[stay_2, 0, 0] == 2.0
+    assert series.values[stay_2, 1, 1] == 5.0
+    assert series.values[series.positions([1])[0], 2, 0] == 7.0
+    # NaN values and events beyond the horizon are dropped
+    assert series.mask.sum() == 3
+    assert not series.mask[series.positions([3])[0]].any()
+    assert series.positions([4]).tolist() == [-1]
+
+
+def test_last_aggregation(chart, tmp_path):
+    series = TimeSeriesBuilder(
+        bucket_hours=2, horizon_hours=4, aggregation="last"
+    ).build_chart_events(chart.iloc[::-1], path=str(tmp_path))
+    assert series.values[series.positions([2])[0], 0].tolist() == [3.0, 5.0]
+    assert series.meta["aggregation"] == "last"
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+from pipeline.extract.parquet_tools import build_parquet_cache, is_cache_fresh, read_raw
+from pipeline.extract.raw.hosp import load_patients
+from pipeline.file_info.path_prefix import RAW_PATH
+from pipeline.file_info.raw.hosp import HOSP_PATIENTS_PATH, PatientsHeader
+
+
+@pytest.fixture(autouse=True)
+def patients(tmp_path, monkeypatch):
+    # Raw and cache paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    patients = pd.DataFrame(
+        {
+            PatientsHeader.ID: range(10000000, 10000100),
+            PatientsHeader.GENDER: ["F", "M"] * 50,
+            PatientsHeader.ANCHOR_AGE: [18 + i % 70 for i in range(100)],
+            PatientsHeader.ANCHOR_YEAR: [2110 + i % 60 for i in range(100)],
+            PatientsHeader.ANCHOR_YEAR_GROUP: ["2008 - 2010", "2017 - 2019"] * 50,
+            PatientsHeader.DOD: [
+                f"{2120 + i % 60}-03-0{1 + i % 9}" if i % 4 == 0 else None
+                for i in range(100)
+            ],
+        }
+    )
+    HOSP_PATIENTS_PATH.parent.mkdir(parents=True)
+    patients.to_csv(HOSP_PATIENTS_PATH, index=False, compression="gzip")
+    return patients
+
+
+def test_load_patients_from_parquet_cache():
+    from_csv = pd.read_csv(
+        HOSP_PATIENTS_PATH, compression="gzip", parse_dates=[PatientsHeader.DOD]
+    )
+    build_parquet_cache(HOSP_PATIENTS_PATH, [PatientsHeader.DOD], chunksize=30)
+    assert is_cache_fresh(HOSP_PATIENTS_PATH)
+
+    patients = load_patients()
+    assert len(patients) == 100
+    assert pd.api.types.is_datetime64_any_dtype(patients[PatientsHeader.DOD])
+    pd.testing.assert_frame_equal(
+        patients, from_csv, check_dtype=False, check_categorical=False
+    )
+
+
+def test_read_parquet_cache_in_chunks():
+    build_parquet_cache(HOSP_PATIENTS_PATH, [PatientsHeader.DOD])
+    chunks = list(
+        read_raw(
+            HOSP_PATIENTS_PATH,
+            usecols=[PatientsHeader.GENDER, PatientsHeader.ID],
+            chunksize=30,
+        )
+    )
+    assert [len(c) for c in chunks] == [30, 30, 30, 10]
+    assert chunks[0].columns.tolist() == [PatientsHeader.ID, PatientsHeader.GENDER]
+
+
+def test_read_raw_with_key_filter():
+    from_csv = pd.read_csv(
+        HOSP_PATIENTS_PATH, compression="gzip", parse_dates=[PatientsHeader.DOD]
+    )
+    subject_ids = from_csv[PatientsHeader.ID].iloc[[3, 50, 70]]
+    expected = from_csv[from_csv[PatientsHeader.ID].isin(subject_ids)]
+
+    filtered_csv = pd.concat(
+        read_raw(
+            HOSP_PATIENTS_PATH,
+            parse_dates=[PatientsHeader.DOD],
+            chunksize=30,
+            key_column=PatientsHeader.ID,
+            keys=subject_ids,
+        )
+    )
+    build_parquet_cache(HOSP_PATIENTS_PATH, [PatientsHeader.DOD])
+    filtered_parquet = read_raw(
+        HOSP_PATIENTS_PATH,
+        parse_dates=[PatientsHeader.DOD],
+        key_column=PatientsHeader.ID,
+        keys=set(subject_ids),
+    )
+    for filtered in (filtered_csv, filtered_parquet):
+        pd.testing.assert_frame_equal(
+            filtered.reset_index(drop=True),
+            expected.reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+def test_parquet_cache_widens_types_of_later_chunks():
+    path = RAW_PATH / "icu" / "mixed.csv.gz"
+    path.parent.mkdir(parents=True)
+    raw = pd.DataFrame(
+        {
+            "itemid": range(15),
+            "value": [str(i) for i in range(10)] + ["Normal"] + ["1"] * 4,
+            "count": [1] * 10 + [1.5] + [2] * 4,
+            "code": ["0010", "V101", "4019"] * 5,
+        }
+    )
+    raw.to_csv(path, index=False, compression="gzip")
+    build_parquet_cache(path, chunksize=5)
+    cached = read_raw(path)
+    assert cached["value"].tolist() == raw["value"].tolist()
+    assert cached["count"].tolist() == raw["count"].tolist()
+    assert cached["code"].tolist() == raw["code"].tolist()
+    assert pd.api.types.is_integer_dtype(cached["itemid"])
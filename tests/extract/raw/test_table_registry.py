@@ -0,0 +1,63 @@
+import pandas as pd
+from pipeline.extract.table_registry import TableRegistry, table_bytes
+
+
+def test_table_registry_memoizes_and_evicts(tmp_path):
+    paths = [tmp_path / f"table_{i}.csv" for i in range(3)]
+    for path in paths:
+        pd.DataFrame({"value": range(100)}).to_csv(path, index=False)
+    loads = []
+
+    def loader(path):
+        def load():
+            loads.append(path)
+            return pd.read_csv(path)
+
+        return load
+
+    registry = TableRegistry()
+    df = registry.get(paths[0], None, loader(paths[0]))
+    df["value"] = -1
+    # Writing in place into a shallow copy is only safe with Copy-on-Write
+    copy = registry.get(paths[0], None, loader(paths[0]))
+    copy.loc[0, "value"] = 10**6
+    assert registry.get(paths[0], None, loader(paths[0]))["value"].sum() == 4950
+    assert loads == [paths[0]]
+
+    # Room for two tables: the least recently used one is evicted
+    registry.max_bytes = 2 * registry.nbytes
+    registry.get(paths[1], None, loader(paths[1]))
+    registry.get(paths[0], None, loader(paths[0]))
+    registry.get(paths[2], None, loader(paths[2]))
+    registry.get(paths[0], None, loader(paths[0]))
+    registry.get(paths[1], None, loader(paths[1]))
+    assert loads == [paths[0], paths[1], paths[2], paths[1]]
+
+
+def test_table_registry_evicts_when_budget_lowered(tmp_path):
+    paths = [tmp_path / f"table_{i}.csv" for i in range(3)]
+    for path in paths:
+        pd.DataFrame({"value": range(100), "code": ["a"] * 100}).to_csv(
+            path, index=False
+        )
+    registry = TableRegistry()
+    for path in paths:
+        registry.get(path, None, lambda path=path: pd.read_csv(path, dtype=object))
+    size = table_bytes(pd.read_csv(paths[0], dtype=object))
+    assert registry.nbytes == 3 * size
+    assert len(registry._loading_locks) == 3
+
+    # Only the most recently used table fits the lowered budget
+    registry.max_bytes = 3 * size // 2
+    assert registry.nbytes == size
+    assert list(registry._loading_locks) == [(str(paths[2]), None)]
+    registry.clear()
+    assert registry.nbytes == 0
+    assert not registry._loading_locks
+
+
+def test_table_bytes_measures_object_columns_deeply():
+    df = pd.DataFrame({"value": range(100), "code": ["x" * 100] * 100}, dtype=object)
+    df["value"] = df["value"].astype("int64")
+    assert table_bytes(df) == int(df.memory_usage(deep=True).sum())
+    assert table_bytes(df) > int(df.memory_usage(deep=False).sum())
@@ -0,0 +1,23 @@
+from pipeline.extract.compiled_cache import load_compiled
+
+
+def test_load_compiled_rebuilds_on_source_change(tmp_path):
+    source = tmp_path / "map.txt"
+    cache = tmp_path / "cache" / "map.pkl"
+    source.write_text("a\tb\n")
+    builds = []
+
+    def build():
+        builds.append(source.read_text())
+        return dict([source.read_text().split()])
+
+    assert load_compiled(source, cache, build) == {"a": "b"}
+    assert load_compiled(source, cache, build) == {"a": "b"}
+    # Same content with a new modification time: the compiled copy is still valid
+    source.write_text("a\tb\n")
+    assert load_compiled(source, cache, build) == {"a": "b"}
+    assert len(builds) == 1
+
+    source.write_text("a\tc\n")
+    assert load_compiled(source, cache, build) == {"a": "c"}
+    assert len(builds) == 2
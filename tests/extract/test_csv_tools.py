@@ -0,0 +1,34 @@
+import gzip
+
+import pandas as pd
+from pipeline.extract.csv_tools import (
+    OutputFormat,
+    load_data,
+    save_data,
+    write_block_gzip_csv,
+)
+
+
+def test_block_gzip_csv_is_a_regular_gzip_csv(tmp_path):
+    data = pd.DataFrame({"subject_id": range(1000), "value": [0.5] * 1000})
+    write_block_gzip_csv(data, tmp_path / "data.csv.gz", block_rows=64, n_threads=3)
+    with gzip.open(tmp_path / "data.csv.gz", "rt") as f:
+        assert f.read() == data.to_csv(index=False)
+
+
+def test_partitioned_output_round_trip(tmp_path):
+    data = pd.DataFrame(
+        {"subject_id": [3, 1, 2, 3, 1], "valueuom": ["mg", "mL", None, "mg", "mg"]}
+    ).astype({"valueuom": "category"})
+    for output_format in OutputFormat:
+        save_data(
+            data, tmp_path / "data.csv.gz", "TEST", output_format, "subject_id", 4
+        )
+        assert len(list((tmp_path / "data").iterdir())) == 4
+        loaded = load_data(tmp_path / "data.csv.gz", output_format)
+        loaded = loaded.sort_values(["subject_id", "valueuom"], ignore_index=True)
+        expected = data.sort_values(["subject_id", "valueuom"], ignore_index=True)
+        assert loaded["subject_id"].tolist() == expected["subject_id"].tolist()
+        assert loaded["valueuom"].astype(object).fillna("").tolist() == (
+            expected["valueuom"].astype(object).fillna("").tolist()
+        )
@@ -0,0 +1,37 @@
+import pandas as pd
+from pipeline.extract.dtypes import align_dtypes, apply_dtypes, concat_frames
+
+
+def test_concat_frames_keeps_categories():
+    schema = {"itemid": "int32", "valueuom": "category", "missing": "int8"}
+    chunks = [
+        apply_dtypes(
+            pd.DataFrame({"itemid": [1, 2], "valueuom": ["mg", None]}), schema
+        ),
+        apply_dtypes(pd.DataFrame({"itemid": [3], "valueuom": ["mL"]}), schema),
+    ]
+    df = concat_frames(chunks)
+    assert df["itemid"].dtype == "int32"
+    assert isinstance(df["valueuom"].dtype, pd.CategoricalDtype)
+    assert df["valueuom"].tolist()[::2] == ["mg", "mL"]
+    assert pd.isna(df["valueuom"][1])
+
+
+def test_align_dtypes_parses_saved_text():
+    reference = pd.DataFrame(
+        {
+            "charttime": pd.to_datetime(["2150-01-01 10:00:00"]),
+            "time_from_admit": pd.to_timedelta(["0 days 01:00:00"]),
+            "valuenum": pd.Series([4.33], dtype="float32"),
+        }
+    )
+    saved = pd.DataFrame(
+        {
+            "charttime": ["2150-01-02 11:30:00"],
+            "time_from_admit": ["1 days 02:00:00"],
+            "valuenum": [5.1],
+        }
+    )
+    df = concat_frames([align_dtypes(saved, reference), reference])
+    assert (df.dtypes == reference.dtypes).all()
+    assert df["time_from_admit"][0] == pd.Timedelta(days=1, hours=2)
@@ -0,0 +1,72 @@
+import gzip
+
+import pandas as pd
+import pytest
+from pipeline.extract.gzip_members import (
+    build_member_copy,
+    is_member_copy_fresh,
+    load_member_index,
+    member_copy_path,
+)
+from pipeline.extract.parquet_tools import read_raw
+from pipeline.file_info.raw.icu import CHART_EVENTS_PATH
+
+
+@pytest.fixture
+def chart(tmp_path, monkeypatch):
+    # Raw and cache paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    chart = pd.DataFrame(
+        {
+            "stay_id": [i % 7 for i in range(1000)],
+            "charttime": pd.date_range("2150-01-01", periods=1000, freq="h"),
+            "itemid": range(1000),
+            "valuenum": [i / 4 for i in range(1000)],
+        }
+    )
+    CHART_EVENTS_PATH.parent.mkdir(parents=True)
+    chart.to_csv(CHART_EVENTS_PATH, index=False, compression="gzip")
+    return chart
+
+
+def test_member_copy_reads_like_source(chart):
+    assert not is_member_copy_fresh(CHART_EVENTS_PATH)
+    build_member_copy(CHART_EVENTS_PATH, member_bytes=4000)
+    assert len(load_member_index(CHART_EVENTS_PATH)["members"]) > 5
+    with gzip.open(CHART_EVENTS_PATH) as source, gzip.open(
+        member_copy_path(CHART_EVENTS_PATH)
+    ) as copy:
+        assert source.read() == copy.read()
+
+    chunks = list(read_raw(CHART_EVENTS_PATH, ["charttime"], chunksize=10))
+    assert len(chunks) > 5
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), chart)
+    filtered = read_raw(
+        CHART_EVENTS_PATH,
+        ["charttime"],
+        usecols=["itemid", "charttime"],
+        key_column="stay_id",
+        keys=[3],
+    )
+    expected = chart[chart["stay_id"] == 3][["charttime", "itemid"]]
+    assert filtered["itemid"].tolist() == expected["itemid"].tolist()
+    assert filtered["charttime"].tolist() == expected["charttime"].tolist()
+
+
+def test_stale_member_copy_is_ignored(chart):
+    build_member_copy(CHART_EVENTS_PATH, member_bytes=4000)
+    chart.iloc[:10].to_csv(CHART_EVENTS_PATH, index=False, compression="gzip")
+    assert not is_member_copy_fresh(CHART_EVENTS_PATH)
+    assert len(read_raw(CHART_EVENTS_PATH)) == 10
+
+
+def test_member_index_of_another_copy_is_ignored(chart):
+    build_member_copy(CHART_EVENTS_PATH, member_bytes=4000)
+    # A rebuild interrupted after its copy was moved in place leaves the previous index
+    with open(member_copy_path(CHART_EVENTS_PATH), "ab") as f:
+        f.write(gzip.compress(b"1,2150-01-01,1,1.0\n"))
+    assert not is_member_copy_fresh(CHART_EVENTS_PATH)
+    pd.testing.assert_frame_equal(read_raw(CHART_EVENTS_PATH, ["charttime"]), chart)
+    build_member_copy(CHART_EVENTS_PATH, member_bytes=4000)
+    assert is_member_copy_fresh(CHART_EVENTS_PATH)
+    assert not list(member_copy_path(CHART_EVENTS_PATH).parent.glob("*.tmp"))
@@ -0,0 +1,19 @@
+import json
+
+import pytest
+from pipeline.extract.meta_files import meta_written_last
+
+
+def test_meta_written_last(tmp_path):
+    meta_path = tmp_path / "meta.json"
+    with meta_written_last(meta_path) as meta:
+        (tmp_path / "values.txt").write_text("1")
+        meta["rows"] = 1
+    assert json.loads(meta_path.read_text()) == {"rows": 1}
+
+    # A failed write removes the metadata of the previous one
+    with pytest.raises(ValueError):
+        with meta_written_last(meta_path) as meta:
+            assert not meta_path.exists()
+            raise ValueError("bad values")
+    assert not meta_path.exists()
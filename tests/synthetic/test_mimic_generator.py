@@ -0,0 +1,41 @@
+import pandas as pd
+from pipeline.synthetic.mimic_generator import SyntheticMimic
+
+
+def _generate(root, **kwargs):
+    generator = SyntheticMimic(
+        40,
+        chart_events_per_stay=50,
+        lab_events_per_admission=50,
+        block_patients=15,
+        **kwargs,
+    )
+    return generator.generate(root / "raw", root / "mappings")
+
+
+def test_generation_is_deterministic(tmp_path):
+    rows = _generate(tmp_path / "a")
+    assert rows == _generate(tmp_path / "b")
+    for table in rows:
+        path = f"raw/{table}.csv.gz"
+        assert (tmp_path / "a" / path).read_bytes() == (
+            tmp_path / "b" / path
+        ).read_bytes()
+    assert _generate(tmp_path / "c", seed=1) != rows
+
+
+def test_generated_tables(tmp_path):
+    rows = _generate(tmp_path)
+    assert rows["hosp/patients"] == 40
+    admissions = pd.read_csv(tmp_path / "raw/hosp/admissions.csv.gz")
+    stays = pd.read_csv(tmp_path / "raw/icu/icustays.csv.gz")
+    assert admissions["hadm_id"].is_unique and stays["stay_id"].is_unique
+    assert stays["hadm_id"].isin(admissions["hadm_id"]).all()
+
+    labs = pd.read_csv(tmp_path / "raw/hosp/labevents.csv.gz")
+    assert 0.1 < labs["hadm_id"].isna().mean() < 0.3
+    assert labs["labevent_id"].is_unique
+
+    chart = pd.read_csv(tmp_path / "raw/icu/chartevents.csv.gz")
+    temperature_units = chart.loc[chart["itemid"] == 223761, "valueuom"]
+    assert set(temperature_units) == {"°F", "°C"}
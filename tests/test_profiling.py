@@ -0,0 +1,67 @@
+import json
+import time
+
+import pandas as pd
+from pipeline.profiling import profile_run, profiled, run_profiler
+
+
+@profiled
+def _double(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([df, df])
+
+
+@profiled
+def _chunks(n: int):
+    return iter([pd.DataFrame({"a": range(n)})] * 3)
+
+
+@profiled
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profiled_stages(tmp_path):
+    df = pd.DataFrame({"a": range(10)})
+    _double(df)
+    assert not run_profiler.stats
+
+    with profile_run(tmp_path / "run.json", sample_stage="_busy"):
+        _double(df)
+        _double(df)
+        assert sum(len(chunk) for chunk in _chunks(4)) == 12
+        _busy(0.2)
+
+    report = json.loads((tmp_path / "run.json").read_text())
+    stages = {stats["stage"]: stats for stats in report["stages"]}
+    assert stages["_double"]["calls"] == 2
+    assert stages["_double"]["rows_in"] == 20
+    assert stages["_double"]["rows_out"] == 40
+    assert stages["_chunks"]["calls"] == 1
+    assert stages["_chunks"]["rows_out"] == 12
+    assert stages["_busy"]["wall_seconds"] >= 0.2
+    assert stages["_busy"]["peak_rss_mib"] > 0
+    stacks = report["samples"]["_busy"]["stacks"]
+    assert stacks
+    # Innermost frames last
+    assert any(stack.split(";")[-1].startswith("_busy") for stack in stacks)
+
+
+def test_abandoned_profiled_chunks_are_closed(tmp_path):
+    closed = []
+
+    def read():
+        try:
+            for n in range(3):
+                yield pd.DataFrame({"a": range(n)})
+        finally:
+            closed.append(True)
+
+    # The reader is still referenced, e.g. by the caller, when its chunks are abandoned
+    reader = read()
+    with profile_run(tmp_path / "run.json"):
+        chunks = profiled(lambda: reader)()
+        next(chunks)
+        chunks.close()
+        assert closed == [True]
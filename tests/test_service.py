@@ -0,0 +1,113 @@
+import threading
+import time
+import urllib.error
+
+import pytest
+from pipeline.file_info.preproc.cohort import COHORT_PATH
+from pipeline.file_info.preproc.feature.path_prefix import (
+    FEATURE_EXTRACT_PATH,
+    FEATURE_PREPROC_PATH,
+    FEATURE_SUMMARY_PATH,
+)
+from pipeline.preprocessing.cohort.cohort_extractor import CohortExtractor
+from pipeline.preprocessing.feature.feature_extractor import FeatureExtractor
+from pipeline.service import PipelineService, make_server, request_service
+from pipeline.synthetic.mimic_generator import SyntheticMimic
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    SyntheticMimic(30, chart_events_per_stay=20, lab_events_per_admission=20).generate()
+    for path in [
+        COHORT_PATH,
+        FEATURE_EXTRACT_PATH,
+        FEATURE_PREPROC_PATH,
+        FEATURE_SUMMARY_PATH,
+    ]:
+        path.mkdir(parents=True, exist_ok=True)
+    service = PipelineService()
+    service.warm()
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_cohort_and_features(server):
+    port = server.server_address[1]
+    cohort = request_service(
+        "/cohort",
+        {"target_type": "READMISSION", "nb_days": 30, "use_icu": True},
+        port=port,
+    )
+    assert cohort["name"] == "cohort_readmission_with_icu_30"
+    assert cohort["rows"] > 0
+    features = request_service(
+        "/features",
+        {
+            "cohort_output": cohort["name"],
+            "use_icu": True,
+            "for_diagnoses": True,
+            "for_chart_events": True,
+        },
+        port=port,
+    )
+    assert set(features["rows"]) == {"DIAGNOSES", "CHART EVENTS"}
+    assert features["rows"]["DIAGNOSES"] > 0
+
+
+def test_bad_request(server):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request_service(
+            "/cohort",
+            {"target_type": "Unknown", "use_icu": True},
+            port=server.server_address[1],
+        )
+    assert error.value.code == 400
+
+
+def test_cohort_not_rewritten_during_features(server, monkeypatch):
+    port = server.server_address[1]
+    task = {"target_type": "READMISSION", "nb_days": 30, "use_icu": True}
+    name = request_service("/cohort", task, port=port)["name"]
+    events = []
+
+    def recorded(method, name):
+        def run(self):
+            events.append(f"{name} start")
+            time.sleep(0.2)
+            result = method(self)
+            events.append(f"{name} end")
+            return result
+
+        return run
+
+    monkeypatch.setattr(
+        CohortExtractor, "extract", recorded(CohortExtractor.extract, "cohort")
+    )
+    monkeypatch.setattr(
+        FeatureExtractor,
+        "save_features",
+        recorded(FeatureExtractor.save_features, "features"),
+    )
+    features = {"cohort_output": name, "use_icu": True, "for_diagnoses": True}
+    threads = [
+        threading.Thread(
+            target=request_service, args=("/features", features, "127.0.0.1", port)
+        ),
+        threading.Thread(
+            target=request_service, args=("/cohort", task, "127.0.0.1", port)
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    assert len(events) == 4
+    # Each request ends before the other one starts
+    assert events[0].split()[0] == events[1].split()[0]